@@ -0,0 +1,285 @@
+"""
+beat_analysis.py
+Shared, cached beat analysis for the Insomniax renderers.
+
+- Runs librosa onset-strength + beat tracking on the soundtrack
+- Stores tempo, beat times and onset envelope as a compressed .npz
+- Keys cache entries by the audio file's content hash + analysis parameters
+- Streams long files block-wise so peak memory does not grow with track length
+- Used by insomniax_autocut_v3 and insomniax_to_otio_extended
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+CACHE_DIR = Path(".insomniax_cache/beats")
+HOP_LENGTH = 512
+N_FFT = 2048
+TOP_DB = 80.0
+STREAM_THRESHOLD_BYTES = 256 * 1024 ** 2   # stream anything larger than this
+BLOCK_SECONDS = 20.0      # audio read per soundfile block
+WINDOW_SECONDS = 60.0     # onset envelope handed to each beat_track call
+OVERLAP_SECONDS = 15.0    # shared context between consecutive windows
+ANALYSIS_VERSION = 1   # bump when the analysis itself changes
+
+
+class BeatAnalysis(NamedTuple):
+    tempo: float
+    beat_times: np.ndarray   # seconds, float64
+    onset_env: np.ndarray    # onset strength per hop, float32
+    sr: int
+    hop_length: int
+
+
+def file_digest(path: Path, cache_dir: Path) -> str:
+    """
+    SHA-256 of the file contents.
+
+    Digests are memoized by (path, size, mtime) in cache_dir/digests.json so
+    an untouched multi-GB stem is not re-read on every run.
+    """
+    st = path.stat()
+    stamp = f"{path.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+    memo_path = cache_dir / "digests.json"
+    try:
+        memo = json.loads(memo_path.read_text())
+    except (OSError, ValueError):
+        memo = {}
+    if stamp in memo:
+        return memo[stamp]
+
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    memo[stamp] = h.hexdigest()
+    memo_path.write_text(json.dumps(memo, indent=2))
+    return memo[stamp]
+
+
+def cache_key(digest: str, **params) -> str:
+    material = json.dumps({"audio": digest, "v": ANALYSIS_VERSION, **params}, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def run_analysis(audio_path: Path, hop_length: int = HOP_LENGTH) -> BeatAnalysis:
+    """Uncached analysis of the whole file."""
+    y, sr = librosa.load(audio_path, sr=None)
+    onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length)
+    tempo, beats = librosa.beat.beat_track(
+        onset_envelope=onset_env, sr=sr, hop_length=hop_length
+    )
+    beat_times = librosa.frames_to_time(beats, sr=sr, hop_length=hop_length)
+    return BeatAnalysis(
+        tempo=float(np.atleast_1d(tempo)[0]) if np.size(tempo) else 0.0,
+        beat_times=np.asarray(beat_times, dtype=np.float64),
+        onset_env=np.asarray(onset_env, dtype=np.float32),
+        sr=int(sr),
+        hop_length=hop_length,
+    )
+
+
+class StreamingBeatTracker:
+    """
+    Block-wise onset/beat analysis with bounded memory.
+
+    Audio is read through soundfile in BLOCK_SECONDS blocks and turned into
+    the same mel-dB onset envelope librosa.onset.onset_strength computes.
+    Beats are tracked on overlapping envelope windows and yielded as soon as
+    a window is complete. Only one audio block is held at a time; the onset
+    envelope kept for the cache is one float per hop (~0.1% of the decoded
+    audio). The only deviation from the whole-file path is the 80 dB floor,
+    which uses the running maximum instead of the global one.
+    """
+
+    def __init__(self, audio_path: str | Path, hop_length: int = HOP_LENGTH,
+                 n_fft: int = N_FFT, block_seconds: float = BLOCK_SECONDS,
+                 window_seconds: float = WINDOW_SECONDS,
+                 overlap_seconds: float = OVERLAP_SECONDS) -> None:
+        self.audio_path = Path(audio_path)
+        self.hop_length = hop_length
+        self.n_fft = n_fft
+        self.block_seconds = block_seconds
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        self.sr = 0
+        self.onset_env = np.zeros(0, dtype=np.float32)
+
+    def _frames(self, f: sf.SoundFile) -> Iterator[np.ndarray]:
+        """Yield mono sample runs that each cover a whole number of STFT frames."""
+        hop, n_fft = self.hop_length, self.n_fft
+        block = max(1, int(self.block_seconds * f.samplerate) // hop) * hop
+        # emulate librosa's centered, zero-padded framing
+        buf = np.zeros(n_fft // 2, dtype=np.float32)
+        while True:
+            data = f.read(block, dtype="float32", always_2d=True)
+            eof = len(data) < block
+            buf = np.concatenate([buf, data.mean(axis=1)])
+            if eof:
+                buf = np.concatenate([buf, np.zeros(n_fft // 2, dtype=np.float32)])
+            if len(buf) >= n_fft:
+                n = 1 + (len(buf) - n_fft) // hop
+                yield buf[: (n - 1) * hop + n_fft]
+                buf = buf[n * hop:]
+            if eof:
+                return
+
+    def onset_blocks(self) -> Iterator[np.ndarray]:
+        """Yield the onset envelope in pieces, matching onset_strength(y, sr, hop_length)."""
+        with sf.SoundFile(self.audio_path) as f:
+            self.sr = f.samplerate
+            prev = None
+            peak = -np.inf
+            total_frames = 0
+            emitted = 0
+            # lag (1) + centering offset, as in onset_strength_multi
+            pending = [np.zeros(1 + self.n_fft // (2 * self.hop_length), dtype=np.float32)]
+            for samples in self._frames(f):
+                mel = librosa.feature.melspectrogram(
+                    y=samples, sr=self.sr, n_fft=self.n_fft,
+                    hop_length=self.hop_length, center=False,
+                )
+                S = librosa.power_to_db(mel, top_db=None)
+                peak = max(peak, float(S.max()))
+                S = np.maximum(S, peak - TOP_DB)
+                total_frames += S.shape[1]
+
+                if prev is not None:
+                    S_prev = np.concatenate([prev, S], axis=1)
+                else:
+                    S_prev = S
+                diff = np.maximum(0.0, S_prev[:, 1:] - S_prev[:, :-1]).mean(axis=0)
+                prev = S[:, -1:]
+
+                pending.append(diff.astype(np.float32))
+                env = np.concatenate(pending)
+                # the envelope is trimmed to the frame count at the end, so
+                # hold back anything that may fall past it
+                ready = min(len(env), total_frames - emitted)
+                if ready > 0:
+                    yield env[:ready]
+                    emitted += ready
+                pending = [env[ready:]]
+
+    def beats(self) -> Iterator[float]:
+        """Yield beat times (seconds) incrementally; fills self.onset_env."""
+        fps = None
+        window = overlap = 0
+        env_parts: list[np.ndarray] = []
+        tail = np.zeros(0, dtype=np.float32)   # envelope not yet beat-tracked
+        tail_start = 0                          # frame index of tail[0]
+        last_beat = -np.inf
+
+        def track(seg: np.ndarray, seg_start: int, lo: int, hi: int) -> Iterator[float]:
+            nonlocal last_beat
+            _, frames = librosa.beat.beat_track(
+                onset_envelope=seg, sr=self.sr, hop_length=self.hop_length
+            )
+            for fr in np.asarray(frames, dtype=np.int64):
+                if lo <= fr < hi:
+                    t = (seg_start + fr) * self.hop_length / self.sr
+                    # windows meet mid-overlap; drop near-duplicate boundary beats
+                    if t - last_beat > 0.1:
+                        last_beat = t
+                        yield float(t)
+
+        for piece in self.onset_blocks():
+            if fps is None:
+                fps = self.sr / self.hop_length
+                window = max(2, int(self.window_seconds * fps))
+                overlap = min(window // 2, int(self.overlap_seconds * fps))
+            env_parts.append(piece)
+            tail = np.concatenate([tail, piece])
+            while len(tail) >= window:
+                first = tail_start == 0
+                lo = 0 if first else overlap // 2
+                hi = window - overlap // 2
+                yield from track(tail[:window], tail_start, lo, hi)
+                step = window - overlap
+                tail = tail[step:]
+                tail_start += step
+
+        if len(tail):
+            lo = 0 if tail_start == 0 else overlap // 2
+            yield from track(tail, tail_start, lo, len(tail))
+        self.onset_env = (
+            np.concatenate(env_parts) if env_parts else np.zeros(0, dtype=np.float32)
+        )
+
+    def result(self) -> BeatAnalysis:
+        beat_times = np.fromiter(self.beats(), dtype=np.float64)
+        tempo = 0.0
+        if len(self.onset_env):
+            tempo = float(np.atleast_1d(librosa.feature.tempo(
+                onset_envelope=self.onset_env, sr=self.sr, hop_length=self.hop_length
+            ))[0])
+        return BeatAnalysis(tempo, beat_times, self.onset_env, self.sr, self.hop_length)
+
+
+def analyze(audio_path: str | Path, hop_length: int = HOP_LENGTH,
+            cache_dir: str | Path | None = None,
+            streaming: bool | None = None) -> BeatAnalysis:
+    """
+    Return the beat analysis for audio_path, from cache when possible.
+
+    streaming: force the block-wise StreamingBeatTracker on/off; by default
+    it is used for files larger than STREAM_THRESHOLD_BYTES.
+
+    Prints whether the result was a cache hit and how long it took, together
+    with the original (cold) analysis time.
+    """
+    audio_path = Path(audio_path)
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    if streaming is None:
+        streaming = audio_path.stat().st_size > STREAM_THRESHOLD_BYTES
+
+    t0 = time.perf_counter()
+    key = cache_key(
+        file_digest(audio_path, cache_dir), hop_length=hop_length, streaming=streaming
+    )
+    entry = cache_dir / f"{key}.npz"
+
+    if entry.exists():
+        with np.load(entry) as z:
+            result = BeatAnalysis(
+                tempo=float(z["tempo"]),
+                beat_times=z["beat_times"],
+                onset_env=z["onset_env"],
+                sr=int(z["sr"]),
+                hop_length=int(z["hop_length"]),
+            )
+            cold = float(z["analysis_seconds"])
+        warm = time.perf_counter() - t0
+        print(f"Beat analysis: cache hit in {warm:.3f}s (cold analysis took {cold:.2f}s)")
+        return result
+
+    if streaming:
+        result = StreamingBeatTracker(audio_path, hop_length).result()
+    else:
+        result = run_analysis(audio_path, hop_length)
+    cold = time.perf_counter() - t0
+
+    tmp = entry.with_name(f"{key}.{os.getpid()}.tmp.npz")
+    np.savez_compressed(
+        tmp,
+        tempo=result.tempo,
+        beat_times=result.beat_times,
+        onset_env=result.onset_env,
+        sr=result.sr,
+        hop_length=result.hop_length,
+        analysis_seconds=cold,
+    )
+    os.replace(tmp, entry)
+    mode = "streamed" if streaming else "analyzed"
+    print(f"Beat analysis: cache miss, {mode} in {cold:.2f}s")
+    return result
@@ -0,0 +1,64 @@
+"""
+bench_clip_matcher.py
+Per-keyframe clip choice: linear tag scan vs the compiled ClipMatcher.
+
+Usage:
+    python benchmarks/bench_clip_matcher.py [--tags 5000] [--keyframes 5000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from clip_matcher import ClipMatcher  # noqa: E402
+
+
+def linear_choose(scene_text: str, clip_map: dict, rng) -> str:
+    """The pre-ClipMatcher implementation of choose_clip."""
+    scene_text = scene_text.lower()
+    for tag, path in clip_map.items():
+        if tag.lower() in scene_text:
+            return path
+    default_entry = next((clip_map[k] for k in clip_map if k.lower() == "default"), None)
+    if rng.random() < 0.2:
+        pool = [p for k, p in clip_map.items() if k.lower() != "default" or default_entry is None]
+        return rng.choice(pool or [default_entry])
+    return default_entry if default_entry is not None else next(iter(clip_map.values()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tags", type=int, default=5000)
+    parser.add_argument("--keyframes", type=int, default=5000)
+    args = parser.parse_args()
+
+    gen = random.Random(0)
+    syllables = ["hal", "way", "mir", "ror", "sink", "neon", "stair", "door", "fli", "cker", "room"]
+    def word():
+        return "".join(gen.choice(syllables) for _ in range(gen.randint(2, 3)))
+    clip_map = {f"{word()}{n}": f"footage/clip_{n}.mp4" for n in range(args.tags)}
+    clip_map["default"] = "footage/default.mp4"
+    scenes = [" ".join(word() for _ in range(12)) for _ in range(args.keyframes)]
+
+    t0 = time.perf_counter()
+    slow = [linear_choose(s, clip_map, random.Random(i)) for i, s in enumerate(scenes)]
+    t_linear = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    matcher = ClipMatcher(clip_map)
+    t_build = time.perf_counter() - t0
+    fast = [matcher.choose(s, random.Random(i)) for i, s in enumerate(scenes)]
+    t_fast = time.perf_counter() - t0
+
+    assert fast == slow
+    print(f"{args.tags} tags, {args.keyframes} keyframes")
+    print(f"  linear scan:  {t_linear:.3f}s")
+    print(f"  ClipMatcher:  {t_fast:.3f}s (build {t_build:.3f}s)  {t_linear / t_fast:.1f}× faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+bench_footage_index.py
+clip_map_maker footage matching: old flat scan + linear substring match vs
+the persistent footage index.
+
+Builds a tree of N empty video files spread over nested folders, then times:
+  • first index scan (recursive, parallel directory listing)
+  • rescan with nothing changed
+  • rescan after touching 1% of the files
+  • keyword lookup: indexed vs the old O(words × tokens) substring scan
+
+Probing is disabled (ffprobe cost depends on the media, not the index).
+
+Usage:
+    python benchmarks/bench_footage_index.py [--files 20000] [--words 300]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import footage_index  # noqa: E402
+
+SYLLABLES = ["hal", "way", "mir", "ror", "sink", "neon", "stair", "door", "fli", "cker", "room", "rain"]
+
+
+def build_tree(root: Path, n_files: int, gen: random.Random) -> list[Path]:
+    paths = []
+    for i in range(n_files):
+        folder = root / f"shoot_{i % 40:02d}" / f"card_{i % 7}"
+        folder.mkdir(parents=True, exist_ok=True)
+        words = "_".join("".join(gen.choice(SYLLABLES) for _ in range(2)) for _ in range(3))
+        path = folder / f"{words}_{i:05d}.mp4"
+        path.touch()
+        paths.append(path)
+    return paths
+
+
+def linear_match(root: Path, words: list[str]) -> dict[str, str]:
+    """The pre-index clip_map_maker: walk, tokenize, then substring-scan per word."""
+    tokens = {}
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            for t in re.split(r"[_\-\s]+", Path(name).stem.lower()):
+                if len(t) > 2 and not t.isdigit():
+                    tokens[t] = os.path.join(dirpath, name)
+    hits = {}
+    for word in words:
+        matches = [v for k, v in tokens.items() if word in k]
+        if matches:
+            hits[word] = matches[0]
+    return hits
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=20_000)
+    parser.add_argument("--words", type=int, default=300)
+    args = parser.parse_args()
+
+    gen = random.Random(0)
+    words = sorted({"".join(gen.choice(SYLLABLES) for _ in range(gen.randint(1, 2)))
+                    for _ in range(args.words)})
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "footage"
+        paths = build_tree(root, args.files, gen)
+
+        with footage_index.FootageIndex(Path(tmp) / "footage.db") as index:
+            first, _ = timed(index.scan, root, probe=False)
+            again, _ = timed(index.scan, root, probe=False)
+            for path in gen.sample(paths, max(1, args.files // 100)):
+                path.write_text("new take")
+            touched, _ = timed(index.scan, root, probe=False)
+
+            old, t_linear = timed(linear_match, root, words)
+            new, t_lookup = timed(index.lookup_many, words, root)
+            assert old.keys() == new.keys(), "index and linear scan matched different words"
+
+    print(f"{args.files} files, {len(words)} keywords")
+    print(f"  first scan:         {first.summary()}")
+    print(f"  unchanged rescan:   {again.summary()}")
+    print(f"  1% touched rescan:  {touched.summary()}")
+    print(f"  old walk + linear match: {t_linear:.3f}s")
+    print(f"  indexed lookup:          {t_lookup:.3f}s  ({t_linear / t_lookup:.1f}× faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+bench_otio_export.py
+OTIO export time and size: object-graph writer vs the streamed JSON writer,
+across beat-marker modes.
+
+Usage:
+    python benchmarks/bench_otio_export.py [--keyframes 5000] [--bpm 128]
+"""
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import insomniax_to_otio_extended as exporter  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keyframes", type=int, default=5000)
+    parser.add_argument("--bpm", type=float, default=128.0)
+    args = parser.parse_args()
+
+    data = {"keyframes": [
+        {"id": f"kf_{i}", "scene": f"scene {i}", "edit_pattern": "jumpcut" if i % 3 == 0 else ""}
+        for i in range(args.keyframes)
+    ]}
+    span = args.keyframes * exporter.CLIP_SECONDS
+    beat_times = np.arange(0, span, 60.0 / args.bpm)
+
+    print(f"{args.keyframes} clips, {len(beat_times)} beats")
+    print(f"{'markers':>10} {'writer':>7} {'seconds':>8} {'MB':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in exporter.MARKER_MODES:
+            plan = exporter.plan_export(data, beat_times, mode)
+            for writer in ("otio", "stream"):
+                seconds, size = exporter.export(plan, Path(tmp) / f"{mode}_{writer}.otio", writer)
+                print(f"{mode:>10} {writer:>7} {seconds:>8.2f} {size / 1e6:>7.1f}")
+        plan = exporter.plan_export(data, beat_times, "bar")
+        seconds, size = exporter.export(plan, Path(tmp) / "bar.otioz")
+        print(f"{'bar':>10} {'otioz':>7} {seconds:>8.2f} {size / 1e6:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+bench_otio_sync.py
+Timeline parsing + sync: OTIO adapter path vs the JSON fast path in otio_sync.
+
+Builds a timeline of N clips (with ids, scene text and a few markers each),
+then times:
+  • read_clip_states_otio  — full OTIO object graph via read_from_file
+  • read_clip_states_json  — plain JSON walk of the composition tree
+  • plan_sync on an already-synced cue sheet (the repeated-sync case)
+
+Usage:
+    python benchmarks/bench_otio_sync.py [--clips 10000] [--markers 3]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import opentimelineio as otio
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import otio_sync  # noqa: E402
+
+FPS = 24
+
+
+def build_timeline(n_clips: int, n_markers: int) -> tuple[otio.schema.Timeline, list[dict]]:
+    timeline = otio.schema.Timeline("bench")
+    track = otio.schema.Track()
+    keyframes = []
+    for i in range(n_clips):
+        kf_id = f"kf_{i:08d}"
+        keyframes.append({"id": kf_id, "scene": f"scene {i}"})
+        clip = otio.schema.Clip(
+            name=f"Scene {i + 1}",
+            source_range=otio.opentime.TimeRange(
+                otio.opentime.RationalTime(i * 3 * FPS, FPS),
+                otio.opentime.RationalTime(3 * FPS, FPS),
+            ),
+        )
+        clip.metadata.update({"scene_text": f"scene {i}", otio_sync.CLIP_ID_KEY: kf_id})
+        for m in range(n_markers):
+            clip.markers.append(otio.schema.Marker(
+                name=f"marker {m}",
+                color="RED",
+                marked_range=otio.opentime.TimeRange(
+                    otio.opentime.RationalTime((i * 3 + m) * FPS, FPS),
+                    otio.opentime.RationalTime(1, FPS),
+                ),
+            ))
+        track.append(clip)
+    timeline.tracks.append(track)
+    return timeline, keyframes
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=10_000)
+    parser.add_argument("--markers", type=int, default=3)
+    args = parser.parse_args()
+
+    timeline, keyframes = build_timeline(args.clips, args.markers)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.otio"
+        otio.adapters.write_to_file(timeline, str(path))
+        size_mb = path.stat().st_size / 1e6
+
+        slow, t_otio = timed(otio_sync.read_clip_states_otio, path)
+        fast, t_json = timed(otio_sync.read_clip_states_json, path)
+        assert fast == slow, "fast path disagrees with the OTIO adapter"
+
+        first, t_first = timed(otio_sync.plan_sync, keyframes, fast)
+        otio_sync.apply_sync(keyframes, first)
+        again, t_again = timed(otio_sync.plan_sync, keyframes, fast)
+
+    print(f"{args.clips} clips × {args.markers} markers, {size_mb:.1f} MB .otio")
+    print(f"  parse via OTIO adapter: {t_otio:.3f}s")
+    print(f"  parse via JSON walk:    {t_json:.3f}s  ({t_otio / t_json:.1f}× faster)")
+    print(f"  first sync plan:        {t_first:.3f}s  ({first.summary()})")
+    print(f"  repeat sync plan:       {t_again:.3f}s  ({again.summary()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+bench_prompt_prefix.py
+Prompt-eval time per turn with and without server-side prefix reuse.
+
+Replays a growing synthetic editing session against a running LM Studio /
+llama.cpp server. Every turn sends the agent's static prefix (system prompt
++ tool schema) followed by the history so far, and asks for a single token,
+so the request time is dominated by prompt processing.
+
+  before: cache_prompt off — the server re-evaluates the whole prompt
+  after:  cache_prompt on  — only the new tail is evaluated
+
+Reports the server's own prompt_ms when it returns llama.cpp `timings`,
+otherwise the request wall time.
+
+Usage:
+    python benchmarks/bench_prompt_prefix.py [--api-base http://localhost:1234/v1] [--turns 12]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import insomniax_agent_v4 as agent  # noqa: E402
+from lmstudio_client import LMStudioClient  # noqa: E402
+
+
+def session(turns: int) -> list[list[dict]]:
+    """History snapshots for each turn of a synthetic session."""
+    history: list[dict] = []
+    snapshots = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Set the note of scene {i} to 'slower, darker take {i}'."})
+        snapshots.append(list(history))
+        history.append({"role": "assistant", "content": f"Updated scene {i}; backup saved as versions/insomniax_{i:04d}.json."})
+    return snapshots
+
+
+def run(client: LMStudioClient, model: str, turns: int, cache_prompt: bool) -> list[float]:
+    times = []
+    for history in session(turns):
+        t0 = time.perf_counter()
+        reply = client.chat(
+            model=model,
+            messages=agent.request_messages(history),
+            tools=agent.TOOLS,
+            max_tokens=1,
+            temperature=0,
+            cache_prompt=cache_prompt,
+        )
+        wall = (time.perf_counter() - t0) * 1000
+        timings = reply.get("timings") or {}
+        times.append(float(timings.get("prompt_ms", wall)))
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--api-base", default=agent.API_BASE)
+    parser.add_argument("--model", default=agent.MODEL)
+    parser.add_argument("--turns", type=int, default=12)
+    args = parser.parse_args()
+
+    client = LMStudioClient(args.api_base, read_timeout=600)
+    before = run(client, args.model, args.turns, cache_prompt=False)
+    after = run(client, args.model, args.turns, cache_prompt=True)
+
+    print(f"{'turn':>4}  {'before ms':>10}  {'after ms':>10}")
+    for i, (b, a) in enumerate(zip(before, after)):
+        print(f"{i:>4}  {b:>10.1f}  {a:>10.1f}")
+    # turn 0 of the "after" run is cold; the prefix is reused from turn 1 on
+    print(f"median prompt eval: before {np.median(before[1:]):.1f} ms, "
+          f"after {np.median(after[1:]):.1f} ms")
+    print(client.stats.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+bench_render_pool.py
+Compares serial vs pooled segment rendering on synthetic clips.
+
+Usage:
+    python benchmarks/bench_render_pool.py [--segments 48] [--workers N]
+
+Requires ffmpeg on PATH; the clips are generated with the lavfi test source.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import insomniax_autocut_v3 as autocut  # noqa: E402
+
+
+def make_clip(path: Path, seconds: float = 6.0) -> None:
+    subprocess.run(
+        [
+            "ffmpeg", "-y",
+            "-f", "lavfi", "-i", f"testsrc=duration={seconds}:size=640x360:rate=24",
+            "-c:v", "libx264", "-preset", "ultrafast",
+            str(path),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+def plan(clips: list[Path], out_dir: Path, count: int) -> list[autocut.SegmentJob]:
+    jobs = []
+    for i in range(count):
+        start = (i * 0.5) % 5.0
+        jobs.append(
+            autocut.SegmentJob(
+                str(clips[i % len(clips)]),
+                start,
+                start + 0.5,
+                str(out_dir / f"{i:03d}.mp4"),
+                reverse=(i % 5 == 0),
+                flash=(i % 7 == 0),
+            )
+        )
+    return jobs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=48)
+    parser.add_argument("--workers", type=int, default=autocut.RENDER_WORKERS)
+    args = parser.parse_args()
+
+    if shutil.which("ffmpeg") is None:
+        raise SystemExit("ffmpeg not found on PATH")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        clips = [tmp_path / f"clip_{n}.mp4" for n in range(4)]
+        for clip in clips:
+            make_clip(clip)
+
+        timings = {}
+        for label, workers in (("serial", 1), ("pooled", args.workers)):
+            out_dir = tmp_path / label
+            os.makedirs(out_dir)
+            jobs = plan(clips, out_dir, args.segments)
+            t0 = time.perf_counter()
+            _, failures = autocut.render_segments(jobs, workers=workers)
+            timings[label] = time.perf_counter() - t0
+            print(f"{label:>6} (workers={workers}): {timings[label]:.2f}s, {len(failures)} failed")
+
+        print(f"speedup: {timings['serial'] / timings['pooled']:.2f}x over {args.segments} segments")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+bench_render_queue.py
+Render queue throughput: N local worker processes vs one, with a simulated
+encode (sleep) per segment, plus the queue's own claim/complete overhead.
+
+No FFmpeg needed; real encodes only make the per-segment work larger, so
+the queue overhead matters even less.
+
+Usage:
+    python benchmarks/bench_render_queue.py [--segments 400] [--encode-ms 20] [--workers 1 2 4 8]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import render_queue  # noqa: E402
+
+ENCODE_SECONDS = float(os.environ.get("BENCH_ENCODE_SECONDS", "0.02"))
+
+
+def fake_encode(job: dict, cache: bool = True, stream_copy: bool = True):
+    """Handler run inside the worker processes."""
+    time.sleep(ENCODE_SECONDS)
+    return None, {"mode": "encode", "seconds": ENCODE_SECONDS, "exit_code": 0}
+
+
+def run(db: Path, segments: int, workers: int, encode_ms: float) -> float:
+    queue = render_queue.RenderQueue(db)
+    batch = queue.publish({"dest": f"{n:05d}.mp4"} for n in range(segments))
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([str(Path(__file__).resolve().parent), str(ROOT)]),
+        "BENCH_ENCODE_SECONDS": str(encode_ms / 1000),
+    }
+    cmd = [sys.executable, str(ROOT / "render_queue.py"), "worker", str(db), "--batch", batch,
+           "--exit-when-idle", "--handler", "bench_render_queue:fake_encode"]
+    t0 = time.perf_counter()
+    procs = [subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL) for _ in range(workers)]
+    for proc in procs:
+        proc.wait()
+    seconds = time.perf_counter() - t0
+    assert queue.counts(batch)["done"] == segments
+    queue.purge(batch)
+    queue.close()
+    return seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=400)
+    parser.add_argument("--encode-ms", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "queue.db"
+
+        queue = render_queue.RenderQueue(db)
+        batch = queue.publish({"dest": f"{n:05d}.mp4"} for n in range(args.segments))
+        t0 = time.perf_counter()
+        while (lease := queue.claim("bench", batch)) is not None:
+            queue.complete(lease, result={})
+        overhead = (time.perf_counter() - t0) / args.segments
+        queue.purge(batch)
+        queue.close()
+
+        print(f"{args.segments} segments × {args.encode_ms:.0f} ms simulated encode")
+        print(f"  claim + complete overhead: {overhead * 1000:.2f} ms/segment")
+        base = None
+        for workers in args.workers:
+            seconds = run(db, args.segments, workers, args.encode_ms)
+            base = base or seconds
+            print(f"  {workers} worker(s): {seconds:.2f}s  ({base / seconds:.1f}× vs {args.workers[0]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+bench_reverse_memory.py
+Peak ffmpeg memory of a full-segment reverse vs the chunked reverse path.
+
+Usage:
+    python benchmarks/bench_reverse_memory.py [--size 3840x2160] [--seconds 6]
+
+Requires ffmpeg on PATH. Each variant runs in a fresh interpreter so the
+peak RSS of its ffmpeg children (RUSAGE_CHILDREN) is measured in isolation.
+"""
+
+import argparse
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def run_variant(variant: str, src: str, seconds: float, dest: str, chunk: float) -> None:
+    """Child-process entry point: render one reversed segment and print stats."""
+    import insomniax_autocut_v3 as autocut
+
+    t0 = time.perf_counter()
+    if variant == "full":
+        code = autocut.ffmpeg_cut(src, 0.0, seconds, dest, reverse=True)
+    else:
+        code = autocut.ffmpeg_cut_reversed_chunks(src, 0.0, seconds, dest, chunk)
+    wall = time.perf_counter() - t0
+    peak_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(json.dumps({"exit_code": code, "seconds": wall, "peak_mb": peak_kb / 1024}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="3840x2160")
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--variant", help=argparse.SUPPRESS)
+    parser.add_argument("--src", help=argparse.SUPPRESS)
+    parser.add_argument("--dest", help=argparse.SUPPRESS)
+    parser.add_argument("--chunk", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.src, args.seconds, args.dest, args.chunk)
+        return
+
+    if shutil.which("ffmpeg") is None:
+        raise SystemExit("ffmpeg not found on PATH")
+
+    import insomniax_autocut_v3 as autocut
+
+    width, height = (int(v) for v in args.size.split("x"))
+    chunk = max(autocut.REVERSE_MIN_CHUNK, autocut.REVERSE_MAX_PIXEL_SECONDS / (width * height))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "source.mp4"
+        subprocess.run(
+            [
+                "ffmpeg", "-y", "-f", "lavfi",
+                "-i", f"testsrc2=duration={args.seconds}:size={args.size}:rate=24",
+                "-c:v", "libx264", "-preset", "ultrafast", str(src),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+
+        for variant in ("full", "chunked"):
+            proc = subprocess.run(
+                [
+                    sys.executable, __file__,
+                    "--variant", variant,
+                    "--src", str(src),
+                    "--seconds", str(args.seconds),
+                    "--dest", str(Path(tmp) / f"{variant}.mp4"),
+                    "--chunk", str(chunk),
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=tmp,
+            )
+            stats = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(
+                f"{variant:>7}: peak ffmpeg RSS {stats['peak_mb']:8.1f} MB, "
+                f"{stats['seconds']:.2f}s, exit {stats['exit_code']}"
+            )
+        print(f"{args.size}, {args.seconds}s segment, chunk {chunk:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,28 @@ Context-aware generator for clip_map.json.
 
 Scans:
   • insomniax.json  → extracts keywords from scene descriptions
-  • footage/ folder → matches video files containing those keywords
+  • footage/ tree   → matches video files containing those keywords, via the
+                      persistent footage index (footage_index.py), so reruns
+                      only stat the tree and probe new or changed files
+  • --semantic      → keywords with no literal match take the footage file
+                      closest by embedding similarity (embedding_index.py)
 
 Result:
   A minimal, relevant clip_map.json for Insomniax Agent.
+
+Usage:
+    python clip_map_maker.py [--semantic [ENCODER]]
 """
 
+import argparse
 import json
 import re
 from pathlib import Path
 
+import embedding_index
+from footage_index import FootageIndex
+
 # ────────────────────────────────────────────────
-VIDEO_EXTS = {".mp4", ".mov", ".mkv"}
 CUE_SHEET = Path("insomniax.json")
 FOOTAGE_DIR = Path("footage")
 OUT_FILE = Path("clip_map.json")
@@ -39,40 +49,62 @@ def extract_scene_keywords(cue_path: Path) -> set[str]:
     return {w for w in words if len(w) > 2 and w not in blacklist}
 
 
-def scan_footage(folder: Path) -> dict[str, Path]:
-    """Return a mapping of lowercase token -> video path."""
-    clip_map = {}
+def scan_footage(folder: Path, index: FootageIndex | None = None) -> dict[str, Path]:
+    """Return a mapping of lowercase token -> video path (recursive, indexed)."""
     if not folder.exists():
         print(f"⚠️ Footage folder not found: {folder}")
-        return clip_map
+        return {}
+
+    own_index = index is None
+    index = index or FootageIndex()
+    try:
+        result = index.scan(folder)
+        print(f"🗂️  Footage index: {result.summary()}")
+        return {token: Path(path) for token, path in index.tokens(folder).items()}
+    finally:
+        if own_index:
+            index.close()
+
+
+def semantic_matches(words: list[str], footage: list[str],
+                     encoder: str = embedding_index.DEFAULT_ENCODER,
+                     min_score: float = embedding_index.MIN_SCORE) -> dict[str, str]:
+    """Closest footage file per word by embedding similarity, where close enough."""
+    if not words or not footage:
+        return {}
+    cache = embedding_index.EmbeddingCache(embedding_index.load_encoder(encoder))
+    matrix = cache.embed([embedding_index.clip_text("", path) for path in footage])
+    idx, scores = embedding_index.top_k(cache.embed(words), matrix, 1)
+    return {
+        word: footage[i]
+        for word, i, score in zip(words, idx[:, 0].tolist(), scores[:, 0].tolist())
+        if score >= min_score
+    }
 
-    for f in folder.iterdir():
-        if f.suffix.lower() not in VIDEO_EXTS:
-            continue
-        tokens = re.split(r"[_\-\s]+", f.stem.lower())
-        for t in tokens:
-            if len(t) > 2 and not t.isdigit():
-                clip_map[t] = f
-    return clip_map
 
+def make_clip_map(semantic: str | None = None):
+    """Generate the clip_map.json based on cue and footage matches.
 
-def make_clip_map():
-    """Generate the clip_map.json based on cue and footage matches."""
+    semantic: encoder spec for embedding matches of otherwise unmatched words
+    """
     scene_words = extract_scene_keywords(CUE_SHEET)
     print(f"🧠 Extracted {len(scene_words)} scene keywords from cue sheet")
 
-    footage_tokens = scan_footage(FOOTAGE_DIR)
-    print(f"🎞️  Found {len(footage_tokens)} candidate video tokens")
+    with FootageIndex() as index:
+        footage_tokens = scan_footage(FOOTAGE_DIR, index)
+        print(f"🎞️  Found {len(footage_tokens)} candidate video tokens")
+        final_map = index.lookup_many(sorted(scene_words), FOOTAGE_DIR)
 
-    final_map = {}
-    for word in scene_words:
-        matches = [v for k, v in footage_tokens.items() if word in k]
-        if matches:
-            final_map[word] = str(matches[0])
+        if semantic:
+            unmatched = sorted(scene_words - final_map.keys())
+            footage = [entry.path for entry in index.entries(FOOTAGE_DIR)]
+            extra = semantic_matches(unmatched, footage, semantic)
+            print(f"🔎 Semantic matches for {len(extra)} of {len(unmatched)} unmatched keywords")
+            final_map.update(extra)
 
     # fallback
     if "default" not in final_map and footage_tokens:
-        first = next(iter(footage_tokens.values()))
+        first = min(footage_tokens.values())
         final_map["default"] = str(first)
 
     OUT_FILE.write_text(json.dumps(final_map, indent=2))
@@ -80,4 +112,13 @@ def make_clip_map():
 
 
 if __name__ == "__main__":
-    make_clip_map()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument(
+        "--semantic",
+        nargs="?",
+        const=embedding_index.DEFAULT_ENCODER,
+        metavar="ENCODER",
+        help="also match keywords by embedding similarity "
+             "('hashing' by default, or 'sentence-transformers:<model>')",
+    )
+    make_clip_map(parser.parse_args().semantic)
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+clip_matcher.py
+Precompiled clip_map tag matching for the Insomniax renderer.
+
+- Builds an Aho-Corasick automaton over the lowercased clip_map tags once
+- Finds the first tag (in clip_map order) contained in a scene text in one
+  pass over the text, however many tags there are
+- Precomputes the default entry and the random-insert pool
+- Same choices as a linear scan: first matching tag wins, otherwise a 20%
+  random insert, otherwise the default entry, otherwise the first entry
+- Optionally takes a semantic (embedding) hit for scenes no tag matches
+  literally; it is used before falling back to random inserts
+"""
+
+import random
+from collections import deque
+
+RANDOM_INSERT_CHANCE = 0.2   # "wrong" inserts for dream-logic variety
+
+
+class ClipMatcher:
+    """clip_map compiled for repeated choose() calls."""
+
+    def __init__(self, clip_map: dict) -> None:
+        if not clip_map:
+            raise ValueError("clip_map is empty; populate clip_map.json before rendering")
+
+        self.paths = list(clip_map.values())
+        self.first = self.paths[0]
+        keys = list(clip_map)
+        self.default = next(
+            (clip_map[key] for key in keys if key.lower() == "default"), None
+        )
+        self.pool = [
+            path for key, path in clip_map.items()
+            if key.lower() != "default" or self.default is None
+        ]
+        if not self.pool and self.default is not None:
+            self.pool = [self.default]
+
+        # an empty tag is a substring of every scene
+        self._always = next((i for i, key in enumerate(keys) if key == ""), None)
+        self._build([key.lower() for key in keys])
+
+    def _build(self, tags: list[str]) -> None:
+        goto: list[dict[str, int]] = [{}]
+        best: list[int | None] = [None]   # lowest tag index ending at each node
+        for i, tag in enumerate(tags):
+            if not tag:
+                continue
+            node = 0
+            for ch in tag:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    best.append(None)
+                node = nxt
+            if best[node] is None:
+                best[node] = i
+
+        # failure links in BFS order; fold the best match of each suffix in
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f][ch] if ch in goto[f] and goto[f][ch] != nxt else 0
+                inherited = best[fail[nxt]]
+                if inherited is not None and (best[nxt] is None or inherited < best[nxt]):
+                    best[nxt] = inherited
+                queue.append(nxt)
+
+        self._goto, self._fail, self._best = goto, fail, best
+
+    def match(self, scene_text: str) -> int | None:
+        """Index (in clip_map order) of the first tag contained in scene_text."""
+        found = self._always
+        if found == 0:
+            return 0
+        goto, fail, best = self._goto, self._fail, self._best
+        node = 0
+        for ch in scene_text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = best[node]
+            if hit is not None and (found is None or hit < found):
+                found = hit
+                if found == 0:
+                    break
+        return found
+
+    def choose(self, scene_text: str, rng=random, semantic_hit: str | None = None) -> str:
+        """
+        Clip for a scene, with some randomness.
+
+        rng: anything with random()/choice(), e.g. a seeded random.Random
+        semantic_hit: clip judged closest by embedding similarity, if any
+        """
+        hit = self.match(scene_text)
+        if hit is not None:
+            return self.paths[hit]
+        if semantic_hit is not None:
+            return semantic_hit
+        if rng.random() < RANDOM_INSERT_CHANCE:
+            return rng.choice(self.pool)
+        if self.default is not None:
+            return self.default
+        return self.first
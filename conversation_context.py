@@ -0,0 +1,122 @@
+"""
+conversation_context.py
+Token-budgeted chat history for the Insomniax agent.
+
+- Tracks an approximate token count per message (≈ 4 characters per token)
+- Elides large tool / function results once they leave the recent window
+- Folds the oldest turns into a single summary message when over budget
+- Keeps tool results attached to the assistant message that requested them
+"""
+
+import json
+from typing import Callable
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4   # role / separators per message, as chat templates add them
+
+RESULT_ROLES = ("tool", "function")
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+
+def estimate_tokens(msg: dict) -> int:
+    """Cheap, tokenizer-free token estimate for one chat message."""
+    chars = len(msg.get("content") or "")
+    for call in msg.get("tool_calls") or []:
+        chars += len(json.dumps(call.get("function", {})))
+    if msg.get("function_call"):
+        chars += len(json.dumps(msg["function_call"]))
+    return MESSAGE_OVERHEAD + (chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def extractive_summary(messages: list[dict], max_chars: int = 1200) -> str:
+    """Offline summary: first line of each user request plus which tools ran."""
+    lines = []
+    for msg in messages:
+        role = msg.get("role")
+        if role == "system" and msg.get("content", "").startswith(SUMMARY_PREFIX):
+            lines.append(msg["content"][len(SUMMARY_PREFIX):].strip())
+        elif role == "user":
+            lines.append(f"- user: {(msg.get('content') or '').splitlines()[0][:160]}")
+        elif role in RESULT_ROLES:
+            first = (msg.get("content") or "").strip().splitlines()
+            lines.append(f"  {msg.get('name', 'tool')} → {first[0][:120] if first else ''}")
+        elif role == "assistant" and msg.get("content"):
+            lines.append(f"  assistant: {msg['content'].splitlines()[0][:120]}")
+    text = "\n".join(lines)
+    if len(text) > max_chars:
+        text = "…\n" + text[-max_chars:]
+    return text
+
+
+class ConversationContext:
+    """Chat history that stays under `budget_tokens` when compacted."""
+
+    def __init__(self, budget_tokens: int = 6000, keep_recent: int = 8,
+                 max_result_tokens: int = 300,
+                 summarizer: Callable[[list[dict]], str] = extractive_summary) -> None:
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.max_result_tokens = max_result_tokens
+        self.summarizer = summarizer
+        self.messages: list[dict] = []
+        self._tokens: list[int] = []
+
+    def append(self, msg: dict) -> None:
+        self.messages.append(msg)
+        self._tokens.append(estimate_tokens(msg))
+
+    def pop(self) -> dict:
+        self._tokens.pop()
+        return self.messages.pop()
+
+    def total_tokens(self) -> int:
+        return sum(self._tokens)
+
+    def _elide_old_results(self) -> None:
+        """Shorten big tool results that are no longer in the recent window."""
+        cutoff = max(0, len(self.messages) - self.keep_recent)
+        limit = self.max_result_tokens * CHARS_PER_TOKEN
+        for i in range(cutoff):
+            msg = self.messages[i]
+            content = msg.get("content") or ""
+            if msg.get("role") in RESULT_ROLES and len(content) > limit:
+                head = content[:limit]
+                self.messages[i] = {
+                    **msg,
+                    "content": f"{head}\n…[{len(content) - limit} characters elided]",
+                }
+                self._tokens[i] = estimate_tokens(self.messages[i])
+
+    def _fold_start(self) -> int:
+        """
+        Index of the first message to keep verbatim when summarizing.
+
+        Always a user message, so no tool result loses its tool call.
+        """
+        start = max(0, len(self.messages) - self.keep_recent)
+        while start < len(self.messages) and self.messages[start].get("role") != "user":
+            start += 1
+        if start >= len(self.messages):
+            # no user message in the recent window: keep from the last one
+            users = [i for i, m in enumerate(self.messages) if m.get("role") == "user"]
+            start = users[-1] if users else len(self.messages)
+        return start
+
+    def compact(self) -> bool:
+        """Bring the history back under budget; return True if anything changed."""
+        if self.total_tokens() <= self.budget_tokens:
+            return False
+        self._elide_old_results()
+        if self.total_tokens() <= self.budget_tokens:
+            return True
+
+        start = self._fold_start()
+        if start == 0:
+            return True
+        summary = {
+            "role": "system",
+            "content": f"{SUMMARY_PREFIX}\n{self.summarizer(self.messages[:start])}",
+        }
+        self.messages = [summary, *self.messages[start:]]
+        self._tokens = [estimate_tokens(summary), *self._tokens[start:]]
+        return True
@@ -0,0 +1,186 @@
+"""
+cue_store.py
+Long-lived, indexed cue sheet for the Insomniax agent.
+
+- Parses insomniax.json once and reloads only when the file changes on disk
+- Inverted token index over `scene` text for fast keyword lookups
+  (results are identical to a case-insensitive substring scan)
+- Edits mark the sheet dirty; flushes write a temp file and rename it over
+  the original, so readers never see a half-written cue sheet
+- `batch()` defers the flush until a group of edits is complete
+"""
+
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokens(text: str) -> set[str]:
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+class CueSheetStore:
+    """In-memory cue sheet backed by `path`."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.data: dict = {}
+        self._stamp: tuple[int, int, int] | None = None
+        self._index: dict[str, set[int]] = defaultdict(set)
+        self._dirty = False
+        self._batch_depth = 0
+        self._lock = threading.RLock()
+
+    # ── loading ──────────────────────────────────────────
+
+    def _disk_stamp(self) -> tuple[int, int, int] | None:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def refresh(self) -> bool:
+        """
+        Reload if the file changed on disk since it was last read or written.
+
+        Unflushed edits take precedence over external changes. Returns
+        whether the cue sheet exists.
+        """
+        with self._lock:
+            stamp = self._disk_stamp()
+            if stamp is None:
+                if not self._dirty:
+                    self.data, self._stamp = {}, None
+                    self._index.clear()
+                return self._dirty
+            if stamp != self._stamp and not self._dirty:
+                self.data = json.loads(self.path.read_text())
+                self._stamp = stamp
+                self._reindex()
+            return True
+
+    def _reindex(self) -> None:
+        self._index.clear()
+        for i, kf in enumerate(self.keyframes):
+            for tok in _tokens(kf.get("scene", "")):
+                self._index[tok].add(i)
+
+    @property
+    def keyframes(self) -> list[dict]:
+        return self.data.setdefault("keyframes", [])
+
+    # ── lookups ──────────────────────────────────────────
+
+    def find(self, keyword: str) -> list[int]:
+        """
+        Indices of keyframes whose scene contains `keyword` (case-insensitive).
+
+        Every word run inside the keyword lies inside some word of a matching
+        scene, so candidates come from index entries whose token contains the
+        keyword's longest word; each candidate is then checked directly.
+        """
+        with self._lock:
+            self.refresh()
+            needle = keyword.lower()
+            words = TOKEN_RE.findall(needle)
+            if not words:
+                candidates = range(len(self.keyframes))
+            else:
+                longest = max(words, key=len)
+                found: set[int] = set()
+                for tok, ids in self._index.items():
+                    if longest in tok:
+                        found |= ids
+                candidates = sorted(found)
+            return [
+                i for i in candidates
+                if needle in self.keyframes[i].get("scene", "").lower()
+            ]
+
+    # ── edits ────────────────────────────────────────────
+
+    def set_field(self, i: int, field: str, value: Any) -> None:
+        with self._lock:
+            kf = self.keyframes[i]
+            if field == "scene":
+                for tok in _tokens(kf.get("scene", "")):
+                    self._index[tok].discard(i)
+                for tok in _tokens(str(value)):
+                    self._index[tok].add(i)
+            kf[field] = value
+            self._dirty = True
+            self._autoflush()
+
+    def delete_field(self, i: int, field: str) -> None:
+        with self._lock:
+            kf = self.keyframes[i]
+            if field not in kf:
+                return
+            if field == "scene":
+                for tok in _tokens(kf.get("scene", "")):
+                    self._index[tok].discard(i)
+            del kf[field]
+            self._dirty = True
+            self._autoflush()
+
+    def update(self, i: int, fields: dict) -> None:
+        with self.batch():
+            for field, value in fields.items():
+                self.set_field(i, field, value)
+
+    def replace(self, data: dict) -> None:
+        """Swap in a whole new cue sheet (e.g. a restored version)."""
+        with self._lock:
+            self.data = data
+            self._reindex()
+            self._dirty = True
+            self._autoflush()
+
+    @contextmanager
+    def batch(self) -> Iterator["CueSheetStore"]:
+        """Group edits into a single flush at the end of the block."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                self._autoflush()
+
+    def _autoflush(self) -> None:
+        if self._batch_depth == 0:
+            self.flush()
+
+    def flush(self) -> bool:
+        """Atomically write pending edits; returns whether anything was written."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(self.data, indent=2))
+            os.replace(tmp, self.path)
+            self._stamp = self._disk_stamp()
+            self._dirty = False
+            return True
+
+
+_stores: dict[Path, CueSheetStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str | Path) -> CueSheetStore:
+    """The process-wide store for `path`."""
+    key = Path(path).resolve()
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = CueSheetStore(path)
+        return _stores[key]
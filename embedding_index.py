@@ -0,0 +1,227 @@
+"""
+embedding_index.py
+Local text-embedding index for semantic clip matching.
+
+- Pluggable encoders: anything with `name`, `dim` and `encode(texts)`;
+  HashingEncoder is a deterministic, dependency-free fallback (hashed words
+  + character trigrams), and `sentence-transformers:<model>` loads a real
+  model when that package is installed
+- Embeddings are cached per encoder and per text hash under
+  .insomniax_cache/embeddings/<encoder>/, as a float32 matrix that is
+  memory-mapped on read; only texts not seen before get encoded
+- `top_k` is a vectorized cosine search over a whole query batch
+- SemanticMatcher ranks clip_map entries (tag + filename tokens) against
+  scene text for insomniax_autocut_v3 and clip_map_maker (both opt-in)
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Protocol
+
+import numpy as np
+
+CACHE_DIR = Path(".insomniax_cache/embeddings")
+HASH_DIM = 512
+MIN_SCORE = 0.35   # cosine similarity below which a semantic match is ignored
+DEFAULT_ENCODER = "hashing"
+
+
+class Encoder(Protocol):
+    name: str   # identifies the vector space; part of the cache path
+    dim: int
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """(len(texts), dim) float32 embeddings."""
+
+
+def _words(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class HashingEncoder:
+    """
+    Feature-hashed bag of words and character trigrams, L2-normalized.
+
+    Deterministic across processes (blake2b, not hash()), so cached vectors
+    stay valid. It only knows spelling: "hallways" is close to "hallway",
+    but "bathroom" is not close to "sink"; plug in a real model for that.
+    """
+
+    def __init__(self, dim: int = HASH_DIM) -> None:
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> list[tuple[str, float]]:
+        feats = []
+        for word in _words(text):
+            feats.append((f"w:{word}", 1.0))
+            padded = f"<{word}>"
+            feats.extend((f"c:{padded[i:i + 3]}", 0.5) for i in range(len(padded) - 2))
+        return feats
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feat, weight in self._features(text):
+                digest = hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest()
+                h = int.from_bytes(digest, "little")
+                sign = 1.0 if h & 1 else -1.0
+                out[row, (h >> 1) % self.dim] += sign * weight
+        return normalize(out)
+
+
+class SentenceTransformerEncoder:
+    """Wraps a sentence-transformers model (optional dependency)."""
+
+    def __init__(self, model_name: str) -> None:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "sentence-transformers is not installed; use the 'hashing' encoder "
+                "or `pip install sentence-transformers`"
+            ) from e
+        self.model = SentenceTransformer(model_name)
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+        self.name = "st-" + re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+        return normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def load_encoder(spec: str = DEFAULT_ENCODER) -> Encoder:
+    """'hashing', 'hashing:<dim>' or 'sentence-transformers:<model>'."""
+    kind, _, arg = spec.partition(":")
+    if kind == "hashing":
+        return HashingEncoder(int(arg) if arg else HASH_DIM)
+    if kind == "sentence-transformers" and arg:
+        return SentenceTransformerEncoder(arg)
+    raise ValueError(f"unknown encoder {spec!r}; expected 'hashing[:dim]' "
+                     "or 'sentence-transformers:<model>'")
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def top_k(queries: np.ndarray, matrix: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cosine top-k of each query row against the (normalized) matrix rows.
+
+    Returns (indices, scores), each (len(queries), min(k, len(matrix))),
+    best first.
+    """
+    k = min(k, len(matrix))
+    if k == 0 or len(queries) == 0:
+        empty = np.zeros((len(queries), 0))
+        return empty.astype(np.int64), empty
+    sims = queries @ matrix.T
+    if k < sims.shape[1]:
+        idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.broadcast_to(np.arange(sims.shape[1]), sims.shape).copy()
+    scores = np.take_along_axis(sims, idx, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+class EmbeddingCache:
+    """Per-text-hash embedding store: vectors.f32 (memory-mapped) + index.json."""
+
+    def __init__(self, encoder: Encoder, root: str | Path | None = None) -> None:
+        self.encoder = encoder
+        self.dir = Path(root if root is not None else CACHE_DIR) / encoder.name
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.dir / "vectors.f32"
+        self.index_path = self.dir / "index.json"
+        self.encoded = 0   # texts this instance had to encode
+        self._lock = threading.Lock()
+        try:
+            self._rows: dict[str, int] = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            self._rows = {}
+        self._matrix: np.ndarray | None = None
+
+    def _row_bytes(self) -> int:
+        return self.encoder.dim * 4
+
+    def matrix(self) -> np.ndarray:
+        """Every cached vector, memory-mapped read-only."""
+        if self._matrix is None:
+            size = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+            rows = size // self._row_bytes()
+            if rows == 0:
+                self._matrix = np.zeros((0, self.encoder.dim), dtype=np.float32)
+            else:
+                self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                         shape=(rows, self.encoder.dim))
+        return self._matrix
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """(len(texts), dim) vectors; only texts not cached yet are encoded."""
+        keys = [text_key(t) for t in texts]
+        with self._lock:
+            missing = list(dict.fromkeys(k for k in keys if k not in self._rows))
+            if missing:
+                by_key = dict(zip(keys, texts))
+                fresh = np.ascontiguousarray(
+                    self.encoder.encode([by_key[k] for k in missing]), dtype=np.float32
+                )
+                with open(self.vectors_path, "ab") as f:
+                    # rows are addressed by file offset; bytes from an append
+                    # that never made it into the index are simply skipped
+                    f.seek(0, os.SEEK_END)
+                    first = f.tell() // self._row_bytes()
+                    f.truncate(first * self._row_bytes())
+                    f.write(fresh.tobytes())
+                self._rows.update((k, first + n) for n, k in enumerate(missing))
+                tmp = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(self._rows))
+                os.replace(tmp, self.index_path)
+                self.encoded += len(missing)
+                self._matrix = None
+            rows = np.fromiter((self._rows[k] for k in keys), dtype=np.int64, count=len(keys))
+            return np.asarray(self.matrix()[rows])
+
+
+def clip_text(tag: str, path: str) -> str:
+    """What a clip_map entry is 'about': its tag plus its filename tokens."""
+    stem = re.sub(r"[_\-\s]+", " ", Path(path).stem)
+    return f"{tag} {stem}".strip()
+
+
+class SemanticMatcher:
+    """Ranks clip_map entries against scene text by embedding similarity."""
+
+    def __init__(self, clip_map: dict, cache: EmbeddingCache,
+                 min_score: float = MIN_SCORE) -> None:
+        entries = [(tag, path) for tag, path in clip_map.items() if tag.lower() != "default"]
+        self.paths = [path for _, path in entries]
+        self.cache = cache
+        self.min_score = min_score
+        self.matrix = cache.embed([clip_text(tag, path) for tag, path in entries])
+
+    def best_many(self, texts: list[str]) -> list[str | None]:
+        """Best clip per text, or None where nothing scores min_score or more."""
+        if not texts:
+            return []
+        idx, scores = top_k(self.cache.embed(texts), self.matrix, 1)
+        if idx.shape[1] == 0:
+            return [None] * len(texts)
+        return [
+            self.paths[i] if score >= self.min_score else None
+            for i, score in zip(idx[:, 0].tolist(), scores[:, 0].tolist())
+        ]
+
+    def best(self, text: str) -> str | None:
+        return self.best_many([text])[0]
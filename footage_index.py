@@ -0,0 +1,265 @@
+"""
+footage_index.py
+Persistent footage index for clip_map_maker.
+
+- SQLite database (.insomniax_cache/footage.db) of every video file under
+  one or more footage roots: path, size, mtime, filename tokens and probed
+  duration / resolution / fps
+- Walks directory trees recursively, listing directories in parallel
+  (network shares are latency-bound, not CPU-bound)
+- Rescans are incremental: unchanged files (same size and mtime) keep their
+  tokens and probe results; only new or modified files are tokenized and
+  probed, and files that disappeared are dropped
+- Keyword → clip lookup goes through an index on the token table instead of
+  scanning every token
+"""
+
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterable, NamedTuple
+
+import media_probe
+
+INDEX_PATH = Path(".insomniax_cache/footage.db")
+VIDEO_EXTS = {".mp4", ".mov", ".mkv"}
+WALK_WORKERS = 16   # concurrent directory listings
+PROBE_WORKERS = 8   # concurrent ffprobe processes
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path      TEXT PRIMARY KEY,
+    root      TEXT NOT NULL,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    duration  REAL,
+    width     INTEGER,
+    height    INTEGER,
+    fps       REAL
+);
+CREATE INDEX IF NOT EXISTS files_root ON files(root);
+CREATE TABLE IF NOT EXISTS tokens (
+    token TEXT NOT NULL,
+    path  TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    PRIMARY KEY (token, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tokens_path ON tokens(path);
+"""
+
+
+class FootageEntry(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+    duration: float | None
+    width: int | None
+    height: int | None
+    fps: float | None
+
+
+class ScanResult(NamedTuple):
+    files: int       # video files seen
+    added: int
+    modified: int
+    removed: int
+    probed: int
+    seconds: float
+
+    def summary(self) -> str:
+        return (
+            f"{self.files} file(s): {self.added} added, {self.modified} modified, "
+            f"{self.removed} removed, {self.probed} probed in {self.seconds:.2f}s"
+        )
+
+
+def tokenize(path: str | Path) -> set[str]:
+    """Lowercase filename tokens, as clip_map_maker has always split them."""
+    return {
+        t for t in re.split(r"[_\-\s]+", Path(path).stem.lower())
+        if len(t) > 2 and not t.isdigit()
+    }
+
+
+def _list_dir(folder: str) -> tuple[list[tuple[str, int, int]], list[str]]:
+    """(video files with size/mtime, subdirectories) of one directory."""
+    files, dirs = [], []
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in VIDEO_EXTS:
+                        st = entry.stat()
+                        files.append((entry.path, st.st_size, st.st_mtime_ns))
+                except OSError:
+                    continue   # vanished mid-scan or unreadable
+    except OSError:
+        pass
+    return files, dirs
+
+
+def walk(root: str | Path, workers: int = WALK_WORKERS) -> list[tuple[str, int, int]]:
+    """Every video file under root as (path, size, mtime_ns), listing directories in parallel."""
+    found: list[tuple[str, int, int]] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_list_dir, str(root))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, dirs = future.result()
+                found.extend(files)
+                pending.update(pool.submit(_list_dir, d) for d in dirs)
+    return found
+
+
+class FootageIndex:
+    """SQLite-backed footage index; one instance per thread."""
+
+    def __init__(self, db_path: str | Path = INDEX_PATH,
+                 prober: Callable[[str], media_probe.StreamInfo | None] | None = None) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.prober = prober or media_probe.run_ffprobe_stream
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript(
+                "DROP TABLE IF EXISTS tokens; DROP TABLE IF EXISTS files;"
+            )
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "FootageIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ── scanning ────────────────────────────────────
+    def scan(self, root: str | Path, probe: bool = True,
+             workers: int = WALK_WORKERS) -> ScanResult:
+        """Bring the index up to date with everything under root."""
+        t0 = time.perf_counter()
+        root_key = str(root)
+        seen = walk(root, workers)
+        known = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self.conn.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE root = ?", (root_key,)
+            )
+        }
+
+        changed = [f for f in seen if known.get(f[0]) != (f[1], f[2])]
+        added = sum(1 for f in changed if f[0] not in known)
+        seen_paths = {f[0] for f in seen}
+        gone = [p for p in known if p not in seen_paths]
+
+        probes: dict[str, media_probe.StreamInfo | None] = {}
+        if probe and changed:
+            with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as pool:
+                paths = [f[0] for f in changed]
+                probes = dict(zip(paths, pool.map(self.prober, paths)))
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in gone))
+            for path, size, mtime_ns in changed:
+                info = probes.get(path)
+                self.conn.execute(
+                    "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET root = excluded.root, "
+                    "size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                    "duration = excluded.duration, width = excluded.width, "
+                    "height = excluded.height, fps = excluded.fps",
+                    (path, root_key, size, mtime_ns,
+                     *(info if info is not None else (None, None, None, None))),
+                )
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO tokens VALUES (?, ?)",
+                    ((token, path) for token in tokenize(path)),
+                )
+
+        return ScanResult(
+            files=len(seen),
+            added=added,
+            modified=len(changed) - added,
+            removed=len(gone),
+            probed=sum(1 for info in probes.values() if info is not None),
+            seconds=time.perf_counter() - t0,
+        )
+
+    # ── lookups ─────────────────────────────────────
+    # token matches are joined to files only to scope them to one root;
+    # results come out in (token, path) primary key order, so exact and
+    # prefix searches are index range scans that stop at the limit
+    _MATCH = (
+        "SELECT t.path FROM tokens t JOIN files f ON f.path = t.path "
+        "WHERE {cond} AND (:root IS NULL OR f.root = :root) "
+        "ORDER BY t.token, t.path LIMIT :limit"
+    )
+
+    def lookup(self, word: str, root: str | Path | None = None,
+               limit: int | None = None) -> list[str]:
+        """
+        Paths whose filename tokens contain `word`, best first: exact token
+        matches, then tokens starting with it (both via the token index),
+        then any token containing it. Within each tier, ordered by token,
+        then path.
+        """
+        params = {
+            "word": word.lower(),
+            "upper": word.lower() + "\U0010ffff",
+            "root": None if root is None else str(root),
+            "limit": -1 if limit is None else limit,
+        }
+        for cond in ("t.token = :word",
+                     "t.token > :word AND t.token < :upper",
+                     "instr(t.token, :word) > 0"):
+            rows = self.conn.execute(self._MATCH.format(cond=cond), params)
+            paths = list(dict.fromkeys(row[0] for row in rows))
+            if paths:
+                return paths
+        return []
+
+    def lookup_many(self, words: Iterable[str], root: str | Path | None = None) -> dict[str, str]:
+        """First lookup() hit for each word that has one."""
+        hits = {}
+        for word in words:
+            paths = self.lookup(word, root, limit=1)
+            if paths:
+                hits[word] = paths[0]
+        return hits
+
+    def get(self, path: str) -> FootageEntry | None:
+        row = self.conn.execute(
+            "SELECT path, size, mtime_ns, duration, width, height, fps FROM files WHERE path = ?",
+            (path,),
+        ).fetchone()
+        return FootageEntry(*row) if row else None
+
+    def entries(self, root: str | Path | None = None) -> list[FootageEntry]:
+        rows = self.conn.execute(
+            "SELECT path, size, mtime_ns, duration, width, height, fps FROM files "
+            "WHERE (:root IS NULL OR root = :root) ORDER BY path",
+            {"root": None if root is None else str(root)},
+        )
+        return [FootageEntry(*row) for row in rows]
+
+    def tokens(self, root: str | Path | None = None) -> dict[str, str]:
+        """token → first path carrying it (by path order)."""
+        rows = self.conn.execute(
+            "SELECT t.token, MIN(t.path) FROM tokens t JOIN files f ON f.path = t.path "
+            "WHERE (:root IS NULL OR f.root = :root) GROUP BY t.token",
+            {"root": None if root is None else str(root)},
+        )
+        return dict(rows.fetchall())
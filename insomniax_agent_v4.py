@@ -3,45 +3,78 @@ insomniax_agent_v4.py
 Local conversational editor + timeline synchronizer for Insomniax.
 
 Features:
-  • automatic versioning
+  • indexed in-memory cue sheet with atomic, batched writes
+  • automatic, delta-compressed versioning with retention
   • restoration of backups
-  • OTIO re-import sync from NLE timelines
-  • integration with LM Studio's OpenAI-compatible API
+  • background renders with progress tracking and cancellation
+  • incremental OTIO re-import sync from NLE timelines
+  • source clip metadata (duration, fps, resolution, codec) from cached ffprobe runs
+  • integration with LM Studio's OpenAI-compatible API (pooled, with timeouts + retry)
+  • streamed replies and concurrent execution of independent tool calls
+  • token-budgeted history: old tool results elided, older turns summarized
+  • byte-stable prompt prefix for server-side KV reuse; cached read-only tool results
 """
 
 import json
-import subprocess
 import pathlib
 import datetime
-import shutil
-
-import openai
-import opentimelineio as otio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import media_probe
+import otio_sync
+from conversation_context import ConversationContext
+from cue_store import CueSheetStore, get_store
+from lmstudio_client import LMStudioClient, LMStudioError
+from render_jobs import RenderJobManager
+from version_store import VersionStore, get_version_store
 
 # ── CONFIG ────────────────────────────────────────────────
 
 # LM Studio endpoint (OpenAI-compatible)
-openai.api_key = "not-needed"
-openai.api_base = "http://localhost:1234/v1"
+API_BASE = "http://localhost:1234/v1"
+REQUEST_TIMEOUT = (3.0, 120.0)   # (connect, read) seconds
+REQUEST_RETRIES = 3
+CACHE_PROMPT = True   # llama.cpp-style servers reuse the KV cache of an unchanged prefix
+MODEL = "mistral-7b-instruct"  # adjust to whatever model LM Studio serves
+TURN_LOG = pathlib.Path(".insomniax_cache/agent_turns.jsonl")
+CONTEXT_BUDGET_TOKENS = 6000   # history sent per turn stays under this estimate
+CONTEXT_KEEP_RECENT = 8        # newest messages that are never elided or summarized
+MAX_RESULT_TOKENS = 300        # older tool results are cut to this many tokens
 
 CUE_PATH = pathlib.Path("insomniax.json")
+CLIP_MAP_PATH = pathlib.Path("clip_map.json")
 VERSIONS_DIR = pathlib.Path("versions")
 VERSIONS_DIR.mkdir(exist_ok=True)
 
 FPS = 24
+RENDER_SEED = 0   # fixed seed → unchanged scenes reuse cached segments across renders
 DEFAULT_OTIO = pathlib.Path("insomniax_timeline_extended.otio")
+RENDER_COMMAND = ["python", "insomniax_autocut_v3.py"]
+RENDER_JOBS = RenderJobManager(pathlib.Path(".insomniax_cache/render_jobs"))
 
 
 # ── TOOL LOGIC ────────────────────────────────────────────
 
+def cue_store() -> CueSheetStore:
+    """The in-memory store for the current CUE_PATH."""
+    return get_store(CUE_PATH)
+
+
+def version_store() -> VersionStore:
+    """The version history kept in the current VERSIONS_DIR."""
+    return get_version_store(VERSIONS_DIR)
+
+
 def backup_cue_sheet() -> str:
-    """Copy the current cue sheet into versions/ with timestamp."""
-    if not CUE_PATH.exists():
+    """Record the current cue sheet as a timestamped version."""
+    store = cue_store()
+    if not store.refresh():
         return "No cue sheet found to back up."
     ts = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    backup = VERSIONS_DIR / f"insomniax_{ts}.json"
-    shutil.copy2(CUE_PATH, backup)
-    return str(backup)
+    return f"version {version_store().commit(store.data, ts)}"
 
 
 def update_cue_sheet(scene_keyword: str, field: str, new_value: str) -> str:
@@ -53,32 +86,57 @@ def update_cue_sheet(scene_keyword: str, field: str, new_value: str) -> str:
     new_value:     new value as string (you can store JSON-encoded structures)
     """
     backup = backup_cue_sheet()
-    if not CUE_PATH.exists():
+    store = cue_store()
+    if not store.refresh():
         return f"Backed up to {backup}, but {CUE_PATH} does not exist."
 
-    data = json.loads(CUE_PATH.read_text())
-    edits = 0
-    for kf in data.get("keyframes", []):
-        if scene_keyword.lower() in kf.get("scene", "").lower():
-            kf[field] = new_value
-            edits += 1
-
-    CUE_PATH.write_text(json.dumps(data, indent=2))
+    matches = store.find(scene_keyword)
+    with store.batch():
+        for i in matches:
+            store.set_field(i, field, new_value)
+    edits = len(matches)
     return f"Backed up to {backup}. Updated '{field}' in {edits} keyframe(s) containing '{scene_keyword}'."
 
 
-def render_video() -> str:
-    """Execute the auto-cut renderer script."""
-    subprocess.run(["python", "insomniax_autocut_v3.py"], check=False)
-    return "Rendering launched."
+def render_video(preempt: bool = False) -> str:
+    """
+    Submit the auto-cut renderer as a background job and return immediately.
+
+    preempt: cancel any running or queued render instead of queueing behind it
+    """
+    job = RENDER_JOBS.submit([*RENDER_COMMAND, "--seed", str(RENDER_SEED)], preempt=preempt)
+    ahead = RENDER_JOBS.jobs_ahead(job)
+    if ahead:
+        return f"Render job {job.id} queued behind {ahead} other render(s)."
+    return f"Render job {job.id} started in the background. Ask for render status to follow it."
+
+
+def render_status(job_id: str | None = None) -> str:
+    """Progress of one render job, or of all renders from this session."""
+    if job_id:
+        job = RENDER_JOBS.get(job_id)
+        return job.describe() if job else f"No render job {job_id}."
+    jobs = RENDER_JOBS.jobs()
+    if not jobs:
+        return "No renders submitted yet."
+    return "\n".join(job.describe() for job in jobs)
+
+
+def cancel_render(job_id: str | None = None) -> str:
+    """Cancel a queued or running render (default: every unfinished render)."""
+    targets = [job_id] if job_id else [job.id for job in RENDER_JOBS.active()]
+    cancelled = [jid for jid in targets if RENDER_JOBS.cancel(jid)]
+    if not cancelled:
+        return "Nothing to cancel."
+    return f"Cancelled render job(s): {', '.join(cancelled)}"
 
 
 def list_versions() -> str:
-    """Return a simple list of available backups in versions/."""
-    files = sorted(VERSIONS_DIR.glob("insomniax_*.json"))
-    if not files:
+    """Return the timestamps of all recorded versions, oldest first."""
+    ids = version_store().ids()
+    if not ids:
         return "No backups found."
-    return "\n".join(f.name for f in files)
+    return "\n".join(ids)
 
 
 def restore_version(timestamp: str) -> str:
@@ -87,58 +145,47 @@ def restore_version(timestamp: str) -> str:
 
     timestamp: e.g. '2025-11-05_21-44-13'
     """
-    fname = VERSIONS_DIR / f"insomniax_{timestamp}.json"
-    if not fname.exists():
+    try:
+        data = version_store().restore(timestamp)
+    except KeyError:
         return f"No version found for {timestamp}"
     backup = backup_cue_sheet()
-    shutil.copy2(fname, CUE_PATH)
-    return f"Restored {fname.name} → current cue sheet. (Previous live file saved as {backup})"
+    cue_store().replace(data)
+    return f"Restored version {timestamp} → current cue sheet. (Previous live file saved as {backup})"
 
 
 def sync_from_otio(otio_path: str | None = None) -> str:
     """
     Re-import a Resolve / OTIO timeline and update cue sheet timings.
     If otio_path is None, uses DEFAULT_OTIO.
+
+    Only keyframes whose clip changed since the last sync are written.
     """
     path = pathlib.Path(otio_path) if otio_path else DEFAULT_OTIO
     if not path.exists():
         return f"OTIO file not found at {path}"
 
-    backup = backup_cue_sheet()
-    timeline = otio.adapters.read_from_file(path)
-    if not CUE_PATH.exists():
+    backups = []
+    try:
+        result = otio_sync.sync_store(
+            cue_store(), path, before_write=lambda: backups.append(backup_cue_sheet())
+        )
+    except FileNotFoundError:
         return f"Timeline loaded from {path.name}, but cue sheet {CUE_PATH} does not exist."
 
-    data = json.loads(CUE_PATH.read_text())
-    keyframes = data.get("keyframes", [])
+    if not backups:
+        return f"{path.name} is already in sync ({result.summary()})."
+    return f"Synced {path.name}: {result.summary()}. Backup saved as {backups[0]}"
 
-    for i, clip in enumerate(timeline.find_clips()):
-        if i >= len(keyframes):
-            break
-        kf = keyframes[i]
-        src_range = clip.source_range
-        dur = src_range.duration.to_seconds()
-        start = src_range.start_time.to_seconds()
-
-        # store OTIO-derived timings
-        kf["otio_start"] = round(start, 3)
-        kf["otio_duration"] = round(dur, 3)
-        # refresh scene text from metadata if present
-        kf["scene"] = clip.metadata.get("scene_text", kf.get("scene", ""))
-
-        markers = [
-            {
-                "name": m.name,
-                "color": m.color,
-                "start_sec": round(m.marked_range.start_time.to_seconds(), 3)
-            }
-            for m in clip.markers
-        ]
-        if markers:
-            kf["otio_markers"] = markers
 
-    CUE_PATH.write_text(json.dumps(data, indent=2))
-    return f"Synced {len(keyframes)} scenes from {path.name}. Backup saved as {backup}"
+def probe_clips() -> str:
+    """Duration, frame rate, size, codec and keyframe count of every clip in clip_map.json."""
+    if not CLIP_MAP_PATH.exists():
+        return f"Clip map {CLIP_MAP_PATH} does not exist."
+    results = media_probe.probe_clip_map(CLIP_MAP_PATH)
+    if not results:
+        return f"{CLIP_MAP_PATH} lists no clips."
+    return "\n".join(media_probe.describe(path, info) for path, info in results.items())
 
 
 # ── FUNCTIONS SCHEMA FOR LLM ─────────────────────────────
@@ -159,8 +206,35 @@ FUNCTIONS = [
     },
     {
         "name": "render_video",
-        "description": "Execute the auto-cut renderer after edits are saved.",
-        "parameters": {"type": "object", "properties": {}}
+        "description": "Start the auto-cut renderer in the background after edits are saved.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "preempt": {
+                    "type": "boolean",
+                    "description": "Cancel running/queued renders instead of queueing behind them."
+                }
+            },
+            "required": []
+        }
+    },
+    {
+        "name": "render_status",
+        "description": "Show progress of background renders (segments done / total, timing summary when finished).",
+        "parameters": {
+            "type": "object",
+            "properties": {"job_id": {"type": "string"}},
+            "required": []
+        }
+    },
+    {
+        "name": "cancel_render",
+        "description": "Cancel a queued or running render; without job_id cancels all unfinished renders.",
+        "parameters": {
+            "type": "object",
+            "properties": {"job_id": {"type": "string"}},
+            "required": []
+        }
     },
     {
         "name": "list_versions",
@@ -184,17 +258,237 @@ FUNCTIONS = [
             "properties": {"otio_path": {"type": "string"}},
             "required": []
         }
+    },
+    {
+        "name": "probe_clips",
+        "description": "Show duration, frame rate, resolution, codec and keyframe count of every source clip in clip_map.json.",
+        "parameters": {"type": "object", "properties": {}}
     }
 ]
 
 
+TOOLS = [{"type": "function", "function": f} for f in FUNCTIONS]
+
+# Shared state each tool reads / writes. Calls that touch disjoint state run
+# concurrently; conflicting calls keep the order the model asked for them.
+# Backups only ever add files to versions/, so they are not tracked.
+TOOL_ACCESS: dict[str, tuple[set[str], set[str]]] = {
+    "update_cue_sheet": ({"cue"}, {"cue"}),
+    "restore_version": ({"cue"}, {"cue"}),
+    "sync_from_otio": ({"cue"}, {"cue"}),
+    "render_video": ({"cue"}, {"renders"}),
+    "render_status": ({"renders"}, set()),
+    "cancel_render": ({"renders"}, {"renders"}),
+    "list_versions": (set(), set()),
+    "probe_clips": (set(), set()),
+}
+
+
+# Sent first on every request and never changed at runtime, so it and the
+# tool schema form a byte-identical prefix the server can reuse. Anything
+# that varies (history summary, user turns, tool results) comes after it.
+SYSTEM_PROMPT = (
+    "You are the Insomniax editing assistant. You edit the Insomniax cue sheet, "
+    "manage its versioned backups, sync it with OTIO timelines and run renders "
+    "by calling the provided tools. Prefer tools over guessing, and keep replies short."
+)
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+# Read-only, idempotent tools whose results are reused while the cue sheet
+# and versions/ are unchanged.
+CACHEABLE_TOOLS = {"list_versions"}
+TOOL_CACHE_SIZE = 64
+_tool_cache: OrderedDict[str, str] = OrderedDict()
+_tool_cache_lock = threading.Lock()
+
+
 # ── AGENT LOOP ───────────────────────────────────────────
 
 
+def request_messages(history: list[dict]) -> list[dict]:
+    """Static prefix first, then the conversation."""
+    return [SYSTEM_MESSAGE, *history]
+
+
+def state_fingerprint() -> str:
+    """
+    Cheap cache key for the cue sheet and version state: the cue sheet's
+    stat plus the version store's generation, so a lookup never reads files.
+    """
+    try:
+        st = CUE_PATH.stat()
+        cue = f"{st.st_mtime_ns}:{st.st_size}"
+    except OSError:
+        cue = "<no cue sheet>"
+    return f"{cue}|{VERSIONS_DIR}:{version_store().generation}"
+
+
+def tool_cache_key(fn_name: str, args: dict) -> str:
+    return f"{fn_name}|{json.dumps(args, sort_keys=True)}|{state_fingerprint()}"
+
+
+def collect_stream(chunks, on_text=None) -> tuple[dict, float | None]:
+    """
+    Assemble streamed completion chunks into one assistant message.
+
+    Text deltas are passed to on_text as they arrive. Handles both
+    `tool_calls` deltas (possibly several calls) and legacy `function_call`
+    deltas. Returns the message and the perf_counter() time of the first
+    content or tool-call token (None if nothing arrived).
+    """
+    msg: dict = {"role": "assistant", "content": ""}
+    calls: dict[int, dict] = {}
+    legacy: dict | None = None
+    first_token = None
+
+    for chunk in chunks:
+        choices = chunk.get("choices") or []
+        if not choices:
+            continue
+        delta = choices[0].get("delta") or {}
+        if first_token is None and (
+            delta.get("content") or delta.get("tool_calls") or delta.get("function_call")
+        ):
+            first_token = time.perf_counter()
+
+        if delta.get("content"):
+            msg["content"] += delta["content"]
+            if on_text is not None:
+                on_text(delta["content"])
+
+        for tc in delta.get("tool_calls") or []:
+            slot = calls.setdefault(
+                tc.get("index", len(calls)),
+                {"id": "", "type": "function", "function": {"name": "", "arguments": ""}},
+            )
+            if tc.get("id"):
+                slot["id"] = tc["id"]
+            fn = tc.get("function") or {}
+            slot["function"]["name"] += fn.get("name") or ""
+            slot["function"]["arguments"] += fn.get("arguments") or ""
+
+        if delta.get("function_call"):
+            fc = delta["function_call"]
+            if legacy is None:
+                legacy = {"name": "", "arguments": ""}
+            legacy["name"] += fc.get("name") or ""
+            legacy["arguments"] += fc.get("arguments") or ""
+
+    if calls:
+        msg["tool_calls"] = [calls[i] for i in sorted(calls)]
+        for n, call in enumerate(msg["tool_calls"]):
+            call["id"] = call["id"] or f"call_{n}"
+    if legacy is not None:
+        msg["function_call"] = legacy
+    return msg, first_token
+
+
+def requested_calls(msg: dict) -> list[tuple[str | None, str, str]]:
+    """(tool_call_id, name, raw JSON arguments) for every call in msg."""
+    if msg.get("tool_calls"):
+        return [
+            (c["id"], c["function"]["name"], c["function"].get("arguments") or "{}")
+            for c in msg["tool_calls"]
+        ]
+    if msg.get("function_call"):
+        fc = msg["function_call"]
+        return [(None, fc["name"], fc.get("arguments") or "{}")]
+    return []
+
+
+def call_tool(fn_name: str, args_raw: str) -> str:
+    try:
+        args = json.loads(args_raw)
+    except json.JSONDecodeError:
+        args = {}
+    key = tool_cache_key(fn_name, args) if fn_name in CACHEABLE_TOOLS else None
+    if key is not None:
+        with _tool_cache_lock:
+            hit = _tool_cache.get(key)
+            if hit is not None:
+                _tool_cache.move_to_end(key)
+                print(f"→ {fn_name}({args}) [cached]")
+                return hit
+
+    print(f"→ calling {fn_name}({args})")
+    try:
+        func = globals()[fn_name]
+        result = str(func(**args))
+    except Exception as e:  # noqa: BLE001
+        return f"Error executing {fn_name}: {e}"
+
+    if key is not None:
+        with _tool_cache_lock:
+            _tool_cache[key] = result
+            while len(_tool_cache) > TOOL_CACHE_SIZE:
+                _tool_cache.popitem(last=False)
+    return result
+
+
+def _conflicts(a: str, b: str) -> bool:
+    unknown = (set(), {"*"})   # tools without an entry conflict with everything
+    ra, wa = TOOL_ACCESS.get(a, unknown)
+    rb, wb = TOOL_ACCESS.get(b, unknown)
+    if "*" in wa or "*" in wb:
+        return True
+    return bool(wa & (rb | wb) or wb & (ra | wa))
+
+
+def schedule_calls(names: list[str]) -> list[list[int]]:
+    """Group call indices into batches that may run concurrently, in order."""
+    batches: list[list[int]] = []
+    for i, name in enumerate(names):
+        if batches and not any(_conflicts(name, names[j]) for j in batches[-1]):
+            batches[-1].append(i)
+        else:
+            batches.append([i])
+    return batches
+
+
+def execute_tool_calls(calls: list[tuple[str | None, str, str]]) -> list[str]:
+    """Run the requested calls, independent ones concurrently; results keep call order."""
+    results: list[str] = [""] * len(calls)
+    for batch in schedule_calls([name for _, name, _ in calls]):
+        if len(batch) == 1:
+            i = batch[0]
+            results[i] = call_tool(calls[i][1], calls[i][2])
+            continue
+        with ThreadPoolExecutor(max_workers=len(batch)) as pool:
+            futures = {i: pool.submit(call_tool, calls[i][1], calls[i][2]) for i in batch}
+        for i, fut in futures.items():
+            results[i] = fut.result()
+    return results
+
+
+def log_turn(ttft: float | None, total: float, tool_calls: int,
+             context_tokens: int | None = None) -> None:
+    """Append one turn's latency numbers to TURN_LOG."""
+    TURN_LOG.parent.mkdir(parents=True, exist_ok=True)
+    record = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "ttft": round(ttft, 3) if ttft is not None else None,
+        "turn_seconds": round(total, 3),
+        "tool_calls": tool_calls,
+        "context_tokens": context_tokens,
+    }
+    with TURN_LOG.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
 def main() -> None:
     print("Insomniax Agent v4 connected to LM Studio.\nType 'exit' to quit.\n")
 
-    history: list[dict] = []
+    client = LMStudioClient(
+        API_BASE,
+        connect_timeout=REQUEST_TIMEOUT[0],
+        read_timeout=REQUEST_TIMEOUT[1],
+        max_retries=REQUEST_RETRIES,
+    )
+    history = ConversationContext(
+        budget_tokens=CONTEXT_BUDGET_TOKENS,
+        keep_recent=CONTEXT_KEEP_RECENT,
+        max_result_tokens=MAX_RESULT_TOKENS,
+    )
 
     while True:
         try:
@@ -206,34 +500,47 @@ def main() -> None:
             break
 
         history.append({"role": "user", "content": user})
-        resp = openai.ChatCompletion.create(
-            model="mistral-7b-instruct",  # adjust to whatever model LM Studio serves
-            messages=history,
-            functions=FUNCTIONS
+        history.compact()
+        t0 = time.perf_counter()
+        stream = client.chat_stream(
+            model=MODEL,
+            messages=request_messages(history.messages),
+            tools=TOOLS,
+            cache_prompt=CACHE_PROMPT,
         )
-        msg = resp["choices"][0]["message"]
-
-        if msg.get("function_call"):
-            fn_name = msg["function_call"]["name"]
-            args_raw = msg["function_call"].get("arguments") or "{}"
-            try:
-                args = json.loads(args_raw)
-            except json.JSONDecodeError:
-                args = {}
-            print(f"→ calling {fn_name}({args})")
-            try:
-                func = globals()[fn_name]
-                result = func(**args)
-            except Exception as e:  # noqa: BLE001
-                result = f"Error executing {fn_name}: {e}"
-
-            history.append(msg)
-            history.append({"role": "function", "name": fn_name, "content": result})
+        try:
+            msg, first_token = collect_stream(stream, on_text=lambda t: print(t, end="", flush=True))
+        except LMStudioError as e:
+            print(f"\n⚠️ LM Studio request failed: {e}\n")
+            history.pop()   # drop the unanswered user message so the turn can be retried
+            continue
+        if msg["content"]:
+            print("\n")
+        history.append(msg)
+
+        calls = requested_calls(msg)
+        for (call_id, fn_name, _), result in zip(calls, execute_tool_calls(calls)):
+            if call_id is None:
+                history.append({"role": "function", "name": fn_name, "content": result})
+            else:
+                history.append(
+                    {"role": "tool", "tool_call_id": call_id, "name": fn_name, "content": result}
+                )
             print(f"✔ {result}\n")
+
+        ttft = first_token - t0 if first_token is not None else None
+        total = time.perf_counter() - t0
+        log_turn(ttft, total, len(calls), history.total_tokens())
+        print(f"(first token {ttft if ttft is not None else float('nan'):.2f}s, turn {total:.2f}s)\n")
+
+    for job in RENDER_JOBS.active():
+        if job.state == "queued":
+            RENDER_JOBS.cancel(job.id)
+            print(f"Dropped queued render job {job.id}.")
         else:
-            reply = msg.get("content", "") or ""
-            print(f"{reply}\n")
-            history.append(msg)
+            print(f"Render job {job.id} keeps running in the background (log: {job.log_path}).")
+    print(client.stats.summary())
+    client.close()
 
 
 if __name__ == "__main__":
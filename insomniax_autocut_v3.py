@@ -5,16 +5,45 @@ Semi-controlled jump-cut generator for Insomniax.
 - Reads a cue sheet (insomniax.json)
 - Detects beats from an audio track (soundtrack_mix.wav)
 - Auto-chooses the correct source clip for each scene based on clip_map.json
+  (literal tags, optionally semantic matches from embedding_index)
 - Performs random keep/jump/reverse/black-flash actions per beat
+- Probes every source clip once (duration, fps, keyframes, codec) and clamps
+  cuts that would run past the end of a clip before they are encoded
+- Reuses previously encoded segments from a persistent content-addressed cache
+- Stream-copies plain segments that start on a source keyframe instead of
+  re-encoding, when the source's stream format matches the encoded segments
+- Can stop after planning and write the edit decision list (EDL) for later renders
+- Writes a JSON-lines timing report per render and prints a profile summary
+- Can publish segments to a shared render queue (render_queue.py) so worker
+  processes on this and other machines encode them; this process then
+  collects the results and runs the final concat
 """
 
+import argparse
+import datetime
+import hashlib
 import json
 import os
 import random
+import shutil
 import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
 from pathlib import Path
+from typing import NamedTuple
 
-import librosa
+import numpy as np
+
+import beat_analysis
+import embedding_index
+import media_probe
+import render_queue
+from clip_matcher import ClipMatcher
+from render_report import RenderReport
+from segment_cache import SegmentCache
 
 # ---------------- CONFIG ----------------
 CUE_SHEET = "insomniax.json"           # cue sheet JSON
@@ -22,118 +51,709 @@ CLIP_MAP = "clip_map.json"             # maps scene tags to video paths
 AUDIO_TRACK = "soundtrack_mix.wav"     # main soundtrack audio file
 OUT_DIR = "segments_v3"
 OUT_VIDEO = "insomniax_autocut_v3.mp4"
+REPORT_NAME = "render_report.jsonl"   # written inside OUT_DIR unless --report is given
+RENDER_WORKERS = os.cpu_count() or 1   # concurrent ffmpeg_cut jobs
+SEGMENT_CACHE_DIR = ".insomniax_cache/segments"
+SEGMENT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+KEYFRAME_SNAP_TOLERANCE = 0.05   # seconds a cut may move to land on a keyframe
+COPY_CODECS = {"h264"}            # codecs the stream-copy fast path is tried for
+# ffmpeg's reverse filter buffers every decoded frame of its input. Above this
+# many pixel-seconds (≈150 MB of 1080p yuv420 at 24 fps) reversed segments are
+# cut into chunks that are reversed one at a time and joined back-to-front.
+REVERSE_MAX_PIXEL_SECONDS = 1920 * 1080 * 2.0
+REVERSE_MIN_CHUNK = 0.25   # seconds; keeps process count sane on 8K sources
+BLOCK_SECONDS = 3.0   # each keyframe is a 3-second logical block
+SEMANTIC_MIN_SCORE = embedding_index.MIN_SCORE   # --semantic match threshold
+QUEUE_WORKER_ROUNDS = 3   # --queue gives up after this many worker rounds claim nothing
+FILTERGRAPH_FALLBACK_FRAME = (1920, 1080, 24)   # filtergraph output when no source probes
 
+ACTIONS = ["keep", "jumpcut", "black", "reverse"]
+ACTION_WEIGHTS = [3, 4, 1, 2]
 
-def ffmpeg_cut(src: str, start: float, end: float, dest: str,
-               reverse: bool = False, flash: bool = False) -> None:
-    """Cut a segment from src between start and end seconds, apply optional FX."""
+# Rough single-core encode seconds per second of output, per action, plus a
+# fixed per-process cost; only used to rank and budget plans, not to schedule
+ENCODE_COST_PER_SECOND = {"keep": 1.0, "jumpcut": 1.0, "black": 1.1, "reverse": 1.8}
+ENCODE_SPAWN_COST = 0.15
+EDL_VERSION = 1
+
+# One row per planned segment: beat-aligned in/out before jump-cut trimming
+PLAN_DTYPE = np.dtype([
+    ("keyframe", np.int32),
+    ("beat", np.int32),      # index of the segment's first beat within its keyframe
+    ("start", np.float64),
+    ("end", np.float64),
+    ("action", np.int8),     # index into ACTIONS
+])
+
+
+class SegmentJob(NamedTuple):
+    """One planned beat segment: what to cut from where, and into which file."""
+    src: str
+    start: float
+    end: float
+    dest: str
+    reverse: bool = False
+    flash: bool = False
+    action: str = "keep"
+
+
+class Plan(NamedTuple):
+    """Array-backed edit plan: PLAN_DTYPE rows plus the clip chosen per keyframe."""
+    rows: np.ndarray
+    sources: list[str]
+
+
+# Encoded segments have a fixed stream format, so stream-copied source GOPs
+# can be checked against it before they are concat-copied next to them
+ENCODE_PROFILE = "baseline"              # ultrafast never uses High features anyway
+ENCODE_PIX_FMT = "yuv420p"
+ENCODE_ARGS = ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "20",
+               "-profile:v", ENCODE_PROFILE, "-pix_fmt", ENCODE_PIX_FMT]
+TRACK_TIMESCALE = 90000                  # every segment, encoded or copied, is muxed at 1/90000
+MUX_ARGS = ["-video_track_timescale", str(TRACK_TIMESCALE)]
+FLASH_FILTER = "fade=out:st=0:d=0.03:alpha=1,fade=in:st=0.03:d=0.03:alpha=1"
+
+
+def segment_filters(reverse: bool = False, flash: bool = False) -> list[str]:
+    """Video filters implementing a segment's FX, shared by both render engines."""
     vf = []
     if reverse:
         vf.append("reverse")
     if flash:
-        vf.append("fade=out:st=0:d=0.03:alpha=1,fade=in:st=0.03:d=0.03:alpha=1")
+        vf.append(FLASH_FILTER)
+    return vf
+
+
+def ffmpeg_cut(src: str, start: float, end: float, dest: str,
+               reverse: bool = False, flash: bool = False) -> int:
+    """Cut a segment from src between start and end seconds, apply optional FX.
+
+    Returns the ffmpeg exit code.
+    """
+    vf = segment_filters(reverse, flash)
     vfopt = ",".join(vf) if vf else "null"
     cmd = [
         "ffmpeg", "-y",
         "-ss", f"{start:.3f}", "-to", f"{end:.3f}",
         "-i", src,
         "-vf", vfopt,
-        "-c:v", "libx264", "-preset", "ultrafast",
-        "-crf", "20",
+        *ENCODE_ARGS,
+        *MUX_ARGS,
         "-an",
         dest,
     ]
-    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return proc.returncode
 
 
-def choose_clip(scene_text: str, clip_map: dict) -> str:
-    """Choose an appropriate clip based on scene text, with some randomness."""
-    if not clip_map:
-        raise ValueError("clip_map is empty; populate clip_map.json before rendering")
+def choose_clip(scene_text: str, clip_map: dict, rng=random,
+                semantic: embedding_index.SemanticMatcher | None = None) -> str:
+    """Choose an appropriate clip based on scene text, with some randomness.
 
-    scene_text = scene_text.lower()
-    for tag, path in clip_map.items():
-        if tag.lower() in scene_text:
-            return path
+    rng: anything with random()/choice(), e.g. a seeded random.Random
+    semantic: consulted when no tag matches literally
 
-    default_entry = next(
-        (clip_map[key] for key in clip_map if key.lower() == "default"),
-        None,
-    )
+    One-off convenience; build_plan compiles the clip_map once with ClipMatcher.
+    """
+    hit = semantic.best(scene_text) if semantic is not None else None
+    return ClipMatcher(clip_map).choose(scene_text, rng, hit)
 
-    # 20% chance of random "wrong" insert for dream-logic variety
-    if random.random() < 0.2:
-        pool = [
-            path
-            for key, path in clip_map.items()
-            if key.lower() != "default" or default_entry is None
-        ]
-        if not pool and default_entry is not None:
-            pool = [default_entry]
-        return random.choice(pool)
 
-    if default_entry is not None:
-        return default_entry
+def keyframe_rng(seed: int, index: int) -> random.Random:
+    """Independent, reproducible RNG for one keyframe of a seeded render."""
+    digest = hashlib.sha256(f"{seed}:{index}".encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
 
-    # fallback: first entry
-    return next(iter(clip_map.values()))
 
+def bucket_beats(beat_times, n_keyframes: int, block: float = BLOCK_SECONDS) -> np.ndarray:
+    """
+    Index bounds of each keyframe's beats in one pass over the sorted beats.
 
-def main() -> None:
-    # Load cue sheet and clip map
-    cue = json.loads(Path(CUE_SHEET).read_text())
-    clip_map = json.loads(Path(CLIP_MAP).read_text())
+    Keyframe i owns beat_times[bounds[i]:bounds[i + 1]], i.e. the beats with
+    i * block <= b < (i + 1) * block.
+    """
+    edges = np.arange(n_keyframes + 1, dtype=np.float64) * block
+    return np.searchsorted(np.asarray(beat_times, dtype=np.float64), edges, side="left")
 
-    # Analyze beats from audio
-    y, sr = librosa.load(AUDIO_TRACK, sr=None)
-    tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
-    beat_times = librosa.frames_to_time(beats, sr=sr)
-    print(f"BPM: {tempo:.2f}, Beats: {len(beat_times)}")
 
-    os.makedirs(OUT_DIR, exist_ok=True)
+def build_plan(cue: dict, clip_map: dict, beat_times,
+               seed: int | None = None, block: float = BLOCK_SECONDS,
+               semantic: embedding_index.SemanticMatcher | None = None) -> Plan:
+    """Decide source clip, beat range and action for every segment, without rendering.
 
-    segments: list[str] = []
+    beat_times must be sorted. With a seed, every keyframe draws from its own
+    seeded RNG, so editing one scene leaves the choices (and cached segments)
+    of all others intact. With a semantic matcher, scenes that match no tag
+    literally take the closest clip by embedding similarity, if close enough.
+    """
+    keyframes = cue.get("keyframes", [])
+    n = len(keyframes)
+    beats = np.asarray(beat_times, dtype=np.float64)
+    bounds = bucket_beats(beats, n, block)
+    counts = np.diff(bounds)
 
-    # Each keyframe is treated as a 3-second logical block by default
-    for i, kf in enumerate(cue.get("keyframes", [])):
-        seg_start, seg_end = i * 3.0, i * 3.0 + 3.0
-        seg_beats = [b for b in beat_times if seg_start <= b < seg_end]
-        if not seg_beats:
-            seg_beats = [seg_start, seg_end]
-
-        src = choose_clip(kf.get("scene", ""), clip_map)
-        print(f"[{i}] {kf.get('scene', '')[:40]}... → {os.path.basename(src)}")
-
-        for j, bt in enumerate(seg_beats[:-1]):
-            act = random.choices(
-                ["keep", "jumpcut", "black", "reverse"],
-                weights=[3, 4, 1, 2],
-            )[0]
-            start, end = bt, seg_beats[j + 1]
-            name = f"{OUT_DIR}/{i:02d}_{j:03d}_{act}.mp4"
-
-            if end <= start:
-                continue
-
-            if act == "jumpcut":
-                trim = min(0.15, max(0.05, (end - start) / 4.0))
-                start, end = start + trim, end - trim
-
-            ffmpeg_cut(
-                src,
+    # consecutive beat pairs that fall inside the same keyframe window
+    owner = np.repeat(np.arange(n), counts)
+    first = bounds[0]
+    pair = np.flatnonzero(owner[:-1] == owner[1:])
+    pair_kf = owner[pair]
+    pair_rows = np.empty(len(pair), dtype=PLAN_DTYPE)
+    pair_rows["keyframe"] = pair_kf
+    pair_rows["beat"] = first + pair - bounds[pair_kf]
+    pair_rows["start"] = beats[first + pair]
+    pair_rows["end"] = beats[first + pair + 1]
+
+    # keyframes without any beat become one segment spanning the whole block
+    empty = np.flatnonzero(counts == 0)
+    empty_rows = np.zeros(len(empty), dtype=PLAN_DTYPE)
+    empty_rows["keyframe"] = empty
+    empty_rows["start"] = empty * block
+    empty_rows["end"] = empty * block + block
+
+    rows = np.concatenate([pair_rows, empty_rows])
+    rows = rows[np.lexsort((rows["beat"], rows["keyframe"]))]
+
+    # clip and action choices stay sequential per keyframe so a seeded
+    # render draws exactly the same random sequence as before
+    row_bounds = np.searchsorted(rows["keyframe"], np.arange(n + 1), side="left")
+    matcher = ClipMatcher(clip_map) if keyframes else None
+    scenes = [kf.get("scene", "") for kf in keyframes]
+    if semantic is not None:
+        # one batched embedding lookup; unchanged scenes come from the cache
+        semantic_hits = semantic.best_many(scenes)
+    else:
+        semantic_hits = [None] * len(scenes)
+    sources: list[str] = []
+    codes: list[int] = []
+    for i, scene in enumerate(scenes):
+        rng = keyframe_rng(seed, i) if seed is not None else random
+        sources.append(matcher.choose(scene, rng, semantic_hits[i]))
+        for _ in range(row_bounds[i], row_bounds[i + 1]):
+            codes.append(ACTIONS.index(rng.choices(ACTIONS, weights=ACTION_WEIGHTS)[0]))
+    rows["action"] = codes
+
+    rows = rows[rows["end"] > rows["start"]]
+    return Plan(rows, sources)
+
+
+def plan_jobs(plan: Plan) -> list[SegmentJob]:
+    """Turn plan rows into concrete ffmpeg_cut jobs (jump-cut trims, file names)."""
+    jobs: list[SegmentJob] = []
+    for kf, j, start, end, code in plan.rows.tolist():
+        act = ACTIONS[code]
+        name = f"{OUT_DIR}/{kf:02d}_{j:03d}_{act}.mp4"
+
+        if act == "jumpcut":
+            trim = min(0.15, max(0.05, (end - start) / 4.0))
+            start, end = start + trim, end - trim
+
+        jobs.append(
+            SegmentJob(
+                plan.sources[kf],
                 start,
                 end,
                 name,
                 reverse=(act == "reverse"),
                 flash=(act == "black"),
+                action=act,
             )
-            segments.append(name)
+        )
+    return jobs
+
+
+def plan_segments(cue: dict, clip_map: dict, beat_times, seed: int | None = None,
+                  semantic: embedding_index.SemanticMatcher | None = None) -> list[SegmentJob]:
+    """Plan every segment of the cut and print the clip chosen per keyframe."""
+    plan = build_plan(cue, clip_map, beat_times, seed=seed, semantic=semantic)
+    for i, kf in enumerate(cue.get("keyframes", [])):
+        print(f"[{i}] {kf.get('scene', '')[:40]}... → {os.path.basename(plan.sources[i])}")
+    return plan_jobs(plan)
+
+
+def estimate_cost(job: SegmentJob) -> float:
+    """Estimated encode cost of one segment, in single-core seconds."""
+    per_second = ENCODE_COST_PER_SECOND.get(job.action, 1.0)
+    return ENCODE_SPAWN_COST + per_second * max(0.0, job.end - job.start)
+
+
+def write_edl(jobs: list[SegmentJob], path: str | Path, seed: int | None = None) -> float:
+    """
+    Serialize the edit decision list for `jobs`; return the total estimated cost.
+
+    `.npz` paths get a compact binary EDL, anything else is written as JSON.
+    """
+    path = Path(path)
+    costs = [estimate_cost(job) for job in jobs]
+    meta = {
+        "version": EDL_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "cue_sheet": CUE_SHEET,
+        "seed": seed,
+        "segment_count": len(jobs),
+        "estimated_cost": round(sum(costs), 3),
+    }
+
+    if path.suffix == ".npz":
+        sources = sorted({job.src for job in jobs})
+        np.savez_compressed(
+            path,
+            version=np.array(EDL_VERSION, dtype=np.int32),
+            meta=np.array(json.dumps(meta)),
+            sources=np.array(sources, dtype=str),
+            src=np.array([sources.index(job.src) for job in jobs], dtype=np.int32),
+            start=np.array([job.start for job in jobs], dtype=np.float64),
+            end=np.array([job.end for job in jobs], dtype=np.float64),
+            action=np.array([ACTIONS.index(job.action) for job in jobs], dtype=np.int8),
+            dest=np.array([job.dest for job in jobs], dtype=str),
+            cost=np.array(costs, dtype=np.float32),
+        )
+        return meta["estimated_cost"]
+
+    meta["segments"] = [
+        {
+            "src": job.src,
+            "in": round(job.start, 6),
+            "out": round(job.end, 6),
+            "action": job.action,
+            "dest": job.dest,
+            "estimated_cost": round(cost, 3),
+        }
+        for job, cost in zip(jobs, costs)
+    ]
+    path.write_text(json.dumps(meta, indent=2))
+    return meta["estimated_cost"]
+
+
+def read_edl(path: str | Path) -> list[SegmentJob]:
+    """Load the jobs of an EDL written by write_edl, in plan order."""
+    path = Path(path)
+    if path.suffix == ".npz":
+        with np.load(path) as z:
+            # files from before the scalar existed carry the version in meta only
+            if "version" in z.files:
+                version = int(z["version"])
+            else:
+                version = json.loads(str(z["meta"])).get("version")
+            if version != EDL_VERSION:
+                raise ValueError(f"Unsupported EDL version in {path}: {version}")
+            sources = z["sources"].tolist()
+            rows = zip(z["src"].tolist(), z["start"].tolist(), z["end"].tolist(),
+                       z["action"].tolist(), z["dest"].tolist())
+            entries = [(sources[s], a, b, ACTIONS[c], d) for s, a, b, c, d in rows]
+    else:
+        data = json.loads(path.read_text())
+        if data.get("version") != EDL_VERSION:
+            raise ValueError(f"Unsupported EDL version in {path}: {data.get('version')}")
+        entries = [
+            (seg["src"], seg["in"], seg["out"], seg["action"], seg["dest"])
+            for seg in data["segments"]
+        ]
+
+    return [
+        SegmentJob(src, start, end, dest,
+                   reverse=(act == "reverse"), flash=(act == "black"), action=act)
+        for src, start, end, act, dest in entries
+    ]
+
+
+def ffmpeg_copy(src: str, start: float, end: float, dest: str) -> int:
+    """Stream-copy src between start and end seconds; start should be a keyframe.
+
+    Returns the ffmpeg exit code.
+    """
+    cmd = [
+        "ffmpeg", "-y",
+        "-ss", f"{start:.3f}", "-to", f"{end:.3f}",
+        "-i", src,
+        "-map", "0:v:0",
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        *MUX_ARGS,
+        "-an",
+        dest,
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return proc.returncode
+
+
+def reverse_chunks(start: float, end: float, chunk: float) -> list[tuple[float, float]]:
+    """Split [start, end) into consecutive pieces of at most `chunk` seconds."""
+    pieces = []
+    a = start
+    while end - a > 1e-6:
+        b = min(end, a + chunk)
+        pieces.append((a, b))
+        a = b
+    return pieces
+
+
+def reverse_chunk_seconds(job: SegmentJob) -> float | None:
+    """Chunk length for a memory-bounded reverse of `job`, or None to reverse in one go."""
+    if not job.reverse:
+        return None
+    info = media_probe.probe(job.src)
+    if info is None or not info.width or not info.height:
+        return None
+    pixels = info.width * info.height
+    if (job.end - job.start) * pixels <= REVERSE_MAX_PIXEL_SECONDS:
+        return None
+    return max(REVERSE_MIN_CHUNK, REVERSE_MAX_PIXEL_SECONDS / pixels)
+
+
+def ffmpeg_cut_reversed_chunks(src: str, start: float, end: float, dest: str,
+                               chunk: float) -> int:
+    """
+    Reverse src[start:end] into dest without buffering the whole segment.
+
+    Each chunk is reversed on its own and the chunks are concatenated
+    last-to-first. Returns the first non-zero ffmpeg exit code, or 0.
+    """
+    parts_dir = Path(f"{dest}.parts")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        parts = []
+        for n, (a, b) in enumerate(reverse_chunks(start, end, chunk)):
+            part = parts_dir / f"{n:03d}.mp4"
+            code = ffmpeg_cut(src, a, b, str(part), reverse=True)
+            if code:
+                return code
+            parts.append(part)
+
+        list_path = parts_dir / "list.txt"
+        with list_path.open("w", encoding="utf-8") as f:
+            for part in reversed(parts):
+                f.write(f"file '{part.name}'\n")
+        proc = subprocess.run(
+            [
+                "ffmpeg", "-y",
+                "-f", "concat", "-safe", "0",
+                "-i", str(list_path),
+                "-c", "copy",
+                dest,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return proc.returncode
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+def clamp_jobs(jobs: list[SegmentJob],
+               probes: dict[str, media_probe.ProbeInfo | None]) -> tuple[list[SegmentJob], int]:
+    """
+    Move cuts that run past the end of their source clip back inside it.
+
+    Sources that could not be probed are left alone. Returns the jobs and
+    how many were changed.
+    """
+    clamped = []
+    changed = 0
+    for job in jobs:
+        info = probes.get(job.src)
+        if info is not None:
+            start, end = media_probe.clamp_range(job.start, job.end, info.duration)
+            if (start, end) != (job.start, job.end):
+                job = job._replace(start=start, end=end)
+                changed += 1
+        clamped.append(job)
+    return clamped, changed
+
+
+class StreamFormat(NamedTuple):
+    """What concat -c copy needs to agree on between neighbouring segments."""
+    codec: str
+    profile: str
+    pix_fmt: str
+    width: int
+    height: int
+    time_base: str
+
+
+def encoded_format(info: media_probe.ProbeInfo) -> StreamFormat:
+    """Stream format ENCODE_ARGS / MUX_ARGS give a segment encoded from this source."""
+    # ffprobe reports libx264's baseline profile with its constraint flag set
+    return StreamFormat("h264", "Constrained Baseline", ENCODE_PIX_FMT,
+                        info.width, info.height, f"1/{TRACK_TIMESCALE}")
+
+
+def copied_format(info: media_probe.ProbeInfo) -> StreamFormat:
+    """Stream format of a segment stream-copied from this source."""
+    time_base = info.time_base
+    num, _, den = time_base.partition("/")
+    if num == "1" and den.isdigit() and int(den) and TRACK_TIMESCALE % int(den) == 0:
+        # remuxed at TRACK_TIMESCALE without rounding any timestamp
+        time_base = f"1/{TRACK_TIMESCALE}"
+    return StreamFormat(info.codec, info.profile, info.pix_fmt,
+                        info.width, info.height, time_base)
+
+
+def copy_compatible(info: media_probe.ProbeInfo) -> bool:
+    """True when a copied GOP of this source can be concat-copied with encoded segments."""
+    return info.codec in COPY_CODECS and copied_format(info) == encoded_format(info)
+
+
+def stream_copy_start(job: SegmentJob) -> float | None:
+    """
+    Keyframe-snapped start time when `job` can be stream-copied, else None.
+
+    Only FX-free segments from sources whose stream format matches the
+    encoded segments qualify (the concat demuxer keeps the first segment's
+    codec parameters for all of them); reversed, flashed and mid-GOP
+    segments are always re-encoded.
+    """
+    if job.reverse or job.flash:
+        return None
+    info = media_probe.probe(job.src)
+    if info is None or not copy_compatible(info):
+        return None
+    start = media_probe.snap_to_keyframe(info.keyframes, job.start, KEYFRAME_SNAP_TOLERANCE)
+    if start is None or start >= job.end:
+        return None
+    return start
+
+
+class RenderStats:
+    """Thread-safe per-render counters for the segment pool."""
 
-    # Concatenate segments
+    def __init__(self) -> None:
+        self.copied = 0
+        self.encoded = 0
+        self._lock = threading.Lock()
+
+    def record(self, copied: bool) -> None:
+        with self._lock:
+            if copied:
+                self.copied += 1
+            else:
+                self.encoded += 1
+
+    def summary(self) -> str:
+        total = self.copied + self.encoded
+        share = 100.0 * self.copied / total if total else 0.0
+        return f"Stream-copy fast path: {self.copied}/{total} segment(s) ({share:.1f}%)"
+
+
+def _run_job(job: SegmentJob, cache: SegmentCache | None = None,
+             stats: RenderStats | None = None, stream_copy: bool = False,
+             report: RenderReport | None = None) -> str | None:
+    """Render one job (or reuse it from cache); return an error description, or None."""
+    t0 = time.perf_counter()
+    copy_start = stream_copy_start(job) if stream_copy else None
+    if copy_start is not None:
+        job = job._replace(start=copy_start)
+    mode = "copy" if copy_start is not None else "encode"
+
+    def done(mode: str, code: int | None, error: str | None = None) -> str | None:
+        if stats is not None and error is None:
+            stats.record(copy_start is not None)
+        if report is not None:
+            report.segment(job.dest, job.src, mode, time.perf_counter() - t0, code, error)
+        return error
+
+    key = None
+    if cache is not None:
+        key = cache.key(job.src, job.start, job.end, reverse=job.reverse, flash=job.flash,
+                        copy=copy_start is not None)
+        if key is not None and cache.fetch(key, job.dest):
+            return done("cache", 0)
+        # never let ffmpeg overwrite a file that is hard-linked into the cache
+        Path(job.dest).unlink(missing_ok=True)
+    chunk = reverse_chunk_seconds(job)
+    if chunk is not None:
+        mode = "chunked"
+    try:
+        if copy_start is not None:
+            code = ffmpeg_copy(job.src, job.start, job.end, job.dest)
+        elif chunk is not None:
+            code = ffmpeg_cut_reversed_chunks(job.src, job.start, job.end, job.dest, chunk)
+        else:
+            code = ffmpeg_cut(
+                job.src,
+                job.start,
+                job.end,
+                job.dest,
+                reverse=job.reverse,
+                flash=job.flash,
+            )
+    except Exception as e:  # noqa: BLE001
+        return done(mode, None, str(e))
+    if code:
+        return done(mode, code, f"ffmpeg exited with {code}")
+    if key is not None and os.path.exists(job.dest):
+        try:
+            cache.store(key, job.dest)
+        except OSError:
+            pass   # caching is best-effort; the segment itself rendered fine
+    return done(mode, code or 0)
+
+
+def render_segments(
+    jobs: list[SegmentJob],
+    workers: int = RENDER_WORKERS,
+    cache: SegmentCache | None = None,
+    stats: RenderStats | None = None,
+    stream_copy: bool = False,
+    report: RenderReport | None = None,
+) -> tuple[list[str], list[tuple[SegmentJob, str]]]:
+    """
+    Run ffmpeg_cut for every job, up to `workers` at a time, reusing
+    cached segments when a cache is given and stream-copying keyframe-aligned
+    plain segments when stream_copy is set.
+
+    Returns the rendered segment paths in plan order and a list of
+    (job, error) pairs for the segments that failed.
+    """
+    if workers <= 1:
+        errors = [_run_job(job, cache, stats, stream_copy, report) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            errors = list(pool.map(
+                lambda job: _run_job(job, cache, stats, stream_copy, report), jobs
+            ))
+
+    segments = [job.dest for job, err in zip(jobs, errors) if err is None]
+    failures = [(job, err) for job, err in zip(jobs, errors) if err is not None]
+    return segments, failures
+
+
+def make_segment_cache() -> SegmentCache:
+    return SegmentCache(
+        Path(SEGMENT_CACHE_DIR),
+        max_bytes=SEGMENT_CACHE_MAX_BYTES,
+        salt=json.dumps([ENCODE_ARGS, MUX_ARGS, FLASH_FILTER]),
+    )
+
+
+class _SegmentRecord:
+    """Stands in for RenderReport inside a queue worker: keeps the one segment record."""
+
+    def __init__(self) -> None:
+        self.record: dict = {}
+
+    def segment(self, dest: str, src: str, mode: str, seconds: float,
+                exit_code: int | None, error: str | None = None) -> None:
+        self.record = {"mode": mode, "seconds": round(seconds, 4), "exit_code": exit_code}
+
+
+_worker_cache: SegmentCache | None = None
+
+
+def render_queued_segment(job: dict, cache: bool = True,
+                          stream_copy: bool = True) -> tuple[str | None, dict]:
+    """render_queue handler: render one published SegmentJob in a worker process."""
+    global _worker_cache
+    if cache and _worker_cache is None:
+        _worker_cache = make_segment_cache()
+    seg = SegmentJob(**job)
+    os.makedirs(os.path.dirname(seg.dest) or ".", exist_ok=True)
+    record = _SegmentRecord()
+    stats = RenderStats()
+    error = _run_job(seg, _worker_cache if cache else None, stats, stream_copy, record)
+    # mode is "cache" for cache hits, so report copies separately for RenderStats
+    return error, {**record.record, "copied": stats.copied > 0}
+
+
+def render_via_queue(
+    jobs: list[SegmentJob],
+    queue_path: str,
+    local_workers: int = RENDER_WORKERS,
+    stream_copy: bool = True,
+    use_cache: bool = True,
+    stats: RenderStats | None = None,
+    report: RenderReport | None = None,
+    handler: str = render_queue.DEFAULT_HANDLER,
+    lease_seconds: float = render_queue.LEASE_SECONDS,
+) -> tuple[list[str], list[tuple[SegmentJob, str]]]:
+    """
+    Publish `jobs` to the render queue and wait until workers have finished them.
+
+    Starts `local_workers` worker processes for the batch, restarting them
+    with exponential back-off if they all die while work remains. After
+    QUEUE_WORKER_ROUNDS rounds in a row in which no local worker claimed a
+    segment (e.g. they fail at startup), the open segments are failed
+    instead of restarting forever. Workers on other machines may join with
+    `python render_queue.py worker QUEUE --batch ID`. Returns the same
+    (segments, failures) as render_segments, and fills `stats` from the
+    workers' results.
+    """
+    queue = render_queue.RenderQueue(queue_path, lease_seconds=lease_seconds)
+    batch = queue.publish(job._asdict() for job in jobs)
+    print(f"Published {len(jobs)} segment(s) to {queue_path} as batch {batch}")
+    cmd = [
+        sys.executable, render_queue.__file__, "worker", os.path.abspath(queue_path),
+        "--batch", batch, "--exit-when-idle", "--project", os.getcwd(),
+        "--lease", str(lease_seconds), "--handler", handler,
+    ]
+    if not use_cache:
+        cmd.append("--no-cache")
+    if not stream_copy:
+        cmd.append("--no-stream-copy")
+
+    procs: list[subprocess.Popen] = []
+    owners: list[str] = []      # lease owner names of the latest round of workers
+    fruitless = 0               # rounds in a row that claimed nothing
+    next_round = 0.0
+    outcomes: dict[int, render_queue.Outcome] = {}
+    try:
+        while True:
+            # count open segments before collecting outcomes: a segment that
+            # finishes in between is then still collected on this pass
+            remaining = queue.open_count(batch)
+            fresh = queue.outcomes(batch, set(outcomes))
+            for outcome in fresh.values():
+                result = outcome.result or {}
+                if stats is not None and outcome.state == render_queue.DONE:
+                    stats.record(result.get("copied", result.get("mode") == "copy"))
+                if report is not None:
+                    report.segment(outcome.job["dest"], outcome.job["src"],
+                                   result.get("mode", "queue"), result.get("seconds", 0.0),
+                                   result.get("exit_code"), outcome.error)
+            outcomes.update(fresh)
+            if remaining == 0 or len(outcomes) == len(jobs):
+                break
+            procs = [proc for proc in procs if proc.poll() is None]
+            if not procs and local_workers > 0 and time.monotonic() >= next_round:
+                if owners and queue.claimed_by(batch, owners) == 0:
+                    fruitless += 1
+                else:
+                    fruitless = 0
+                if fruitless >= QUEUE_WORKER_ROUNDS:
+                    queue.fail_open(batch, f"local render workers exited {fruitless} "
+                                           "time(s) in a row without claiming a segment")
+                    continue
+                procs = [subprocess.Popen(cmd) for _ in range(local_workers)]
+                owners = [render_queue.worker_id(proc.pid) for proc in procs]
+                next_round = time.monotonic() + render_queue.POLL_SECONDS * 2 ** fruitless
+            time.sleep(render_queue.POLL_SECONDS)
+        for proc in procs:
+            proc.wait()
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+        queue.purge(batch)
+        queue.close()
+
+    by_seq = {o.seq: o for o in outcomes.values()}
+    segments, failures = [], []
+    for n, job in enumerate(jobs):
+        outcome = by_seq.get(n)
+        if outcome is None:
+            failures.append((job, "no outcome recorded in the render queue"))
+        elif outcome.state == render_queue.DONE:
+            segments.append(job.dest)
+        else:
+            failures.append((job, outcome.error or "failed"))
+    return segments, failures
+
+
+def concat_segments(segments: list[str], out_video: str) -> None:
+    """Write the concat list for `segments` and stitch them into out_video."""
     list_path = Path(OUT_DIR) / "list.txt"
     with list_path.open("w", encoding="utf-8") as f:
         for s in segments:
-            f.write(f"file '{os.path.basename(s)}'\n")
+            f.write(f"file '{os.path.relpath(s, OUT_DIR)}'\n")
 
     subprocess.run(
         [
@@ -147,14 +767,294 @@ def main() -> None:
             str(list_path),
             "-c",
             "copy",
-            OUT_VIDEO,
+            out_video,
         ],
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
     )
 
+
+def output_frame(jobs: list[SegmentJob],
+                 probes: dict[str, media_probe.ProbeInfo | None]) -> tuple[int, int, Fraction]:
+    """
+    Frame size and rate of a filtergraph render: those of the first source
+    that could be probed (every other source is scaled and retimed to it).
+    """
+    for job in jobs:
+        info = probes.get(job.src)
+        if info is not None and info.width and info.height and info.fps:
+            # yuv420p needs even dimensions
+            return info.width & ~1, info.height & ~1, Fraction(info.fps).limit_denominator(1001)
+    width, height, fps = FILTERGRAPH_FALLBACK_FRAME
+    return width, height, Fraction(fps)
+
+
+def filtergraph_passes(jobs: list[SegmentJob]) -> list[tuple[str, float, list[int]]]:
+    """
+    Group jobs into forward passes over their sources: (src, seek, job indices).
+
+    Plan order is time order for every keyframe's beats, so one pass per
+    distinct source is the norm. A job that starts before the previous job
+    of its source's pass opens a new pass, so no pass ever has to hold frames
+    for a segment that concat only reaches much later.
+    """
+    passes: list[tuple[str, float, list[int]]] = []
+    current: dict[str, int] = {}   # src → index of its open pass
+    for n, job in enumerate(jobs):
+        p = current.get(job.src)
+        if p is None or job.start < jobs[passes[p][2][-1]].start:
+            current[job.src] = p = len(passes)
+            passes.append((job.src, round(job.start, 3), []))
+        passes[p][2].append(n)
+    return passes
+
+
+def build_filtergraph(jobs: list[SegmentJob],
+                      frame: tuple[int, int, Fraction] | None = None) -> tuple[list[str], str]:
+    """
+    Build ffmpeg input arguments and a single filter_complex graph for `jobs`.
+
+    Each forward pass over a source is one input, seeked to its first
+    segment and fanned out with split. Every segment is trimmed, scaled and
+    padded to `frame` (width, height, fps; default FILTERGRAPH_FALLBACK_FRAME)
+    with square pixels, then reversed / flashed, before one concat filter
+    joins them in plan order into the [out] pad.
+    """
+    width, height, fps = frame or output_frame(jobs, {})
+    normalize = [
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease:force_divisible_by=2",
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+        "setsar=1",
+        f"fps={fps}",
+    ]
+    inputs: list[str] = []
+    chains: list[str] = []
+    labels: dict[int, str] = {}   # job index → pad carrying its source frames
+    seeks: dict[int, float] = {}
+    for p, (src, seek, members) in enumerate(filtergraph_passes(jobs)):
+        inputs += ["-ss", f"{seek:.3f}", "-i", src]
+        seeks.update((n, seek) for n in members)
+        if len(members) == 1:
+            labels[members[0]] = f"[{p}:v]"
+            continue
+        outs = [f"[s{n}]" for n in members]
+        chains.append(f"[{p}:v]split={len(members)}{''.join(outs)}")
+        labels.update(zip(members, outs))
+
+    for n, job in enumerate(jobs):
+        # input timestamps restart at 0 at the pass's seek point
+        start = round(job.start, 3) - seeks[n]
+        vf = [f"trim=start={start:.3f}:duration={job.end - job.start:.3f}",
+              "setpts=PTS-STARTPTS", *normalize]
+        vf += segment_filters(job.reverse, job.flash)
+        vf.append("format=yuv420p")
+        chains.append(f"{labels[n]}{','.join(vf)}[v{n}]")
+
+    pads = "".join(f"[v{n}]" for n in range(len(jobs)))
+    chains.append(f"{pads}concat=n={len(jobs)}:v=1:a=0[out]")
+    return inputs, ";\n".join(chains)
+
+
+def render_filtergraph(jobs: list[SegmentJob], out_video: str,
+                       probes: dict[str, media_probe.ProbeInfo | None] | None = None) -> int:
+    """Render the whole plan with one ffmpeg process and one encode.
+
+    Returns the ffmpeg exit code.
+    """
+    inputs, graph = build_filtergraph(jobs, output_frame(jobs, probes or {}))
+    # the graph for a full cue sheet easily exceeds command-line limits
+    script_path = Path(OUT_DIR) / "filtergraph.txt"
+    script_path.write_text(graph, encoding="utf-8")
+
+    cmd = [
+        "ffmpeg", "-y",
+        *inputs,
+        "-filter_complex_script", str(script_path),
+        "-map", "[out]",
+        *ENCODE_ARGS,
+        "-an",
+        out_video,
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return proc.returncode
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Insomniax beat-synced auto-cut renderer")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=RENDER_WORKERS,
+        help=f"concurrent ffmpeg segment jobs (default: CPU count, {RENDER_WORKERS})",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["segments", "filtergraph"],
+        default="segments",
+        help="'segments' encodes one MP4 per beat and concat-copies them; "
+             "'filtergraph' renders the whole cut in a single ffmpeg encode",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="seed per-keyframe clip/action choices so re-renders are reproducible",
+    )
+    parser.add_argument(
+        "--semantic",
+        nargs="?",
+        const=embedding_index.DEFAULT_ENCODER,
+        metavar="ENCODER",
+        help="match scenes without a literal clip_map tag by embedding similarity "
+             "('hashing' by default, or 'sentence-transformers:<model>')",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always re-encode segments instead of reusing the segment cache",
+    )
+    parser.add_argument(
+        "--no-stream-copy",
+        action="store_true",
+        help="re-encode keyframe-aligned keep segments instead of stream-copying them",
+    )
+    parser.add_argument(
+        "--queue",
+        nargs="?",
+        const=render_queue.QUEUE_PATH,
+        metavar="DB",
+        help="segments engine: publish segments to a shared render queue and let worker "
+             f"processes render them (default queue: {render_queue.QUEUE_PATH})",
+    )
+    parser.add_argument(
+        "--local-workers",
+        type=int,
+        default=RENDER_WORKERS,
+        metavar="N",
+        help="worker processes started on this machine with --queue (0: remote workers only)",
+    )
+    parser.add_argument(
+        "--report",
+        metavar="JSONL",
+        help=f"where to write the per-stage / per-segment timing report "
+             f"(default: {REPORT_NAME} in the segments directory)",
+    )
+    plan_mode = parser.add_mutually_exclusive_group()
+    plan_mode.add_argument(
+        "--plan-only",
+        metavar="EDL",
+        help="write the edit decision list (.json, or .npz for binary) and exit without rendering",
+    )
+    plan_mode.add_argument(
+        "--from-plan",
+        metavar="EDL",
+        help="render exactly the segments of a previously written EDL",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv if argv is not None else [])
+    report = RenderReport(args.report or Path(OUT_DIR) / REPORT_NAME)
+    try:
+        render(args, report)
+    finally:
+        print(report.close())
+
+
+def render(args: argparse.Namespace, report: RenderReport) -> None:
+    """Plan and/or render according to the parsed command line."""
+    if args.from_plan:
+        with report.stage("load_plan"):
+            jobs = read_edl(args.from_plan)
+        print(f"Loaded {len(jobs)} planned segment(s) from {args.from_plan}")
+    else:
+        # Load cue sheet and clip map
+        with report.stage("load"):
+            cue = json.loads(Path(CUE_SHEET).read_text())
+            clip_map = json.loads(Path(CLIP_MAP).read_text())
+
+        # Analyze beats from audio (cached, shared with the OTIO exporter)
+        with report.stage("beat_analysis"):
+            analysis = beat_analysis.analyze(AUDIO_TRACK)
+        beat_times = analysis.beat_times
+        print(f"BPM: {analysis.tempo:.2f}, Beats: {len(beat_times)}")
+
+        # Plan every segment up front, then render them
+        with report.stage("plan"):
+            semantic = None
+            if args.semantic:
+                embeddings = embedding_index.EmbeddingCache(
+                    embedding_index.load_encoder(args.semantic)
+                )
+                semantic = embedding_index.SemanticMatcher(clip_map, embeddings, SEMANTIC_MIN_SCORE)
+            jobs = plan_segments(cue, clip_map, beat_times, seed=args.seed, semantic=semantic)
+
+        if args.plan_only:
+            cost = write_edl(jobs, args.plan_only, seed=args.seed)
+            print(f"Planned {len(jobs)} segment(s), est. encode cost {cost:.1f}s → {args.plan_only}")
+            return
+
+    # Probe every source once, concurrently, and keep cuts inside their clips
+    with report.stage("probe"):
+        probes = media_probe.probe_many({job.src for job in jobs})
+        jobs, clamped = clamp_jobs(jobs, probes)
+    if clamped:
+        print(f"Clamped {clamped} segment(s) that ran past the end of their source clip")
+
+    report.event("plan", segments=len(jobs), engine=args.engine, clamped=clamped)
+    os.makedirs(OUT_DIR, exist_ok=True)
+    for parent in {os.path.dirname(job.dest) for job in jobs}:
+        os.makedirs(parent or ".", exist_ok=True)
+
+    if args.engine == "filtergraph":
+        with report.stage("filtergraph"):
+            code = render_filtergraph(jobs, OUT_VIDEO, probes) if jobs else 0
+        if code:
+            print(f"Filtergraph render failed (ffmpeg exited with {code})")
+            return
+    else:
+        cache = None
+        if not args.no_cache:
+            cache = make_segment_cache()
+        stats = RenderStats()
+        with report.stage("segments"):
+            if args.queue:
+                segments, failures = render_via_queue(
+                    jobs,
+                    args.queue,
+                    local_workers=args.local_workers,
+                    stream_copy=not args.no_stream_copy,
+                    use_cache=not args.no_cache,
+                    stats=stats,
+                    report=report,
+                )
+            else:
+                segments, failures = render_segments(
+                    jobs,
+                    workers=args.workers,
+                    cache=cache,
+                    stats=stats,
+                    stream_copy=not args.no_stream_copy,
+                    report=report,
+                )
+        for job, err in failures:
+            print(f"Segment failed: {os.path.basename(job.dest)} ({err})")
+        if failures:
+            print(f"{len(failures)} of {len(jobs)} segment(s) failed and were left out of the cut")
+
+        # Concatenate segments
+        with report.stage("concat"):
+            concat_segments(segments, OUT_VIDEO)
+
+        print(stats.summary())
+        if cache is not None:
+            cache.evict()
+            if not args.queue:
+                print(cache.summary())
+
     print(f"Rendered auto-cut → {OUT_VIDEO}")
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
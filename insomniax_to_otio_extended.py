@@ -5,15 +5,36 @@ Converts insomniax.json cue sheet into a rich OpenTimelineIO timeline.
 Adds:
   • main video track from keyframes
   • audio track for the main soundtrack
-  • beat markers from audio analysis
+  • beat markers from audio analysis (all beats, downbeats, one per bar, or none)
   • FX / jump-cut annotations as markers
+
+Clip and beat ranges are computed up front as arrays. Media available ranges
+come from probing the rendered segments and the soundtrack (media_probe), with
+the 3-second block length only as a fallback for media that is not there yet.
+.otio files are written by a streamed JSON writer without building OTIO
+objects; .otioz / .otiod bundles go through the OTIO adapters. Export time and
+size are reported.
+
+Usage:
+    python insomniax_to_otio_extended.py [--markers all|downbeats|bar|none]
+                                         [--beats-per-bar 4] [--out timeline.otio]
 """
 
+import argparse
 import json
+import os
+import time
 from pathlib import Path
+from typing import Iterator, NamedTuple
 
-import librosa
+import numpy as np
 import opentimelineio as otio
+from opentimelineio.adapters.file_bundle_utils import MediaReferencePolicy
+
+import beat_analysis
+import media_probe
+import otio_sync
+from cue_store import get_store
 
 CUE_PATH = Path("insomniax.json")
 AUDIO_PATH = Path("soundtrack_mix.wav")
@@ -21,120 +42,350 @@ OUT_PATH = Path("insomniax_timeline_extended.otio")
 
 FPS = 24
 SEGMENTS_DIR = Path("segments_v3")
+CLIP_SECONDS = 3.0
+BEATS_PER_BAR = 4
+MARKER_MODES = ("all", "downbeats", "bar", "none")
+BUNDLE_SUFFIXES = {".otioz", ".otiod"}
 
 
-def main() -> None:
-    # Load cue sheet
-    data = json.loads(CUE_PATH.read_text())
+class ExportPlan(NamedTuple):
+    keyframes: list[dict]
+    clip_starts: np.ndarray      # seconds, one per keyframe
+    clip_durations: np.ndarray   # seconds
+    total: float                 # timeline length, seconds
+    beat_starts: np.ndarray      # seconds, one per beat marker
+    beat_durations: np.ndarray   # frames
+    beat_names: list[str]
+    media_durations: np.ndarray  # seconds of media behind each clip (available_range)
+    audio_duration: float        # seconds of soundtrack media
 
-    # Analyze audio beats
-    y, sr = librosa.load(AUDIO_PATH, sr=None)
-    tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
-    beat_times = librosa.frames_to_time(beats, sr=sr)
-    print(f"Detected tempo: {tempo:.2f} BPM, {len(beat_times)} beats.")
 
-    # Create timeline + tracks
-    timeline = otio.schema.Timeline("Insomniax Extended Timeline")
-    video_track = otio.schema.Track(name="Video Track", kind=otio.schema.TrackKind.Video)
-    audio_track = otio.schema.Track(name="Audio Track", kind=otio.schema.TrackKind.Audio)
+def beat_markers(beat_times: np.ndarray, total: float, mode: str = "all",
+                 beats_per_bar: int = BEATS_PER_BAR) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    """
+    Beat marker (starts in seconds, durations in frames, names) for `mode`.
 
-    current_time = 0.0
+    all:       one single-frame "Beat" marker per beat
+    downbeats: one single-frame "Downbeat" marker per bar
+    bar:       one "Bar N" marker spanning each bar (bars of zero length are skipped)
+    none:      no beat markers
+    """
+    beats = np.asarray(beat_times, dtype=np.float64)
+    beats = beats[beats <= total]
+    if mode == "none" or len(beats) == 0:
+        return np.zeros(0), np.zeros(0), []
+    if mode == "all":
+        return beats, np.ones(len(beats)), ["Beat"] * len(beats)
 
-    # Build video clips from keyframes
-    for i, kf in enumerate(data.get("keyframes", [])):
-        start = current_time
-        end = start + 3.0
-        current_time = end
+    downbeats = beats[::beats_per_bar]
+    if mode == "downbeats":
+        return downbeats, np.ones(len(downbeats)), ["Downbeat"] * len(downbeats)
+    if mode == "bar":
+        ends = np.append(downbeats[1:], total)
+        # a bar that starts right at the timeline end would be a zero-length range
+        keep = np.flatnonzero(ends > downbeats)
+        names = [f"Bar {n + 1}" for n in keep.tolist()]
+        return downbeats[keep], (ends[keep] - downbeats[keep]) * FPS, names
+    raise ValueError(f"unknown marker mode {mode!r}; expected one of {MARKER_MODES}")
 
-        clip_path = SEGMENTS_DIR / f"scene_{i:02d}.mp4"
-        media_ref = otio.schema.ExternalReference(
-            target_url=f"file://{clip_path.resolve()}",
-            available_range=otio.opentime.TimeRange(
-                otio.opentime.RationalTime(0, FPS),
-                otio.opentime.RationalTime((end - start) * FPS, FPS),
-            ),
-        )
 
+def plan_export(data: dict, beat_times: np.ndarray, mode: str = "all",
+                beats_per_bar: int = BEATS_PER_BAR,
+                probes: dict[str, media_probe.ProbeInfo | None] | None = None) -> ExportPlan:
+    """
+    Clip, beat marker and media ranges for the timeline.
+
+    probes: media_probe results keyed by segment_path(i) / str(AUDIO_PATH);
+    media without a known duration falls back to the planned clip length.
+    """
+    keyframes = data.get("keyframes", [])
+    n = len(keyframes)
+    clip_starts = np.arange(n) * CLIP_SECONDS
+    clip_durations = np.full(n, CLIP_SECONDS)
+    total = float(n * CLIP_SECONDS)
+    starts, durations, names = beat_markers(beat_times, total, mode, beats_per_bar)
+
+    probes = probes or {}
+
+    def probed_duration(path: str, fallback: float) -> float:
+        info = probes.get(path)
+        return info.duration if info is not None and info.duration > 0 else fallback
+
+    media_durations = np.array(
+        [probed_duration(str(segment_path(i)), CLIP_SECONDS) for i in range(n)],
+        dtype=np.float64,
+    )
+    audio_duration = probed_duration(str(AUDIO_PATH), total)
+    return ExportPlan(keyframes, clip_starts, clip_durations, total, starts, durations, names,
+                      media_durations, audio_duration)
+
+
+def probe_media(n_keyframes: int) -> dict[str, media_probe.ProbeInfo | None]:
+    """Probe the rendered scene segments and the soundtrack, concurrently."""
+    paths = [str(segment_path(i)) for i in range(n_keyframes)] + [str(AUDIO_PATH)]
+    return media_probe.probe_many(paths)
+
+
+def fx_markers(kf: dict, start: float) -> list[tuple[str, str, float, float]]:
+    """(name, color, start frame, duration in frames) for a keyframe's edit pattern."""
+    ep = kf.get("edit_pattern", "").lower()
+    markers = []
+    if "jumpcut" in ep:
+        markers.append(("Jumpcut zone", "RED", start * FPS, 6))
+    if "black" in ep:
+        markers.append(("Black flash", "BLUE", (start + 1) * FPS, 3))
+    return markers
+
+
+def clip_metadata(kf: dict) -> dict:
+    return {
+        "scene_text": kf.get("scene", ""),
+        "voiceover": kf.get("voiceover", ""),
+        "fx": kf.get("fx", ""),
+        "edit_pattern": kf.get("edit_pattern", ""),
+        otio_sync.CLIP_ID_KEY: kf[otio_sync.ID_FIELD],
+    }
+
+
+def segment_path(i: int) -> Path:
+    return SEGMENTS_DIR / f"scene_{i:02d}.mp4"
+
+
+def segment_url(i: int) -> str:
+    return f"file://{segment_path(i).resolve()}"
+
+
+def audio_url() -> str:
+    return f"file://{AUDIO_PATH.resolve()}"
+
+
+# ── OTIO object path (bundles) ───────────────────────────
+
+def _range(start_frames: float, dur_frames: float) -> otio.opentime.TimeRange:
+    return otio.opentime.TimeRange(
+        otio.opentime.RationalTime(start_frames, FPS),
+        otio.opentime.RationalTime(dur_frames, FPS),
+    )
+
+
+def build_timeline(plan: ExportPlan) -> otio.schema.Timeline:
+    timeline = otio.schema.Timeline("Insomniax Extended Timeline")
+    video_track = otio.schema.Track(name="Video Track", kind=otio.schema.TrackKind.Video)
+    audio_track = otio.schema.Track(name="Audio Track", kind=otio.schema.TrackKind.Audio)
+
+    starts, durations = plan.clip_starts.tolist(), plan.clip_durations.tolist()
+    available = plan.media_durations.tolist()
+    for i, kf in enumerate(plan.keyframes):
+        start, dur = starts[i], durations[i]
         clip = otio.schema.Clip(
             name=f"Scene {i+1}",
-            media_reference=media_ref,
-            source_range=otio.opentime.TimeRange(
-                otio.opentime.RationalTime(start * FPS, FPS),
-                otio.opentime.RationalTime((end - start) * FPS, FPS),
+            media_reference=otio.schema.ExternalReference(
+                target_url=segment_url(i), available_range=_range(0, available[i] * FPS)
             ),
+            source_range=_range(start * FPS, dur * FPS),
+            metadata=clip_metadata(kf),
         )
-
-        # Metadata from cue sheet
-        clip.metadata["scene_text"] = kf.get("scene", "")
-        clip.metadata["voiceover"] = kf.get("voiceover", "")
-        clip.metadata["fx"] = kf.get("fx", "")
-        clip.metadata["edit_pattern"] = kf.get("edit_pattern", "")
-
-        # FX markers
-        ep = kf.get("edit_pattern", "").lower()
-        if "jumpcut" in ep:
-            clip.markers.append(
-                otio.schema.Marker(
-                    name="Jumpcut zone",
-                    color="RED",
-                    marked_range=otio.opentime.TimeRange(
-                        otio.opentime.RationalTime(start * FPS, FPS),
-                        otio.opentime.RationalTime(6, FPS),
-                    ),
-                )
-            )
-        if "black" in ep:
-            clip.markers.append(
-                otio.schema.Marker(
-                    name="Black flash",
-                    color="BLUE",
-                    marked_range=otio.opentime.TimeRange(
-                        otio.opentime.RationalTime((start + 1) * FPS, FPS),
-                        otio.opentime.RationalTime(3, FPS),
-                    ),
-                )
-            )
-
+        for name, color, m_start, m_dur in fx_markers(kf, start):
+            clip.markers.append(otio.schema.Marker(
+                name=name, color=color, marked_range=_range(m_start, m_dur)
+            ))
         video_track.append(clip)
-
     timeline.tracks.append(video_track)
 
-    # Audio track
-    audio_ref = otio.schema.ExternalReference(
-        target_url=f"file://{AUDIO_PATH.resolve()}",
-        available_range=otio.opentime.TimeRange(
-            otio.opentime.RationalTime(0, FPS),
-            otio.opentime.RationalTime(current_time * FPS, FPS),
-        ),
-    )
-    audio_clip = otio.schema.Clip(
+    audio_track.append(otio.schema.Clip(
         name="Soundtrack Mix",
-        media_reference=audio_ref,
-        source_range=otio.opentime.TimeRange(
-            otio.opentime.RationalTime(0, FPS),
-            otio.opentime.RationalTime(current_time * FPS, FPS),
+        media_reference=otio.schema.ExternalReference(
+            target_url=audio_url(), available_range=_range(0, plan.audio_duration * FPS)
         ),
-    )
-    audio_track.append(audio_clip)
+        source_range=_range(0, plan.total * FPS),
+    ))
     timeline.tracks.append(audio_track)
 
-    # Global beat markers
-    for bt in beat_times:
-        if bt > current_time:
-            break
-        marker = otio.schema.Marker(
-            name="Beat",
-            color="YELLOW",
-            marked_range=otio.opentime.TimeRange(
-                otio.opentime.RationalTime(bt * FPS, FPS),
-                otio.opentime.RationalTime(1, FPS),
-            ),
+    # Global beat markers live on the top-level stack
+    for start, dur, name in zip(plan.beat_starts.tolist(), plan.beat_durations.tolist(),
+                                plan.beat_names):
+        timeline.tracks.markers.append(otio.schema.Marker(
+            name=name, color="YELLOW", marked_range=_range(start * FPS, dur)
+        ))
+    return timeline
+
+
+# ── streamed JSON writer (.otio) ─────────────────────────
+
+def _rt_json(value: float) -> dict:
+    return {"OTIO_SCHEMA": "RationalTime.1", "rate": float(FPS), "value": float(value)}
+
+
+def _range_json(start_frames: float, dur_frames: float) -> dict:
+    return {
+        "OTIO_SCHEMA": "TimeRange.1",
+        "duration": _rt_json(dur_frames),
+        "start_time": _rt_json(start_frames),
+    }
+
+
+def _marker_json(name: str, color: str, start_frames: float, dur_frames: float) -> dict:
+    return {
+        "OTIO_SCHEMA": "Marker.2",
+        "metadata": {},
+        "name": name,
+        "color": color,
+        "marked_range": _range_json(start_frames, dur_frames),
+        "comment": "",
+    }
+
+
+def _clip_json(name: str, url: str, start_frames: float, dur_frames: float,
+               available_frames: float, metadata: dict, markers: list[dict]) -> dict:
+    return {
+        "OTIO_SCHEMA": "Clip.2",
+        "metadata": metadata,
+        "name": name,
+        "source_range": _range_json(start_frames, dur_frames),
+        "effects": [],
+        "markers": markers,
+        "enabled": True,
+        "color": None,
+        "media_references": {
+            "DEFAULT_MEDIA": {
+                "OTIO_SCHEMA": "ExternalReference.1",
+                "metadata": {},
+                "name": "",
+                "available_range": _range_json(0, available_frames),
+                "available_image_bounds": None,
+                "target_url": url,
+            }
+        },
+        "active_media_reference_key": "DEFAULT_MEDIA",
+    }
+
+
+def _composable_head(schema: str, name: str) -> str:
+    """Opening of a Stack/Track object, up to its markers list."""
+    return (
+        f'{{"OTIO_SCHEMA":"{schema}","metadata":{{}},"name":{json.dumps(name)},'
+        '"source_range":null,"effects":[],"markers":['
+    )
+
+
+def timeline_json_chunks(plan: ExportPlan) -> Iterator[str]:
+    """The serialized timeline in pieces; never holds the whole document."""
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def joined(items: Iterator[dict]) -> Iterator[str]:
+        for n, item in enumerate(items):
+            yield ("," if n else "") + dumps(item)
+
+    yield ('{"OTIO_SCHEMA":"Timeline.1","metadata":{},'
+           '"name":"Insomniax Extended Timeline","global_start_time":null,"tracks":')
+    yield _composable_head("Stack.1", "tracks")
+    yield from joined(
+        _marker_json(name, "YELLOW", start * FPS, dur)
+        for start, dur, name in zip(plan.beat_starts.tolist(), plan.beat_durations.tolist(),
+                                    plan.beat_names)
+    )
+    yield '],"enabled":true,"color":null,"children":['
+
+    yield _composable_head("Track.1", "Video Track") + '],"enabled":true,"color":null,"children":['
+    starts, durations = plan.clip_starts.tolist(), plan.clip_durations.tolist()
+    available = plan.media_durations.tolist()
+    yield from joined(
+        _clip_json(
+            f"Scene {i+1}", segment_url(i), starts[i] * FPS, durations[i] * FPS,
+            available[i] * FPS, clip_metadata(kf),
+            [_marker_json(*m) for m in fx_markers(kf, starts[i])],
         )
-        timeline.markers.append(marker)
+        for i, kf in enumerate(plan.keyframes)
+    )
+    yield '],"kind":"Video"},'
+
+    yield _composable_head("Track.1", "Audio Track") + '],"enabled":true,"color":null,"children":['
+    yield dumps(_clip_json("Soundtrack Mix", audio_url(), 0, plan.total * FPS,
+                           plan.audio_duration * FPS, {}, []))
+    yield '],"kind":"Audio"}]}}'
+
+
+def write_streamed(plan: ExportPlan, path: Path) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8", buffering=1 << 20) as f:
+        for chunk in timeline_json_chunks(plan):
+            f.write(chunk)
+    os.replace(tmp, path)
+
+
+def output_size(path: Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
+
+
+def export(plan: ExportPlan, out_path: Path, writer: str = "stream") -> tuple[float, int]:
+    """Write the timeline; returns (seconds, bytes on disk)."""
+    out_path = Path(out_path)
+    t0 = time.perf_counter()
+    if out_path.suffix in BUNDLE_SUFFIXES:
+        # bundles copy local media in; segments that do not exist yet stay missing
+        otio.adapters.write_to_file(
+            build_timeline(plan), str(out_path),
+            media_policy=MediaReferencePolicy.MissingIfNotFile,
+        )
+    elif writer == "stream":
+        write_streamed(plan, out_path)
+    else:
+        otio.adapters.write_to_file(build_timeline(plan), str(out_path))
+    return time.perf_counter() - t0, output_size(out_path)
+
 
-    # Write OTIO file
-    otio.adapters.write_to_file(timeline, OUT_PATH)
-    print(f"Exported extended OTIO timeline → {OUT_PATH}")
+def load_cue_sheet(path: Path = CUE_PATH) -> tuple[dict, int]:
+    """
+    The cue sheet with a stable id on every keyframe, so syncs can match
+    clips back; returns it and how many ids were assigned.
+
+    New ids are written back through the shared cue store, whose flush
+    replaces the file atomically.
+    """
+    store = get_store(path)
+    if not store.refresh():
+        raise FileNotFoundError(f"Cue sheet not found: {path}")
+    added = otio_sync.ensure_keyframe_ids(store.data)
+    if added:
+        store.replace(store.data)
+    return store.data, added
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export the Insomniax cue sheet to OTIO.")
+    parser.add_argument("--markers", choices=MARKER_MODES, default="all",
+                        help="beat markers: every beat, downbeats only, one per bar, or none")
+    parser.add_argument("--beats-per-bar", type=int, default=BEATS_PER_BAR)
+    parser.add_argument("--out", type=Path, default=OUT_PATH,
+                        help="output file: .otio, .otioz (zip bundle) or .otiod (directory bundle)")
+    parser.add_argument("--writer", choices=("stream", "otio"), default="stream",
+                        help=".otio writer: streamed JSON or the OTIO object graph")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+
+    # Load cue sheet; keyframes get stable ids so syncs can match clips back
+    data, added = load_cue_sheet(CUE_PATH)
+    if added:
+        print(f"Assigned clip ids to keyframes in {CUE_PATH.name}.")
+
+    # Analyze audio beats (cached, shared with the auto-cut renderer)
+    analysis = beat_analysis.analyze(AUDIO_PATH)
+    beat_times = analysis.beat_times
+    print(f"Detected tempo: {analysis.tempo:.2f} BPM, {len(beat_times)} beats.")
+
+    plan = plan_export(data, beat_times, args.markers, args.beats_per_bar,
+                       probes=probe_media(len(data.get("keyframes", []))))
+    seconds, size = export(plan, args.out, args.writer)
+    print(
+        f"Exported extended OTIO timeline → {args.out} "
+        f"({len(plan.keyframes)} clips, {len(plan.beat_names)} beat markers [{args.markers}], "
+        f"{size / 1e6:.2f} MB in {seconds:.2f}s)"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+"""
+lmstudio_client.py
+HTTP client for LM Studio's OpenAI-compatible API.
+
+- One pooled keep-alive requests.Session, so turns reuse the TCP connection
+- Separate connect / read timeouts; a stalled server raises instead of hanging
+- Retries connection errors, timeouts and 429/5xx with exponential backoff
+- Streams chat completions (server-sent events) as plain dict chunks
+- Records per-request latency (time to headers, total, attempts) with percentiles
+"""
+
+import json
+import threading
+import time
+from typing import Iterator
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+API_BASE = "http://localhost:1234/v1"
+CONNECT_TIMEOUT = 3.0     # seconds to open the TCP connection
+READ_TIMEOUT = 120.0      # seconds of silence tolerated between bytes
+MAX_RETRIES = 3           # extra attempts after the first one
+BACKOFF_SECONDS = 0.5     # first retry delay; doubles every attempt
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+POOL_SIZE = 4
+
+
+class LMStudioError(RuntimeError):
+    """The server could not be reached or kept failing after all retries."""
+
+
+class LatencyStats:
+    """Thread-safe per-request latency records."""
+
+    def __init__(self) -> None:
+        self.records: list[dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, **record) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def summary(self) -> str:
+        with self._lock:
+            records = list(self.records)
+        if not records:
+            return "LM Studio: no requests"
+        ok = [r for r in records if r["ok"]]
+        retried = sum(r["attempts"] - 1 for r in records)
+        text = f"LM Studio: {len(records)} requests ({len(records) - len(ok)} failed, {retried} retries)"
+        if ok:
+            headers = np.array([r["headers_seconds"] for r in ok])
+            total = np.array([r["total_seconds"] for r in ok])
+            h50, h90 = np.percentile(headers, [50, 90])
+            t50, t90 = np.percentile(total, [50, 90])
+            text += (
+                f"\n  time to headers: p50 {h50:.3f}s  p90 {h90:.3f}s"
+                f"\n  total:           p50 {t50:.3f}s  p90 {t90:.3f}s  max {total.max():.3f}s"
+            )
+        return text
+
+
+class LMStudioClient:
+    """Chat-completions client with connection reuse, timeouts and retry."""
+
+    def __init__(self, api_base: str = API_BASE, api_key: str = "not-needed",
+                 connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 max_retries: int = MAX_RETRIES, backoff: float = BACKOFF_SECONDS,
+                 pool_size: int = POOL_SIZE) -> None:
+        self.api_base = api_base.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = LatencyStats()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+
+    def _post(self, path: str, payload: dict, stream: bool) -> tuple[requests.Response, int, float]:
+        """POST with retries; returns (response, attempts, seconds to headers)."""
+        # canonical JSON: identical requests are byte-identical on the wire
+        body = json.dumps(
+            payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+        t0 = time.perf_counter()
+        last_error = "no attempt made"
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                resp = self.session.post(
+                    f"{self.api_base}{path}", data=body, stream=stream, timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = f"{type(e).__name__}: {e}"
+            else:
+                if resp.status_code not in RETRY_STATUSES:
+                    return resp, attempt, time.perf_counter() - t0
+                last_error = f"HTTP {resp.status_code}"
+                resp.close()
+            if attempt <= self.max_retries:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+        self.stats.add(path=path, ok=False, attempts=self.max_retries + 1,
+                       headers_seconds=None, total_seconds=time.perf_counter() - t0,
+                       error=last_error)
+        raise LMStudioError(
+            f"{self.api_base}{path} failed after {self.max_retries + 1} attempts ({last_error})"
+        )
+
+    def chat(self, **payload) -> dict:
+        """Non-streamed chat completion; returns the decoded JSON response."""
+        t0 = time.perf_counter()
+        resp, attempts, headers = self._post("/chat/completions", {**payload, "stream": False}, False)
+        with resp:
+            ok = resp.ok
+            data = resp.json() if ok else None
+            error = None if ok else f"HTTP {resp.status_code}: {resp.text[:200]}"
+        self.stats.add(path="/chat/completions", ok=ok, attempts=attempts,
+                       headers_seconds=headers, total_seconds=time.perf_counter() - t0,
+                       error=error)
+        if not ok:
+            raise LMStudioError(error)
+        return data
+
+    def chat_stream(self, **payload) -> Iterator[dict]:
+        """
+        Streamed chat completion; yields each server-sent chunk as a dict.
+
+        Retries only happen before the first byte of the body, so a reply is
+        never duplicated. A stall mid-stream raises LMStudioError after the
+        read timeout; a dropped connection or a malformed chunk raises it
+        right away.
+        """
+        t0 = time.perf_counter()
+        resp, attempts, headers = self._post("/chat/completions", {**payload, "stream": True}, True)
+        ok, error = False, None
+        try:
+            if not resp.ok:
+                error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+                raise LMStudioError(error)
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    continue   # read to the end so the connection returns to the pool
+                try:
+                    chunk = json.loads(data)
+                except ValueError as e:
+                    error = f"malformed chunk {data[:80]!r}"
+                    raise LMStudioError(f"stream interrupted ({error})") from e
+                yield chunk
+            ok = True
+        except requests.RequestException as e:
+            # includes ChunkedEncodingError when the server resets mid-body
+            error = f"{type(e).__name__}: {e}"
+            raise LMStudioError(f"stream interrupted ({error})") from e
+        finally:
+            resp.close()
+            self.stats.add(path="/chat/completions", ok=ok, attempts=attempts,
+                           headers_seconds=headers, total_seconds=time.perf_counter() - t0,
+                           error=error)
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,272 @@
+"""
+media_probe.py
+ffprobe metadata for Insomniax source footage.
+
+- Probes codec, profile, pixel format, time base, frame size, frame rate,
+  duration and keyframe (random-access) timestamps of a clip's video stream
+- Reads a cheap stream summary (duration, frame size, frame rate) for indexing
+- Caches results in memory and in .insomniax_cache/probe.json, keyed by path/size/mtime;
+  files ffprobe cannot read are remembered for the rest of the process, so
+  per-segment lookups never re-run ffprobe on them
+- Probes many clips (e.g. everything in clip_map.json) concurrently, writing
+  the disk cache once per batch
+- Snaps cut points to nearby keyframes for stream-copy rendering and clamps
+  cuts that run past the end of a clip
+
+Usage:
+    python media_probe.py [clip_map.json]
+"""
+
+import bisect
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+CACHE_PATH = Path(".insomniax_cache/probe.json")
+CLIP_MAP_PATH = Path("clip_map.json")
+PROBE_VERSION = 4   # bump when ProbeInfo gains fields so stale entries are re-probed
+PROBE_WORKERS = 8   # concurrent ffprobe processes
+
+_lock = threading.Lock()
+_memory: dict[str, dict] = {}
+# stands in for the ProbeInfo of a file ffprobe failed on; memory only, so
+# a later run (e.g. with ffprobe installed) tries again
+_UNREADABLE: dict = {"unreadable": True}
+_loaded_from: Path | None = None
+
+
+class ProbeInfo(NamedTuple):
+    codec: str
+    keyframes: list[float]   # sorted pts of keyframe packets, seconds
+    width: int = 0
+    height: int = 0
+    duration: float = 0.0   # seconds; 0.0 when unknown
+    fps: float = 0.0        # average frame rate; 0.0 when unknown
+    profile: str = ""       # e.g. "High", "Constrained Baseline"
+    pix_fmt: str = ""       # e.g. "yuv420p", "yuv420p10le"
+    time_base: str = ""     # stream time base, e.g. "1/90000"
+
+
+class StreamInfo(NamedTuple):
+    duration: float   # seconds; 0.0 when unknown
+    width: int
+    height: int
+    fps: float        # average frame rate; 0.0 when unknown
+
+
+def _stamp(path: str) -> str | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"v{PROBE_VERSION}|{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def _load_disk_cache() -> None:
+    """(Re)load the on-disk cache if CACHE_PATH changed since the last load."""
+    global _loaded_from
+    if _loaded_from == CACHE_PATH:
+        return
+    _memory.clear()
+    try:
+        _memory.update(json.loads(CACHE_PATH.read_text()))
+    except (OSError, ValueError):
+        pass
+    _loaded_from = CACHE_PATH
+
+
+def _save_disk_cache() -> None:
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CACHE_PATH.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({k: v for k, v in _memory.items() if v is not _UNREADABLE}))
+    os.replace(tmp, CACHE_PATH)
+
+
+def _ffprobe_json(path: str, entries: str) -> dict | None:
+    """Parsed `ffprobe -show_entries` output for the first video stream, or None."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", entries,
+        "-of", "json",
+        path,
+    ]
+    try:
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              text=True) as proc:
+            stdout, _ = proc.communicate()
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    try:
+        return json.loads(stdout)
+    except ValueError:
+        return None
+
+
+def _rate(value: str | None) -> float:
+    """ffprobe frame rates are fractions like '30000/1001'."""
+    try:
+        num, _, den = (value or "").partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _duration(data: dict, stream: dict) -> float:
+    """Stream duration, falling back to the container's."""
+    value = stream.get("duration") or (data.get("format") or {}).get("duration")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def run_ffprobe(path: str) -> ProbeInfo | None:
+    """Stream format, size, rate, duration and keyframe packet times, without decoding; None on failure."""
+    data = _ffprobe_json(
+        path,
+        "stream=codec_name,profile,pix_fmt,time_base,width,height,avg_frame_rate,duration"
+        ":format=duration:packet=pts_time,flags",
+    )
+    if data is None:
+        return None
+
+    stream = (data.get("streams") or [{}])[0]
+    keyframes = sorted(
+        float(p["pts_time"])
+        for p in data.get("packets", [])
+        if "K" in p.get("flags", "") and p.get("pts_time") not in (None, "N/A")
+    )
+    return ProbeInfo(
+        stream.get("codec_name", ""),
+        keyframes,
+        int(stream.get("width") or 0),
+        int(stream.get("height") or 0),
+        _duration(data, stream),
+        _rate(stream.get("avg_frame_rate")),
+        stream.get("profile", ""),
+        stream.get("pix_fmt", ""),
+        stream.get("time_base", ""),
+    )
+
+
+def run_ffprobe_stream(path: str) -> StreamInfo | None:
+    """Duration, frame size and frame rate from container headers only; None on failure."""
+    data = _ffprobe_json(path, "stream=width,height,avg_frame_rate,duration:format=duration")
+    if data is None:
+        return None
+    stream = (data.get("streams") or [{}])[0]
+    return StreamInfo(
+        _duration(data, stream),
+        int(stream.get("width") or 0),
+        int(stream.get("height") or 0),
+        _rate(stream.get("avg_frame_rate")),
+    )
+
+
+def probe(path: str) -> ProbeInfo | None:
+    """Cached probe of `path`; None when the file is missing or cannot be probed."""
+    return probe_many([path], workers=1)[path]
+
+
+def probe_many(paths: Iterable[str], workers: int = PROBE_WORKERS) -> dict[str, ProbeInfo | None]:
+    """
+    Cached probes of every path, running up to `workers` ffprobe processes
+    for the cache misses. The disk cache is written once, after the batch.
+    """
+    results: dict[str, ProbeInfo | None] = {}
+    misses: dict[str, str] = {}   # path → stamp
+    with _lock:
+        _load_disk_cache()
+        for path in dict.fromkeys(paths):
+            stamp = _stamp(path)
+            hit = _memory.get(stamp) if stamp is not None else None
+            if hit is _UNREADABLE:
+                results[path] = None
+            elif hit is not None:
+                results[path] = ProbeInfo(**hit)
+            else:
+                results[path] = None
+                if stamp is not None:
+                    misses[path] = stamp
+    if not misses:
+        return results
+
+    if workers <= 1 or len(misses) == 1:
+        probed = [run_ffprobe(path) for path in misses]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(misses))) as pool:
+            probed = list(pool.map(run_ffprobe, misses))
+
+    fresh, failed = {}, {}
+    for (path, stamp), info in zip(misses.items(), probed):
+        results[path] = info
+        if info is not None:
+            fresh[stamp] = info._asdict()
+        else:
+            failed[stamp] = _UNREADABLE
+    with _lock:
+        _memory.update(failed)
+        if fresh:
+            _memory.update(fresh)
+            _save_disk_cache()
+    return results
+
+
+def probe_clip_map(clip_map_path: str | Path = CLIP_MAP_PATH,
+                   workers: int = PROBE_WORKERS) -> dict[str, ProbeInfo | None]:
+    """Probe every distinct clip referenced by a clip_map.json, concurrently."""
+    clip_map = json.loads(Path(clip_map_path).read_text())
+    return probe_many([str(p) for p in clip_map.values()], workers)
+
+
+def describe(path: str, info: ProbeInfo | None) -> str:
+    """One-line human summary of a probe result."""
+    if info is None:
+        return f"{path}: missing or unreadable"
+    return (
+        f"{path}: {info.duration:.2f}s, {info.width}x{info.height} @ {info.fps:.3f} fps, "
+        f"{info.codec or 'unknown codec'}, {len(info.keyframes)} keyframe(s)"
+    )
+
+
+def clamp_range(start: float, end: float, duration: float) -> tuple[float, float]:
+    """
+    Keep [start, end) inside a clip of `duration` seconds.
+
+    A cut that runs past the end is moved back so it ends on the last frame,
+    keeping its length; cuts longer than the clip become the whole clip.
+    Unknown durations (0.0) leave the cut unchanged.
+    """
+    if duration <= 0 or end <= duration:
+        return start, end
+    length = min(end - start, duration)
+    return duration - length, duration
+
+
+def snap_to_keyframe(keyframes: list[float], t: float, tolerance: float) -> float | None:
+    """Nearest keyframe time within `tolerance` of t, or None."""
+    i = bisect.bisect_left(keyframes, t)
+    best = None
+    for k in keyframes[max(0, i - 1): i + 1]:
+        if abs(k - t) <= tolerance and (best is None or abs(k - t) < abs(best - t)):
+            best = k
+    return best
+
+
+def main(argv: list[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    results = probe_clip_map(argv[0] if argv else CLIP_MAP_PATH)
+    for path, info in results.items():
+        print(describe(path, info))
+
+
+if __name__ == "__main__":
+    main()
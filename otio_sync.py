@@ -0,0 +1,261 @@
+"""
+otio_sync.py
+Incremental OTIO → cue sheet sync for Insomniax.
+
+- Keyframes carry a stable `id`; the exporter writes it into each clip's
+  metadata as `insomniax_id`, so edits in the NLE can be matched back even
+  after clips are reordered (clips without one fall back to timeline order)
+- Each synced keyframe stores a fingerprint of the clip state it was synced
+  from (timing, scene text, markers); a sync only writes keyframes whose
+  fingerprint changed
+- Reports added (first sync), modified, removed (clip gone from the timeline)
+  and unmatched clips
+- Native .otio files are read as plain JSON, walking only the composition
+  tree for clip ranges, metadata and markers; other formats (and anything
+  unexpected) go through the OTIO adapters
+- `sync_store` is the one sync engine behind insomniax_agent_v4.sync_from_otio
+  and otio_to_insomniax_sync
+"""
+
+import hashlib
+import json
+import uuid
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+import opentimelineio as otio
+
+from cue_store import CueSheetStore
+
+ID_FIELD = "id"
+CLIP_ID_KEY = "insomniax_id"
+FINGERPRINT_FIELD = "otio_fingerprint"
+SYNCED_FIELDS = ("otio_start", "otio_duration", "otio_markers", FINGERPRINT_FIELD)
+
+
+class ClipState(NamedTuple):
+    clip_id: str | None
+    start: float
+    duration: float
+    scene_text: str | None   # None when the clip has no scene_text metadata
+    markers: list[dict]
+
+
+class SyncResult(NamedTuple):
+    updates: dict[int, dict]   # keyframe index → fields to set
+    removals: dict[int, list[str]]   # keyframe index → fields to delete
+    added: int
+    modified: int
+    removed: int
+    unchanged: int
+    unmatched: int
+
+    def summary(self) -> str:
+        return (
+            f"{self.added} added, {self.modified} modified, {self.removed} removed, "
+            f"{self.unchanged} unchanged, {self.unmatched} unmatched clip(s)"
+        )
+
+
+def new_keyframe_id() -> str:
+    return f"kf_{uuid.uuid4().hex[:12]}"
+
+
+def ensure_keyframe_ids(data: dict) -> int:
+    """Give every keyframe without one a stable id; returns how many were added."""
+    added = 0
+    for kf in data.get("keyframes", []):
+        if not kf.get(ID_FIELD):
+            kf[ID_FIELD] = new_keyframe_id()
+            added += 1
+    return added
+
+
+def _marker_dict(name: str, color: str, start_sec: float) -> dict:
+    return {"name": name, "color": color, "start_sec": round(start_sec, 3)}
+
+
+def read_clip_states_otio(path: str | Path) -> list[ClipState]:
+    """Clip states via the OTIO adapters (any format OTIO can read)."""
+    timeline = otio.adapters.read_from_file(str(path))
+    states = []
+    for clip in timeline.find_clips():
+        src_range = clip.source_range or clip.available_range()
+        states.append(ClipState(
+            clip_id=clip.metadata.get(CLIP_ID_KEY) or None,
+            start=round(src_range.start_time.to_seconds(), 3),
+            duration=round(src_range.duration.to_seconds(), 3),
+            scene_text=clip.metadata.get("scene_text"),
+            markers=[
+                _marker_dict(m.name, m.color, m.marked_range.start_time.to_seconds())
+                for m in clip.markers
+            ],
+        ))
+    return states
+
+
+def _seconds(rt: dict) -> float:
+    return float(rt["value"]) / float(rt["rate"])
+
+
+def _json_range(clip: dict) -> dict | None:
+    if clip.get("source_range"):
+        return clip["source_range"]
+    refs = clip.get("media_references")
+    if refs is not None:   # Clip.2
+        ref = refs.get(clip.get("active_media_reference_key") or "DEFAULT_MEDIA") or {}
+    else:                  # Clip.1
+        ref = clip.get("media_reference") or {}
+    return ref.get("available_range")
+
+
+def read_clip_states_json(path: str | Path) -> list[ClipState] | None:
+    """
+    Clip states straight from a native .otio JSON file, without building
+    OTIO objects. Clips are visited in the same depth-first order as
+    Timeline.find_clips(). Returns None if the file does not look like a
+    serialized timeline, so callers can fall back to the adapters.
+    """
+    try:
+        with open(path, "rb") as f:
+            root = json.load(f)
+    except ValueError:
+        return None
+    if not isinstance(root, dict) or not str(root.get("OTIO_SCHEMA", "")).startswith("Timeline."):
+        return None
+
+    states = []
+    stack = [root.get("tracks") or {}]
+    try:
+        while stack:
+            node = stack.pop()
+            schema = node.get("OTIO_SCHEMA", "")
+            if schema.startswith("Clip."):
+                rng = _json_range(node)
+                if rng is None:
+                    return None
+                metadata = node.get("metadata") or {}
+                states.append(ClipState(
+                    clip_id=metadata.get(CLIP_ID_KEY) or None,
+                    start=round(_seconds(rng["start_time"]), 3),
+                    duration=round(_seconds(rng["duration"]), 3),
+                    scene_text=metadata.get("scene_text"),
+                    markers=[
+                        _marker_dict(m.get("name", ""), m.get("color"),
+                                     _seconds(m["marked_range"]["start_time"]))
+                        for m in node.get("markers") or []
+                    ],
+                ))
+            elif "children" in node:
+                stack.extend(reversed(node["children"]))
+    except (KeyError, TypeError, AttributeError, ZeroDivisionError):
+        return None
+    return states
+
+
+def read_clip_states(path: str | Path, fast: bool | None = None) -> list[ClipState]:
+    """
+    Clip states of every clip in the timeline, in timeline order.
+
+    fast: use the JSON reader (default: for .otio files), falling back to
+    the OTIO adapters when it cannot handle the file.
+    """
+    if fast is None:
+        fast = Path(path).suffix.lower() == ".otio"
+    if fast:
+        states = read_clip_states_json(path)
+        if states is not None:
+            return states
+    return read_clip_states_otio(path)
+
+
+def fingerprint(state: ClipState) -> str:
+    material = json.dumps(
+        [state.start, state.duration, state.scene_text, state.markers],
+        sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+
+def plan_sync(keyframes: list[dict], states: list[ClipState]) -> SyncResult:
+    """Diff the timeline's clip states against the last synced state of each keyframe."""
+    by_id = {kf[ID_FIELD]: i for i, kf in enumerate(keyframes) if kf.get(ID_FIELD)}
+    updates: dict[int, dict] = {}
+    removals: dict[int, list[str]] = {}
+    matched: set[int] = set()
+    added = modified = unchanged = unmatched = 0
+
+    for pos, state in enumerate(states):
+        if state.clip_id is not None:
+            i = by_id.get(state.clip_id)
+        else:
+            i = pos if pos < len(keyframes) else None
+        if i is None or i in matched:
+            unmatched += 1
+            continue
+        matched.add(i)
+
+        kf = keyframes[i]
+        fp = fingerprint(state)
+        if kf.get(FINGERPRINT_FIELD) == fp:
+            unchanged += 1
+            continue
+        if kf.get(FINGERPRINT_FIELD) is None:
+            added += 1
+        else:
+            modified += 1
+
+        fields = {
+            "otio_start": state.start,
+            "otio_duration": state.duration,
+            "scene": state.scene_text if state.scene_text is not None else kf.get("scene", ""),
+            FINGERPRINT_FIELD: fp,
+        }
+        if state.markers:
+            fields["otio_markers"] = state.markers
+        elif "otio_markers" in kf:
+            removals[i] = ["otio_markers"]
+        updates[i] = fields
+
+    removed = 0
+    for i, kf in enumerate(keyframes):
+        if i not in matched and kf.get(FINGERPRINT_FIELD) is not None:
+            removals[i] = [f for f in SYNCED_FIELDS if f in kf]
+            removed += 1
+
+    return SyncResult(updates, removals, added, modified, removed, unchanged, unmatched)
+
+
+def apply_sync(keyframes: list[dict], result: SyncResult) -> None:
+    """Apply a planned sync to plain keyframe dicts."""
+    for i, fields in result.updates.items():
+        keyframes[i].update(fields)
+    for i, names in result.removals.items():
+        for name in names:
+            keyframes[i].pop(name, None)
+
+
+def sync_store(store: CueSheetStore, otio_path: str | Path,
+               before_write: Callable[[], object] | None = None) -> SyncResult:
+    """
+    Sync a timeline into a cue sheet store, writing only changed keyframes.
+
+    before_write runs once, only if something is about to change (e.g. to
+    back up the cue sheet). Raises FileNotFoundError if the cue sheet is missing.
+    """
+    states = read_clip_states(otio_path)
+    if not store.refresh():
+        raise FileNotFoundError(store.path)
+    result = plan_sync(store.keyframes, states)
+    if not result.updates and not result.removals:
+        return result
+
+    if before_write is not None:
+        before_write()
+    with store.batch():
+        for i, fields in result.updates.items():
+            store.update(i, fields)
+        for i, names in result.removals.items():
+            for name in names:
+                store.delete_field(i, name)
+    return result
@@ -1,16 +1,17 @@
 """
 otio_to_insomniax_sync.py
 Reads an OpenTimelineIO file and updates insomniax.json with new timing data.
+Only keyframes whose clip changed since the last sync are rewritten.
 
 Usage:
     python otio_to_insomniax_sync.py insomniax_timeline_extended.otio
 """
 
 import sys
-import json
 from pathlib import Path
 
-import opentimelineio as otio
+import otio_sync
+from cue_store import get_store
 
 CUE_PATH = Path("insomniax.json")
 FPS = 24
@@ -26,44 +27,23 @@ def main() -> None:
         print(f"OTIO file not found: {otio_file}")
         raise SystemExit(1)
 
-    timeline = otio.adapters.read_from_file(otio_file)
-    data = json.loads(CUE_PATH.read_text())
-    keyframes = data.get("keyframes", [])
-
-    for i, clip in enumerate(timeline.find_clips()):
-        if i >= len(keyframes):
-            break
-        kf = keyframes[i]
-        src_range = clip.source_range
-        duration = src_range.duration.to_seconds()
-        start = src_range.start_time.to_seconds()
-
-        kf["otio_start"] = round(start, 3)
-        kf["otio_duration"] = round(duration, 3)
-        kf["scene"] = clip.metadata.get("scene_text", kf.get("scene", ""))
-
-        markers = []
-        for m in clip.markers:
-            markers.append(
-                {
-                    "name": m.name,
-                    "color": m.color,
-                    "start_sec": round(
-                        m.marked_range.start_time.to_seconds(), 3
-                    ),
-                }
-            )
-        if markers:
-            kf["otio_markers"] = markers
+    store = get_store(CUE_PATH)
+    result = otio_sync.sync_store(store, otio_file)
 
+    for i in sorted(result.updates):
+        kf = store.keyframes[i]
         print(
             f"Synced Scene {i+1}: "
-            f"start={start:.2f}s dur={duration:.2f}s markers={len(markers)}"
+            f"start={kf['otio_start']:.2f}s dur={kf['otio_duration']:.2f}s "
+            f"markers={len(kf.get('otio_markers', []))}"
         )
+    print(f"\n{result.summary()}")
 
-    CUE_PATH.write_text(json.dumps(data, indent=2))
+    if not result.updates and not result.removals:
+        print(f"Cue sheet already in sync with {otio_file.name}; nothing written.")
+        return
     print(
-        f"\nCue sheet updated from {otio_file.name} → {CUE_PATH.name}"
+        f"Cue sheet updated from {otio_file.name} → {CUE_PATH.name}"
     )
 
 
@@ -0,0 +1,196 @@
+"""
+render_jobs.py
+Background render jobs for the Insomniax agent.
+
+- Runs auto-cut renders as subprocesses from a worker thread, one at a time
+- Gives every render an id, a log file and its own JSON-lines timing report
+- Derives progress (segments done / planned) from the streamed render report
+- Cancels queued or running renders; new renders either queue or preempt
+"""
+
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from render_report import read_summary
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = {DONE, FAILED, CANCELLED}
+
+
+class RenderJob:
+    """One submitted render and its process/report bookkeeping."""
+
+    def __init__(self, job_id: str, cmd: list[str], report_path: Path, log_path: Path) -> None:
+        self.id = job_id
+        self.cmd = cmd
+        self.report_path = report_path
+        self.log_path = log_path
+        self.state = QUEUED
+        self.proc: subprocess.Popen | None = None
+        self.returncode: int | None = None
+        self.submitted = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+        self.finished_event = threading.Event()
+
+    def progress(self) -> tuple[int, int | None]:
+        """(segments finished, segments planned) read from the render report."""
+        done, total = 0, None
+        try:
+            lines = self.report_path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return done, total
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue   # a line still being written
+            if record.get("type") == "plan":
+                total = record.get("segments")
+            elif record.get("type") == "segment":
+                done += 1
+        return done, total
+
+    def describe(self) -> str:
+        done, total = self.progress()
+        text = f"Render job {self.id}: {self.state}"
+        if self.state == RUNNING:
+            elapsed = time.time() - (self.started or time.time())
+            text += f", {done}/{total if total is not None else '?'} segments, {elapsed:.0f}s elapsed"
+        elif self.state in (DONE, FAILED):
+            text += f" (exit code {self.returncode}, {self.finished - self.started:.1f}s)"
+            summary = read_summary(self.report_path)
+            if summary:
+                text += f"\n{summary}"
+        if self.state == FAILED:
+            text += f"\nLog: {self.log_path}"
+        return text
+
+
+class RenderJobManager:
+    """Serial render queue with status queries and cancellation."""
+
+    def __init__(self, work_dir: Path) -> None:
+        self.work_dir = Path(work_dir)
+        self._jobs: dict[str, RenderJob] = {}
+        self._queue: deque[RenderJob] = deque()
+        self._cond = threading.Condition()
+        self._next_id = 1
+        self._worker: threading.Thread | None = None
+
+    def submit(self, cmd: list[str], preempt: bool = False) -> RenderJob:
+        """
+        Queue a render of `cmd` (a --report argument is appended).
+
+        With preempt, every queued and running render is cancelled first.
+        """
+        if preempt:
+            for job in self.active():
+                self.cancel(job.id)
+
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        with self._cond:
+            job_id = str(self._next_id)
+            self._next_id += 1
+            report = self.work_dir / f"render_{job_id}.jsonl"
+            job = RenderJob(
+                job_id,
+                [*cmd, "--report", str(report)],
+                report,
+                self.work_dir / f"render_{job_id}.log",
+            )
+            self._jobs[job_id] = job
+            self._queue.append(job)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id: str) -> RenderJob | None:
+        return self._jobs.get(str(job_id))
+
+    def jobs(self) -> list[RenderJob]:
+        return list(self._jobs.values())
+
+    def active(self) -> list[RenderJob]:
+        """Running and queued jobs, in the order they will finish."""
+        with self._cond:
+            return [j for j in self._jobs.values() if j.state not in FINISHED]
+
+    def jobs_ahead(self, job: RenderJob) -> int:
+        return sum(1 for j in self.active() if j is not job and int(j.id) < int(job.id))
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if it already finished or is unknown."""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        with self._cond:
+            if job.state in FINISHED:
+                return False
+            was_running = job.state == RUNNING
+            job.state = CANCELLED
+            if not was_running:
+                self._queue.remove(job)
+                job.finished = time.time()
+                job.finished_event.set()
+            proc = job.proc
+        if was_running and proc is not None:
+            _terminate(proc)
+        return True
+
+    def wait(self, job_id: str, timeout: float | None = None) -> RenderJob:
+        job = self._jobs[str(job_id)]
+        job.finished_event.wait(timeout)
+        return job
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job = self._queue.popleft()
+                job.state = RUNNING
+                job.started = time.time()
+                try:
+                    with job.log_path.open("w", encoding="utf-8") as log:
+                        job.proc = subprocess.Popen(
+                            job.cmd,
+                            stdout=log,
+                            stderr=subprocess.STDOUT,
+                            # own process group so cancel also stops ffmpeg children
+                            start_new_session=(os.name == "posix"),
+                        )
+                except OSError as e:
+                    job.state = FAILED
+                    job.returncode = None
+                    job.finished = time.time()
+                    job.log_path.write_text(f"Could not start render: {e}\n", encoding="utf-8")
+                    job.finished_event.set()
+                    continue
+
+            returncode = job.proc.wait()
+            with self._cond:
+                job.returncode = returncode
+                job.finished = time.time()
+                if job.state != CANCELLED:
+                    job.state = DONE if returncode == 0 else FAILED
+                job.finished_event.set()
+
+
+def _terminate(proc: subprocess.Popen) -> None:
+    """Stop a render process and everything it spawned."""
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGTERM)
+        else:
+            proc.terminate()
+    except (ProcessLookupError, PermissionError):
+        pass
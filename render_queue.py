@@ -0,0 +1,351 @@
+"""
+render_queue.py
+SQLite-backed segment queue for distributed Insomniax renders.
+
+- The coordinator (insomniax_autocut_v3 --queue DB) publishes one row per
+  planned segment under a batch id, then waits and runs the final concat
+- Workers claim rows under a time-limited lease; any process that sees the
+  same database, project directory and footage mount can be a worker
+- Claims are atomic (BEGIN IMMEDIATE). A worker renews its lease while it
+  renders. A lease that expires because the worker crashed or its node went
+  away makes the segment claimable again.
+- Completions are fenced by a per-claim token, so a worker whose lease
+  already expired cannot overwrite the outcome of the worker that took over
+- Failed and abandoned segments are retried up to MAX_ATTEMPTS times, then
+  marked failed
+- Lease times are wall-clock; keep LEASE_SECONDS well above clock skew
+  between nodes, and keep the database on a filesystem with working locks
+
+Usage:
+    python render_queue.py worker .insomniax_cache/render_queue.db [--project DIR]
+                           [--batch ID] [--exit-when-idle] [--no-cache] [--no-stream-copy]
+"""
+
+import argparse
+import importlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Callable, Iterable, NamedTuple
+
+QUEUE_PATH = ".insomniax_cache/render_queue.db"
+LEASE_SECONDS = 60.0   # a claim expires unless renewed within this long
+POLL_SECONDS = 0.5     # idle workers / the coordinator check this often
+MAX_ATTEMPTS = 3
+DEFAULT_HANDLER = "insomniax_autocut_v3:render_queued_segment"
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id            INTEGER PRIMARY KEY,
+    batch         TEXT NOT NULL,
+    seq           INTEGER NOT NULL,
+    job           TEXT NOT NULL,
+    state         TEXT NOT NULL DEFAULT 'pending',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    token         TEXT,
+    owner         TEXT,
+    lease_expires REAL,
+    error         TEXT,
+    result        TEXT
+);
+CREATE INDEX IF NOT EXISTS segments_claim ON segments(state, lease_expires);
+CREATE INDEX IF NOT EXISTS segments_batch ON segments(batch, seq);
+"""
+
+
+class Lease(NamedTuple):
+    id: int
+    batch: str
+    seq: int
+    job: dict
+    token: str
+    attempt: int
+
+
+class Outcome(NamedTuple):
+    seq: int
+    job: dict
+    state: str             # DONE or FAILED
+    error: str | None
+    result: dict | None    # whatever the handler reported (mode, seconds, ...)
+    attempts: int
+
+
+def worker_id(pid: int | None = None) -> str:
+    """Lease owner name of the worker process `pid` (default: this one) on this host."""
+    return f"{socket.gethostname()}:{os.getpid() if pid is None else pid}"
+
+
+class RenderQueue:
+    """Lease-based work queue in one SQLite file; one instance per thread."""
+
+    def __init__(self, path: str | os.PathLike = QUEUE_PATH,
+                 lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS) -> None:
+        self.path = os.fspath(path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _write(self) -> "_Transaction":
+        return _Transaction(self.conn)
+
+    # ── coordinator side ────────────────────────────
+    def publish(self, jobs: Iterable[dict], batch: str | None = None) -> str:
+        """Queue jobs (JSON-serializable dicts) in order; returns the batch id."""
+        batch = batch or uuid.uuid4().hex[:12]
+        with self._write():
+            self.conn.executemany(
+                "INSERT INTO segments (batch, seq, job) VALUES (?, ?, ?)",
+                ((batch, seq, json.dumps(job)) for seq, job in enumerate(jobs)),
+            )
+        return batch
+
+    def counts(self, batch: str | None = None) -> dict[str, int]:
+        rows = self.conn.execute(
+            "SELECT state, COUNT(*) FROM segments "
+            "WHERE (:batch IS NULL OR batch = :batch) GROUP BY state",
+            {"batch": batch},
+        )
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(rows.fetchall())
+        return counts
+
+    def open_count(self, batch: str | None = None) -> int:
+        """Segments not finished yet (pending or leased)."""
+        counts = self.counts(batch)
+        return counts[PENDING] + counts[LEASED]
+
+    def outcomes(self, batch: str, after_ids: set[int] | None = None) -> dict[int, Outcome]:
+        """Finished segments of a batch by row id, skipping ids already seen."""
+        rows = self.conn.execute(
+            "SELECT id, seq, job, state, error, result, attempts FROM segments "
+            "WHERE batch = ? AND state IN (?, ?) ORDER BY seq",
+            (batch, DONE, FAILED),
+        )
+        seen = after_ids or set()
+        return {
+            row_id: Outcome(seq, json.loads(job), state, error,
+                            json.loads(result) if result else None, attempts)
+            for row_id, seq, job, state, error, result, attempts in rows
+            if row_id not in seen
+        }
+
+    def claimed_by(self, batch: str, owners: Iterable[str]) -> int:
+        """Segments of a batch whose latest claim was made by one of `owners`."""
+        owners = list(owners)
+        if not owners:
+            return 0
+        row = self.conn.execute(
+            f"SELECT COUNT(*) FROM segments WHERE batch = ? "
+            f"AND owner IN ({', '.join('?' * len(owners))})",
+            (batch, *owners),
+        ).fetchone()
+        return row[0]
+
+    def fail_open(self, batch: str, error: str) -> int:
+        """Give up on every pending or leased segment of a batch; returns how many."""
+        with self._write():
+            cur = self.conn.execute(
+                "UPDATE segments SET state = ?, token = NULL, lease_expires = NULL, error = ? "
+                "WHERE batch = ? AND state IN (?, ?)",
+                (FAILED, error, batch, PENDING, LEASED),
+            )
+        return cur.rowcount
+
+    def purge(self, batch: str) -> None:
+        with self._write():
+            self.conn.execute("DELETE FROM segments WHERE batch = ?", (batch,))
+
+    # ── worker side ─────────────────────────────────
+    def claim(self, owner: str, batch: str | None = None) -> Lease | None:
+        """Lease the next pending (or abandoned) segment, oldest first."""
+        params = {"now": time.time(), "batch": batch, "max": self.max_attempts,
+                  "pending": PENDING, "leased": LEASED, "failed": FAILED}
+        with self._write():
+            # abandoned leases that used up their attempts are not retried
+            self.conn.execute(
+                "UPDATE segments SET state = :failed, token = NULL, "
+                "error = 'lease expired after ' || attempts || ' attempt(s)' "
+                "WHERE state = :leased AND lease_expires < :now AND attempts >= :max "
+                "AND (:batch IS NULL OR batch = :batch)",
+                params,
+            )
+            row = self.conn.execute(
+                "SELECT id, batch, seq, job, attempts FROM segments "
+                "WHERE (state = :pending OR (state = :leased AND lease_expires < :now)) "
+                "AND (:batch IS NULL OR batch = :batch) ORDER BY id LIMIT 1",
+                params,
+            ).fetchone()
+            if row is None:
+                return None
+            row_id, row_batch, seq, job, attempts = row
+            token = uuid.uuid4().hex
+            self.conn.execute(
+                "UPDATE segments SET state = ?, token = ?, owner = ?, "
+                "lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                (LEASED, token, owner, params["now"] + self.lease_seconds, row_id),
+            )
+        return Lease(row_id, row_batch, seq, json.loads(job), token, attempts + 1)
+
+    def renew(self, lease: Lease) -> bool:
+        """Extend a lease; False if it was lost (expired and re-claimed)."""
+        with self._write():
+            cur = self.conn.execute(
+                "UPDATE segments SET lease_expires = ? WHERE id = ? AND token = ? AND state = ?",
+                (time.time() + self.lease_seconds, lease.id, lease.token, LEASED),
+            )
+        return cur.rowcount == 1
+
+    def complete(self, lease: Lease, error: str | None = None,
+                 result: dict | None = None) -> bool:
+        """
+        Record the outcome of a leased segment. Errors are retried until
+        max_attempts. Returns False if the lease was lost meanwhile.
+        """
+        if error is None:
+            state = DONE
+        elif lease.attempt < self.max_attempts:
+            state = PENDING
+        else:
+            state = FAILED
+        with self._write():
+            cur = self.conn.execute(
+                "UPDATE segments SET state = ?, token = NULL, lease_expires = NULL, "
+                "error = ?, result = ? WHERE id = ? AND token = ? AND state = ?",
+                (state, error, json.dumps(result) if result is not None else None,
+                 lease.id, lease.token, LEASED),
+            )
+        return cur.rowcount == 1
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE … COMMIT, so claims never race each other."""
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def __enter__(self) -> None:
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, *exc) -> None:
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _heartbeat(queue_path: str, lease: Lease, lease_seconds: float,
+               stop: threading.Event) -> None:
+    """Renew `lease` every third of its length until stopped (own connection)."""
+    queue = None   # opened on first renewal; most segments finish before that
+    try:
+        while not stop.wait(lease_seconds / 3):
+            queue = queue or RenderQueue(queue_path, lease_seconds)
+            if not queue.renew(lease):
+                return
+    finally:
+        if queue is not None:
+            queue.close()
+
+
+def run_worker(queue: RenderQueue, handler: Callable[[dict], tuple[str | None, dict | None]],
+               owner: str | None = None, batch: str | None = None,
+               exit_when_idle: bool = False, poll: float = POLL_SECONDS,
+               stop: threading.Event | None = None) -> int:
+    """
+    Claim and render segments until stopped; returns how many were processed.
+
+    handler(job) returns (error or None, result dict or None).
+    exit_when_idle: return once nothing in the batch is pending or leased.
+    """
+    owner = owner or worker_id()
+    stop = stop or threading.Event()
+    processed = 0
+    while not stop.is_set():
+        lease = queue.claim(owner, batch)
+        if lease is None:
+            if exit_when_idle and queue.open_count(batch) == 0:
+                break
+            stop.wait(poll)
+            continue
+
+        beat_stop = threading.Event()
+        beat = threading.Thread(
+            target=_heartbeat, args=(queue.path, lease, queue.lease_seconds, beat_stop),
+            daemon=True,
+        )
+        beat.start()
+        try:
+            try:
+                error, result = handler(lease.job)
+            except Exception as e:  # noqa: BLE001
+                error, result = f"{type(e).__name__}: {e}", None
+        finally:
+            beat_stop.set()
+            beat.join()
+        queue.complete(lease, error, {**(result or {}), "worker": owner})
+        processed += 1
+    return processed
+
+
+def load_handler(spec: str) -> Callable[..., tuple[str | None, dict | None]]:
+    """'module:function' → handler(job, cache=..., stream_copy=...)."""
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Insomniax distributed render worker")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="claim and render queued segments")
+    worker.add_argument("queue", help="path of the shared queue database")
+    worker.add_argument("--project", help="project directory to run in (segment and "
+                                          "footage paths are relative to it)")
+    worker.add_argument("--batch", help="only take segments of this batch")
+    worker.add_argument("--exit-when-idle", action="store_true",
+                        help="exit once the batch has nothing pending or leased")
+    worker.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                        help=f"lease length in seconds (default {LEASE_SECONDS:g})")
+    worker.add_argument("--handler", default=DEFAULT_HANDLER, help=argparse.SUPPRESS)
+    worker.add_argument("--no-cache", action="store_true",
+                        help="do not reuse or fill the shared segment cache")
+    worker.add_argument("--no-stream-copy", action="store_true",
+                        help="re-encode keyframe-aligned keep segments")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    queue_path = os.path.abspath(args.queue)
+    if args.project:
+        os.chdir(args.project)
+    sys.path.insert(0, os.getcwd())
+    handler = load_handler(args.handler)
+    options = {"cache": not args.no_cache, "stream_copy": not args.no_stream_copy}
+
+    queue = RenderQueue(queue_path, lease_seconds=args.lease)
+    try:
+        done = run_worker(
+            queue, lambda job: handler(job, **options),
+            batch=args.batch, exit_when_idle=args.exit_when_idle,
+        )
+    except KeyboardInterrupt:
+        done = None
+    finally:
+        queue.close()
+    if done is not None:
+        print(f"Worker {worker_id()} processed {done} segment(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+render_report.py
+Structured timing and instrumentation for Insomniax renders.
+
+- Times each render stage (cue loading, beat analysis, planning, encoding, concat)
+- Records every segment job: wall time, exit code, output size, source clip, path taken
+- Streams records to a JSON-lines file as they happen (usable as a progress feed)
+- Summarizes stage totals, segment time percentiles and the slowest segments
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+
+class RenderReport:
+    """Thread-safe collector writing one JSON object per line to `path`."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.stages: dict[str, float] = {}
+        self.segments: list[dict] = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._f = self.path.open("w", encoding="utf-8")
+
+    def _emit(self, record: dict) -> None:
+        with self._lock:
+            self._f.write(json.dumps(record) + "\n")
+            self._f.flush()
+
+    def event(self, kind: str, **fields) -> None:
+        """Record a free-form event, e.g. the planned segment count."""
+        self._emit({"type": kind, **fields})
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+            self._emit({"type": "stage", "name": name, "seconds": round(seconds, 4)})
+
+    def segment(self, dest: str, src: str, mode: str, seconds: float,
+                exit_code: int | None, error: str | None = None) -> None:
+        """Record one segment job; mode is 'encode', 'copy' or 'cache'."""
+        try:
+            size = os.path.getsize(dest)
+        except OSError:
+            size = None
+        record = {
+            "type": "segment",
+            "dest": dest,
+            "src": src,
+            "mode": mode,
+            "seconds": round(seconds, 4),
+            "exit_code": exit_code,
+            "bytes": size,
+        }
+        if error:
+            record["error"] = error
+        with self._lock:
+            self.segments.append(record)
+        self._emit(record)
+
+    def summary(self, top: int = 5) -> str:
+        total = time.perf_counter() - self._t0
+        lines = ["Render profile:"]
+        stages = " | ".join(f"{name} {sec:.2f}s" for name, sec in self.stages.items())
+        lines.append(f"  stages: {stages or '-'} | total {total:.2f}s")
+
+        if self.segments:
+            times = np.array([s["seconds"] for s in self.segments])
+            p50, p90, p99 = np.percentile(times, [50, 90, 99])
+            modes: dict[str, int] = {}
+            for s in self.segments:
+                modes[s["mode"]] = modes.get(s["mode"], 0) + 1
+            failed = sum(1 for s in self.segments if s.get("error"))
+            mode_text = ", ".join(f"{n} {m}" for m, n in sorted(modes.items()))
+            out_bytes = sum(s["bytes"] or 0 for s in self.segments)
+            lines.append(
+                f"  segments: {len(self.segments)} ({mode_text}; {failed} failed), "
+                f"{out_bytes / 1e6:.1f} MB written"
+            )
+            lines.append(
+                f"  segment time: p50 {p50:.3f}s  p90 {p90:.3f}s  p99 {p99:.3f}s  "
+                f"max {times.max():.3f}s  sum {times.sum():.2f}s"
+            )
+            slowest = sorted(self.segments, key=lambda s: s["seconds"], reverse=True)[:top]
+            lines.append("  slowest:")
+            for s in slowest:
+                lines.append(
+                    f"    {os.path.basename(s['dest'])} {s['seconds']:.3f}s "
+                    f"[{s['mode']}] ← {os.path.basename(s['src'])}"
+                )
+        return "\n".join(lines)
+
+    def close(self) -> str:
+        """Write the summary record, close the file and return the summary text."""
+        text = self.summary()
+        self._emit({"type": "summary", "text": text})
+        self._f.close()
+        return text
+
+
+def read_summary(path: str | Path) -> str | None:
+    """Summary text from a finished report, or None if the render did not finish."""
+    try:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+    for line in reversed(lines):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("type") == "summary":
+            return record["text"]
+    return None
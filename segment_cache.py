@@ -0,0 +1,123 @@
+"""
+segment_cache.py
+Persistent, content-addressed cache for rendered beat segments.
+
+- Keys each segment by source path, source mtime/size, in/out points and FX
+- Stores encoded MP4s under .insomniax_cache/segments/
+- Links cached files into the render directory instead of re-encoding
+- Evicts least-recently-used entries once the cache exceeds its size budget
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+CACHE_DIR = Path(".insomniax_cache/segments")
+MAX_BYTES = 2 * 1024 ** 3   # 2 GiB
+
+
+def _replace_with_link(cached: Path, dest: Path) -> None:
+    """Point dest at cached content; hard link when possible, copy otherwise."""
+    # dest may itself be a link into the cache from an earlier run; unlink it
+    # so nothing ever writes through into a cache entry
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(cached, dest)
+    except OSError:
+        shutil.copy2(cached, dest)
+
+
+class SegmentCache:
+    """Content-addressed segment store with size-bounded LRU eviction."""
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = MAX_BYTES,
+                 salt: str = "") -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        # anything that changes the encoded bytes (encoder settings, filter
+        # strings) goes into the salt so stale entries are never reused
+        self.salt = salt
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def key(self, src: str, start: float, end: float, **fx: bool) -> str | None:
+        """Hash everything that determines a segment's pixels; None if src is unreadable."""
+        try:
+            st = os.stat(src)
+        except OSError:
+            return None
+        material = json.dumps(
+            {
+                "src": os.path.abspath(src),
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "start": f"{start:.3f}",
+                "end": f"{end:.3f}",
+                "fx": fx,
+                "salt": self.salt,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.mp4"
+
+    def fetch(self, key: str, dest: str) -> bool:
+        """Materialize a cached segment at dest; return False on a miss."""
+        cached = self.path_for(key)
+        try:
+            # bump mtime so eviction sees this entry as recently used
+            os.utime(cached)
+            _replace_with_link(cached, Path(dest))
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key: str, rendered: str) -> None:
+        """Add a freshly rendered segment to the cache."""
+        cached = self.path_for(key)
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        # queue workers in other processes share the cache directory, and
+        # their main-thread idents collide; the temp name must not
+        tmp = cached.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.unlink(missing_ok=True)
+        try:
+            try:
+                os.link(rendered, tmp)
+            except OSError:
+                shutil.copy2(rendered, tmp)
+            os.replace(tmp, cached)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def evict(self) -> int:
+        """Drop least-recently-used entries until the cache fits max_bytes."""
+        entries = []
+        total = 0
+        for f in self.root.glob("*/*.mp4"):
+            st = f.stat()
+            entries.append((st.st_mtime, st.st_size, f))
+            total += st.st_size
+
+        removed = 0
+        for _, size, f in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            f.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def summary(self) -> str:
+        return f"Segment cache: {self.hits} hit(s), {self.misses} miss(es)"
@@ -12,5 +12,22 @@ def install() -> None:
     stub.beat = types.SimpleNamespace(
         beat_track=lambda *args, **kwargs: (0, []),
     )
+    stub.onset = types.SimpleNamespace(
+        onset_strength=lambda *args, **kwargs: [],
+    )
     stub.frames_to_time = lambda *args, **kwargs: []
     sys.modules["librosa"] = stub
+
+
+def use_real_librosa(monkeypatch, *modules):
+    """
+    Temporarily swap the real librosa in for the stub, for tests that need
+    actual DSP. Skips the test when librosa is not installed.
+    """
+    import pytest
+
+    monkeypatch.delitem(sys.modules, "librosa", raising=False)
+    real = pytest.importorskip("librosa")
+    for module in modules:
+        monkeypatch.setattr(module, "librosa", real)
+    return real
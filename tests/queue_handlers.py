@@ -0,0 +1,24 @@
+"""Stand-in render_queue handlers for tests (no ffmpeg needed)."""
+
+import os
+import time
+from pathlib import Path
+
+
+def touch_output(job: dict, cache: bool = True, stream_copy: bool = True):
+    dest = Path(job["dest"])
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with dest.open("a", encoding="utf-8") as f:
+        f.write(f"{os.getpid()}\n")
+    time.sleep(0.05)
+    mode = "copy" if "copy" in dest.name else "encode"
+    return None, {"mode": mode, "seconds": 0.05, "exit_code": 0}
+
+
+def crash_once(job: dict, cache: bool = True, stream_copy: bool = True):
+    """Kill the worker process the first time it sees a job marked 'crash'."""
+    marker = Path(job["dest"] + ".crashed")
+    if "crash" in job["dest"] and not marker.exists():
+        marker.write_text("x")
+        os._exit(1)
+    return touch_output(job)
@@ -0,0 +1,86 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+THIS_DIR = Path(__file__).resolve().parent
+if str(THIS_DIR) not in sys.path:
+    sys.path.insert(0, str(THIS_DIR))
+
+from librosa_stub import install as install_librosa_stub
+from librosa_stub import use_real_librosa
+
+install_librosa_stub()
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import beat_analysis
+
+
+def test_analyze_caches_by_content_and_parameters(tmp_path, monkeypatch, capsys):
+    audio = tmp_path / "mix.wav"
+    audio.write_bytes(b"RIFF-fake-audio")
+    calls = []
+
+    def fake_run_analysis(audio_path, hop_length=beat_analysis.HOP_LENGTH):
+        calls.append(hop_length)
+        return beat_analysis.BeatAnalysis(
+            tempo=121.5,
+            beat_times=np.array([0.5, 1.0, 1.5]),
+            onset_env=np.linspace(0, 1, 8, dtype=np.float32),
+            sr=44100,
+            hop_length=hop_length,
+        )
+
+    monkeypatch.setattr(beat_analysis, "run_analysis", fake_run_analysis)
+    cache_dir = tmp_path / "beats"
+
+    cold = beat_analysis.analyze(audio, cache_dir=cache_dir)
+    warm = beat_analysis.analyze(audio, cache_dir=cache_dir)
+
+    assert calls == [512]
+    assert warm.tempo == cold.tempo == 121.5
+    np.testing.assert_array_equal(warm.beat_times, cold.beat_times)
+    np.testing.assert_array_equal(warm.onset_env, cold.onset_env)
+    out = capsys.readouterr().out
+    assert "cache miss" in out and "cache hit" in out
+
+    beat_analysis.analyze(audio, hop_length=256, cache_dir=cache_dir)
+    assert calls == [512, 256]
+
+    audio.write_bytes(b"RIFF-other-audio")
+    beat_analysis.analyze(audio, cache_dir=cache_dir)
+    assert calls == [512, 256, 512]
+
+    # identical content elsewhere on disk shares the entry
+    copy = tmp_path / "copy.wav"
+    copy.write_bytes(b"RIFF-other-audio")
+    beat_analysis.analyze(copy, cache_dir=cache_dir)
+    assert calls == [512, 256, 512]
+
+
+def test_streaming_beats_match_whole_file_beat_track(tmp_path, monkeypatch):
+    librosa = use_real_librosa(monkeypatch, beat_analysis)
+    sf = __import__("pytest").importorskip("soundfile")
+
+    sr = 22050
+    duration = 60.0
+    click_times = np.arange(0.25, duration, 60.0 / 128.0)
+    y = 0.8 * librosa.clicks(times=click_times, sr=sr, length=int(sr * duration))
+    audio = tmp_path / "clicks.wav"
+    sf.write(audio, y.astype(np.float32), sr)
+
+    full = beat_analysis.run_analysis(audio)
+    tracker = beat_analysis.StreamingBeatTracker(
+        audio, block_seconds=2.5, window_seconds=15.0, overlap_seconds=5.0
+    )
+    streamed = tracker.result()
+
+    assert len(tracker.onset_env) == len(full.onset_env)
+    assert abs(streamed.tempo - full.tempo) < 1.0
+    assert abs(len(streamed.beat_times) - len(full.beat_times)) <= 1
+    # every whole-file beat has a streamed beat within one hop (~23 ms)
+    nearest = np.abs(streamed.beat_times[None, :] - full.beat_times[:, None]).min(axis=1)
+    assert nearest.max() <= 512 / sr
@@ -30,3 +30,48 @@ def test_choose_clip_prefers_default_entry(monkeypatch):
     selected = choose_clip("no match here", clip_map)
 
     assert selected == "default.mp4"
+
+
+def _linear_choose_clip(scene_text, clip_map, rng):
+    """The original tag scan, kept as the reference for the compiled matcher."""
+    scene_text = scene_text.lower()
+    for tag, path in clip_map.items():
+        if tag.lower() in scene_text:
+            return path
+    default_entry = next((clip_map[k] for k in clip_map if k.lower() == "default"), None)
+    if rng.random() < 0.2:
+        pool = [p for k, p in clip_map.items() if k.lower() != "default" or default_entry is None]
+        if not pool and default_entry is not None:
+            pool = [default_entry]
+        return rng.choice(pool)
+    if default_entry is not None:
+        return default_entry
+    return next(iter(clip_map.values()))
+
+
+def test_choose_clip_returns_first_matching_tag_in_map_order():
+    clip_map = {"sink": "sink.mp4", "bathroom sink": "bathroom.mp4", "default": "d.mp4"}
+    assert choose_clip("The BATHROOM SINK drips", clip_map) == "sink.mp4"
+    clip_map = {"bathroom sink": "bathroom.mp4", "sink": "sink.mp4"}
+    assert choose_clip("the bathroom sink drips", clip_map) == "bathroom.mp4"
+
+
+def test_clip_matcher_agrees_with_the_linear_scan():
+    import random
+
+    from clip_matcher import ClipMatcher
+
+    gen = random.Random(7)
+    alphabet = "abcde "
+    for trial in range(200):
+        tags = ["".join(gen.choice(alphabet) for _ in range(gen.randint(0, 4))) for _ in range(gen.randint(1, 12))]
+        if trial % 3 == 0:
+            tags.append(gen.choice(["default", "DEFAULT", "Default"]))
+        clip_map = {tag: f"clip_{n}.mp4" for n, tag in enumerate(tags)}
+        matcher = ClipMatcher(clip_map)
+        for _ in range(20):
+            scene = "".join(gen.choice(alphabet + "ABC") for _ in range(gen.randint(0, 15)))
+            seed = gen.random()
+            assert matcher.choose(scene, random.Random(seed)) == _linear_choose_clip(
+                scene, clip_map, random.Random(seed)
+            ), (clip_map, scene)
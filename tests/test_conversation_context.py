@@ -0,0 +1,76 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from conversation_context import SUMMARY_PREFIX, ConversationContext, estimate_tokens
+
+
+def _turn(ctx, i, result_chars=4000):
+    ctx.append({"role": "user", "content": f"edit scene {i}"})
+    ctx.append({
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{"id": f"call_{i}", "type": "function",
+                        "function": {"name": "list_versions", "arguments": "{}"}}],
+    })
+    ctx.append({"role": "tool", "tool_call_id": f"call_{i}", "name": "list_versions",
+                "content": f"versions for turn {i}\n" + "v" * result_chars})
+    ctx.append({"role": "assistant", "content": f"Done with scene {i}."})
+
+
+def test_under_budget_history_is_untouched():
+    ctx = ConversationContext(budget_tokens=10_000)
+    _turn(ctx, 0, result_chars=100)
+    before = [dict(m) for m in ctx.messages]
+    assert ctx.compact() is False
+    assert ctx.messages == before
+    assert ctx.total_tokens() == sum(estimate_tokens(m) for m in before)
+
+
+def test_old_tool_results_are_elided_before_summarizing():
+    ctx = ConversationContext(budget_tokens=1800, keep_recent=4, max_result_tokens=50)
+    _turn(ctx, 0)
+    _turn(ctx, 1)
+    assert ctx.compact() is True
+
+    old, recent = ctx.messages[2], ctx.messages[6]
+    assert old["role"] == "tool" and "characters elided" in old["content"]
+    assert old["content"].startswith("versions for turn 0")
+    assert old["tool_call_id"] == "call_0"
+    assert recent["content"].endswith("v" * 4000)   # recent window kept verbatim
+    assert len(ctx.messages) == 8
+    assert ctx.total_tokens() <= 1800
+
+
+def test_long_session_stays_within_budget_and_keeps_tool_pairs():
+    ctx = ConversationContext(budget_tokens=1500, keep_recent=4, max_result_tokens=50)
+    for i in range(40):
+        _turn(ctx, i)
+        ctx.compact()
+        assert ctx.total_tokens() <= 1500
+
+    summary = ctx.messages[0]
+    assert summary["role"] == "system" and summary["content"].startswith(SUMMARY_PREFIX)
+    assert "edit scene 38" in summary["content"]
+    # the verbatim part starts at a user turn, so no tool result is orphaned
+    assert ctx.messages[1] == {"role": "user", "content": "edit scene 39"}
+    assert sum(1 for m in ctx.messages if m["role"] == "system") == 1
+
+
+def test_custom_summarizer_gets_the_folded_messages():
+    seen = []
+
+    def summarizer(messages):
+        seen.append([m["role"] for m in messages])
+        return "short summary"
+
+    ctx = ConversationContext(budget_tokens=200, keep_recent=4, max_result_tokens=20,
+                              summarizer=summarizer)
+    _turn(ctx, 0)
+    _turn(ctx, 1)
+    ctx.compact()
+    assert seen == [["user", "assistant", "tool", "assistant"]]
+    assert ctx.messages[0]["content"] == f"{SUMMARY_PREFIX}\nshort summary"
@@ -0,0 +1,75 @@
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from cue_store import CueSheetStore
+
+WORDS = ["Hallway", "flicker", "sink", "mirror", "Déjà", "vu", "stairwell", "neon", "3am", "door"]
+
+
+def _write(path, keyframes):
+    path.write_text(json.dumps({"keyframes": keyframes}, indent=2))
+
+
+def test_find_matches_a_substring_scan(tmp_path):
+    rng = random.Random(0)
+    keyframes = [
+        {"scene": " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 5)))}
+        for _ in range(300)
+    ]
+    keyframes.append({"note": "no scene text"})
+    path = tmp_path / "insomniax.json"
+    _write(path, keyframes)
+    store = CueSheetStore(path)
+
+    for keyword in ["hall", "LWAY FLI", "déjà vu", "3a", "r d", "", " ", "-", "nothing", "k m"]:
+        expected = [
+            i for i, kf in enumerate(keyframes)
+            if keyword.lower() in kf.get("scene", "").lower()
+        ]
+        assert store.find(keyword) == expected, keyword
+
+
+def test_batched_edits_flush_once_and_atomically(tmp_path):
+    path = tmp_path / "insomniax.json"
+    _write(path, [{"scene": "hallway"}, {"scene": "sink"}])
+    store = CueSheetStore(path)
+    store.refresh()
+
+    with store.batch():
+        store.set_field(0, "scene", "mirror room")
+        store.set_field(1, "note", "slow")
+        assert json.loads(path.read_text())["keyframes"][0]["scene"] == "hallway"
+
+    on_disk = json.loads(path.read_text())
+    assert on_disk["keyframes"] == [{"scene": "mirror room"}, {"scene": "sink", "note": "slow"}]
+    assert store.find("hallway") == [] and store.find("mirror") == [0]
+    assert [p.name for p in tmp_path.iterdir()] == ["insomniax.json"]
+
+
+def test_reloads_only_after_external_changes(tmp_path, monkeypatch):
+    path = tmp_path / "insomniax.json"
+    _write(path, [{"scene": "hallway"}])
+    store = CueSheetStore(path)
+    store.refresh()
+
+    reads = []
+    real_read = Path.read_text
+    monkeypatch.setattr(Path, "read_text", lambda self, *a, **k: reads.append(self) or real_read(self, *a, **k))
+
+    store.find("hall")
+    store.set_field(0, "note", "x")   # our own flush must not trigger a reload
+    store.find("hall")
+    assert reads == []
+
+    _write(path, [{"scene": "stairwell"}, {"scene": "hallway"}])
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert store.find("hall") == [1]
+    assert len(reads) == 1
@@ -0,0 +1,116 @@
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+
+THIS_DIR = Path(__file__).resolve().parent
+if str(THIS_DIR) not in sys.path:
+    sys.path.insert(0, str(THIS_DIR))
+
+from librosa_stub import install as install_librosa_stub
+
+install_librosa_stub()
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import clip_map_maker
+import embedding_index
+import insomniax_autocut_v3 as autocut
+
+
+class ConceptEncoder:
+    """Tiny stand-in for a real model: words map onto shared concept axes."""
+
+    CONCEPTS = {"bathroom": 0, "sink": 0, "tiles": 0, "hallway": 1, "corridor": 1,
+                "mirror": 2, "reflection": 2}
+    name = "concepts"
+    dim = 4
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().replace("_", " ").split():
+                out[row, self.CONCEPTS.get(word, 3)] += 1.0
+        return embedding_index.normalize(out)
+
+
+def test_hashing_encoder_is_deterministic_and_spelling_aware():
+    enc = embedding_index.HashingEncoder(dim=256)
+    a, b, c = enc.encode(["dark hallway", "Dark hallways", "mirror"])
+    assert np.array_equal(enc.encode(["dark hallway"])[0], a)
+    assert np.isclose(np.linalg.norm(a), 1.0)
+    assert a @ b > 0.6 > a @ c
+    assert embedding_index.load_encoder("hashing:64").dim == 64
+
+
+def test_cache_encodes_only_new_texts_and_memory_maps_vectors(tmp_path):
+    enc = ConceptEncoder()
+    cache = embedding_index.EmbeddingCache(enc, tmp_path)
+    first = cache.embed(["sink", "hallway", "sink"])
+    assert enc.calls == [["sink", "hallway"]]
+    assert np.array_equal(first[0], first[2])
+
+    reopened = embedding_index.EmbeddingCache(enc, tmp_path)
+    again = reopened.embed(["hallway", "mirror"])
+    assert enc.calls[-1] == ["mirror"] and reopened.encoded == 1
+    assert np.array_equal(again[0], first[1])
+    assert isinstance(reopened.matrix(), np.memmap) and reopened.matrix().shape == (3, 4)
+
+
+def test_top_k_matches_a_full_sort():
+    gen = np.random.default_rng(0)
+    matrix = embedding_index.normalize(gen.normal(size=(200, 16)).astype(np.float32))
+    queries = embedding_index.normalize(gen.normal(size=(7, 16)).astype(np.float32))
+    idx, scores = embedding_index.top_k(queries, matrix, 5)
+    expected = np.argsort(-(queries @ matrix.T), axis=1)[:, :5]
+    assert np.array_equal(idx, expected)
+    assert (np.diff(scores, axis=1) <= 0).all()
+    assert embedding_index.top_k(queries, matrix[:3], 5)[0].shape == (7, 3)
+
+
+def test_semantic_match_fills_in_when_no_tag_matches(tmp_path):
+    clip_map = {"hallway": "footage/hallway_01.mp4", "sink": "footage/sink_closeup.mp4",
+                "default": "footage/default.mp4"}
+    cache = embedding_index.EmbeddingCache(ConceptEncoder(), tmp_path)
+    semantic = embedding_index.SemanticMatcher(clip_map, cache, min_score=0.5)
+
+    assert semantic.best_many(["the bathroom tiles", "a reflection"]) == [
+        "footage/sink_closeup.mp4", None,
+    ]
+
+    class NoRandom(random.Random):
+        def random(self):
+            return 1.0
+
+    assert autocut.choose_clip("the bathroom", clip_map, NoRandom(), semantic) == (
+        "footage/sink_closeup.mp4"
+    )
+    # a literal tag still wins over a semantic hit
+    assert autocut.choose_clip("bathroom by the hallway", clip_map, NoRandom(), semantic) == (
+        "footage/hallway_01.mp4"
+    )
+    assert autocut.choose_clip("the bathroom", clip_map, NoRandom()) == "footage/default.mp4"
+
+    cue = {"keyframes": [{"scene": "bathroom"}, {"scene": "hallway"}, {"scene": "sky"}]}
+    plan = autocut.build_plan(cue, clip_map, [0.0, 1.0, 2.0], seed=3, semantic=semantic)
+    assert plan.sources[:2] == ["footage/sink_closeup.mp4", "footage/hallway_01.mp4"]
+    assert plan.sources[2] == autocut.build_plan(cue, clip_map, [0.0, 1.0, 2.0], seed=3).sources[2]
+
+
+def test_clip_map_maker_semantic_matches(tmp_path, monkeypatch):
+    enc = ConceptEncoder()
+    monkeypatch.setattr(embedding_index, "CACHE_DIR", tmp_path / "emb")
+    monkeypatch.setattr(embedding_index, "load_encoder", lambda spec: enc)
+
+    footage = ["footage/sink.mp4", "footage/corridor.mp4"]
+    matches = clip_map_maker.semantic_matches(["bathroom", "hallway", "weather"], footage,
+                                              min_score=0.5)
+    assert matches == {"bathroom": footage[0], "hallway": footage[1]}
+    assert (tmp_path / "emb" / "concepts" / "vectors.f32").exists()
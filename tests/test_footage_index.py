@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import clip_map_maker
+import footage_index
+import media_probe
+
+
+def _touch(path: Path, content: str = "video") -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    return path
+
+
+def _index(tmp_path, calls):
+    def fake_probe(path):
+        calls.append(Path(path).name)
+        return media_probe.StreamInfo(12.5, 1920, 1080, 23.976)
+    return footage_index.FootageIndex(tmp_path / "footage.db", prober=fake_probe)
+
+
+def test_recursive_scan_probes_only_new_or_changed_files(tmp_path):
+    root = tmp_path / "footage"
+    _touch(root / "hallway_flicker_01.mp4")
+    _touch(root / "night" / "neon-sink.MOV")
+    _touch(root / "night" / "deep" / "stairwell.mkv")
+    _touch(root / "night" / "notes.txt")
+    _touch(root / ".trash" / "hidden_hallway.mp4")
+    calls = []
+
+    with _index(tmp_path, calls) as index:
+        first = index.scan(root)
+        assert (first.files, first.added, first.probed) == (3, 3, 3)
+        entry = index.get(str(root / "night" / "neon-sink.MOV"))
+        assert (entry.duration, entry.width, entry.height, entry.fps) == (12.5, 1920, 1080, 23.976)
+
+        calls.clear()
+        again = index.scan(root)
+        assert (again.added, again.modified, again.removed, again.probed) == (0, 0, 0, 0)
+        assert calls == []
+
+        _touch(root / "hallway_flicker_01.mp4", "re-exported video")
+        (root / "night" / "deep" / "stairwell.mkv").unlink()
+        _touch(root / "mirror.mp4")
+        third = index.scan(root)
+        assert (third.added, third.modified, third.removed) == (1, 1, 1)
+        assert sorted(calls) == ["hallway_flicker_01.mp4", "mirror.mp4"]
+        assert index.lookup("stairwell") == []
+
+
+def test_index_survives_reopen(tmp_path):
+    root = tmp_path / "footage"
+    _touch(root / "mirror.mp4")
+    calls = []
+    with _index(tmp_path, calls) as index:
+        index.scan(root)
+    with _index(tmp_path, calls) as index:
+        assert index.scan(root).probed == 0
+        assert index.lookup("mirror") == [str(root / "mirror.mp4")]
+    assert calls == ["mirror.mp4"]
+
+
+def test_lookup_prefers_exact_then_prefix_then_substring(tmp_path):
+    root, other = tmp_path / "footage", tmp_path / "other"
+    _touch(root / "b_hall.mp4")
+    _touch(root / "a_hallway.mp4")
+    _touch(root / "corridor_stairhall.mp4")
+    _touch(other / "hall.mp4")
+
+    with _index(tmp_path, []) as index:
+        index.scan(root, probe=False)
+        index.scan(other, probe=False)
+        assert index.lookup("hall", root) == [str(root / "b_hall.mp4")]
+        assert index.lookup("HALL") == sorted([str(root / "b_hall.mp4"), str(other / "hall.mp4")])
+        assert index.lookup("hallw", root) == [str(root / "a_hallway.mp4")]
+        assert index.lookup("airhal", root) == [str(root / "corridor_stairhall.mp4")]
+        assert index.lookup("sink", root) == []
+        assert index.entries(root)[0].duration is None
+        assert set(index.tokens(other)) == {"hall"}
+
+
+def test_make_clip_map_uses_the_index(tmp_path, monkeypatch):
+    cue = tmp_path / "insomniax.json"
+    cue.write_text(json.dumps({"keyframes": [
+        {"scene": "The hallway flickers"}, {"scene": "A mirror in the rain"},
+    ]}))
+    footage = tmp_path / "footage"
+    _touch(footage / "a_corridor.mp4")
+    _touch(footage / "takes" / "hallway_02.mp4")
+    _touch(footage / "mirror_closeup.mov")
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(clip_map_maker, "CUE_SHEET", cue)
+    monkeypatch.setattr(clip_map_maker, "FOOTAGE_DIR", footage)
+    monkeypatch.setattr(clip_map_maker, "OUT_FILE", tmp_path / "clip_map.json")
+    monkeypatch.setattr(media_probe, "run_ffprobe_stream", lambda path: None)
+
+    clip_map_maker.make_clip_map()
+
+    assert json.loads((tmp_path / "clip_map.json").read_text()) == {
+        "hallway": str(footage / "takes" / "hallway_02.mp4"),
+        "mirror": str(footage / "mirror_closeup.mov"),
+        "default": str(footage / "a_corridor.mp4"),
+    }
+    assert os.path.exists(tmp_path / footage_index.INDEX_PATH)
@@ -44,10 +44,9 @@ def test_update_cue_sheet_creates_version_backup(tmp_path, monkeypatch, fixed_ti
 
     result = agent.update_cue_sheet("First", "note", "final")
 
-    backup_path = versions_dir / "insomniax_2025-01-02_03-04-05.json"
-    assert backup_path.exists(), "Expected a timestamped backup to be created"
+    assert agent.list_versions() == "2025-01-02_03-04-05", "Expected a timestamped version to be recorded"
 
-    backup_contents = json.loads(backup_path.read_text(encoding="utf-8"))
+    backup_contents = agent.version_store().restore("2025-01-02_03-04-05")
     assert backup_contents == original_data, "Backup should preserve the original cue sheet"
 
     updated = json.loads(cue_path.read_text(encoding="utf-8"))
@@ -56,3 +55,199 @@ def test_update_cue_sheet_creates_version_backup(tmp_path, monkeypatch, fixed_ti
 
     expected_fragment = "Updated 'note' in 1 keyframe(s) containing 'First'."
     assert expected_fragment in result
+
+
+def _fake_render_command(script: str) -> list[str]:
+    """A stand-in renderer: writes a render report for the --report path it gets."""
+    prelude = (
+        "import sys, time\n"
+        f"sys.path.insert(0, {str(ROOT)!r})\n"
+        "from render_report import RenderReport\n"
+        "report = RenderReport(sys.argv[sys.argv.index('--report') + 1])\n"
+    )
+    return [sys.executable, "-c", prelude + script]
+
+
+def test_render_video_runs_in_background_and_reports_progress(tmp_path, monkeypatch):
+    from render_jobs import RenderJobManager
+
+    manager = RenderJobManager(tmp_path / "jobs")
+    monkeypatch.setattr(agent, "RENDER_JOBS", manager)
+    monkeypatch.setattr(
+        agent,
+        "RENDER_COMMAND",
+        _fake_render_command(
+            "report.event('plan', segments=2)\n"
+            "report.segment('00_000_keep.mp4', 'clip.mp4', 'encode', 0.3, 0)\n"
+            "report.segment('00_001_reverse.mp4', 'clip.mp4', 'encode', 0.4, 0)\n"
+            "report.close()\n"
+        ),
+    )
+
+    result = agent.render_video()
+    assert result.startswith("Render job 1 started in the background")
+
+    job = manager.wait("1", timeout=30)
+    assert "--seed" in job.cmd
+    assert job.progress() == (2, 2)
+
+    status = agent.render_status("1")
+    assert status.startswith("Render job 1: done (exit code 0")
+    assert "Render profile:" in status and "00_001_reverse.mp4" in status
+    assert agent.render_status("99") == "No render job 99."
+
+
+def test_render_jobs_queue_and_cancel(tmp_path, monkeypatch):
+    from render_jobs import RenderJobManager
+
+    manager = RenderJobManager(tmp_path / "jobs")
+    monkeypatch.setattr(agent, "RENDER_JOBS", manager)
+    monkeypatch.setattr(
+        agent,
+        "RENDER_COMMAND",
+        _fake_render_command("report.event('plan', segments=400)\ntime.sleep(60)\n"),
+    )
+
+    agent.render_video()
+    assert agent.render_video() == "Render job 2 queued behind 1 other render(s)."
+
+    # a preempting render cancels both the running and the queued job
+    assert agent.render_video(preempt=True).startswith("Render job 3 started")
+    assert manager.wait("1", timeout=30).state == "cancelled"
+    assert manager.get("2").state == "cancelled"
+
+    assert agent.cancel_render("3") == "Cancelled render job(s): 3"
+    assert manager.wait("3", timeout=30).state == "cancelled"
+    assert agent.cancel_render() == "Nothing to cancel."
+
+
+def test_collect_stream_assembles_text_and_parallel_tool_calls():
+    chunks = [
+        {"choices": [{"delta": {"role": "assistant"}}]},
+        {"choices": [{"delta": {"content": "Checking "}}]},
+        {"choices": [{"delta": {"content": "both."}}]},
+        {"choices": [{"delta": {"tool_calls": [
+            {"index": 0, "id": "call_a", "function": {"name": "list_versions", "arguments": ""}},
+        ]}}]},
+        {"choices": [{"delta": {"tool_calls": [
+            {"index": 1, "id": "call_b", "function": {"name": "sync_", "arguments": '{"otio_'}},
+        ]}}]},
+        {"choices": [{"delta": {"tool_calls": [
+            {"index": 1, "function": {"name": "from_otio", "arguments": 'path": "t.otio"}'}},
+            {"index": 0, "function": {"arguments": "{}"}},
+        ]}}]},
+        {"choices": []},
+    ]
+    echoed = []
+
+    msg, first_token = agent.collect_stream(iter(chunks), on_text=echoed.append)
+
+    assert first_token is not None
+    assert echoed == ["Checking ", "both."]
+    assert msg["content"] == "Checking both."
+    assert agent.requested_calls(msg) == [
+        ("call_a", "list_versions", "{}"),
+        ("call_b", "sync_from_otio", '{"otio_path": "t.otio"}'),
+    ]
+
+
+def test_collect_stream_supports_legacy_function_call():
+    chunks = [
+        {"choices": [{"delta": {"function_call": {"name": "render_", "arguments": ""}}}]},
+        {"choices": [{"delta": {"function_call": {"name": "video", "arguments": "{}"}}}]},
+    ]
+    msg, _ = agent.collect_stream(chunks)
+    assert agent.requested_calls(msg) == [(None, "render_video", "{}")]
+
+
+def test_independent_tool_calls_run_concurrently_and_writers_stay_ordered(monkeypatch):
+    import threading
+    import time
+
+    assert agent.schedule_calls(["list_versions", "sync_from_otio", "render_status"]) == [[0, 1, 2]]
+    assert agent.schedule_calls(["update_cue_sheet", "render_video", "list_versions"]) == [[0], [1, 2]]
+    assert agent.schedule_calls(["update_cue_sheet", "restore_version"]) == [[0], [1]]
+    assert agent.schedule_calls(["list_versions", "unknown_tool"]) == [[0], [1]]
+
+    running = []
+    overlap = threading.Event()
+    lock = threading.Lock()
+
+    def tracked(name):
+        def tool(**kwargs):
+            with lock:
+                running.append(name)
+                if len(running) > 1:
+                    overlap.set()
+            time.sleep(0.05)
+            with lock:
+                running.remove(name)
+            return f"{name} ok"
+        return tool
+
+    monkeypatch.setitem(agent.__dict__, "list_versions", tracked("list_versions"))
+    monkeypatch.setitem(agent.__dict__, "sync_from_otio", tracked("sync_from_otio"))
+
+    results = agent.execute_tool_calls([
+        ("a", "list_versions", "{}"),
+        ("b", "sync_from_otio", "{}"),
+    ])
+
+    assert results == ["list_versions ok", "sync_from_otio ok"]
+    assert overlap.is_set()
+
+
+def test_request_prefix_is_static_and_read_only_tools_are_cached(tmp_path, monkeypatch):
+    from collections import OrderedDict
+
+    history = [{"role": "user", "content": "list versions"}]
+    first = agent.request_messages(history)
+    history.append({"role": "assistant", "content": "Here they are."})
+    second = agent.request_messages(history)
+    assert first[0] is second[0] and first[0]["role"] == "system"
+    assert second[1:] == history
+
+    cue_path = tmp_path / "insomniax.json"
+    cue_path.write_text(json.dumps({"keyframes": []}), encoding="utf-8")
+    versions_dir = tmp_path / "versions"
+    versions_dir.mkdir()
+    monkeypatch.setattr(agent, "CUE_PATH", cue_path)
+    monkeypatch.setattr(agent, "VERSIONS_DIR", versions_dir)
+    monkeypatch.setattr(agent, "_tool_cache", OrderedDict())
+
+    calls = []
+    real = agent.list_versions
+    monkeypatch.setitem(agent.__dict__, "list_versions", lambda: calls.append(1) or real())
+
+    assert agent.call_tool("list_versions", "{}") == "No backups found."
+    assert agent.call_tool("list_versions", "{}") == "No backups found."
+    assert len(calls) == 1
+
+    # a new backup or a cue-sheet edit invalidates the cached answer
+    agent.version_store().commit({"keyframes": []}, "2025-01-02_03-04-05")
+    assert agent.call_tool("list_versions", "{}") == "2025-01-02_03-04-05"
+    cue_path.write_text(json.dumps({"keyframes": [{"scene": "x"}]}), encoding="utf-8")
+    agent.call_tool("list_versions", "{}")
+    assert len(calls) == 3
+
+    # tools that are not read-only are never cached
+    agent.call_tool("render_status", "{}")
+    assert all(key.startswith("list_versions|") for key in agent._tool_cache)
+
+
+def test_probe_clips_reports_clip_metadata(tmp_path, monkeypatch):
+    import media_probe
+
+    clip_map = tmp_path / "clip_map.json"
+    monkeypatch.setattr(agent, "CLIP_MAP_PATH", clip_map)
+    assert agent.probe_clips() == f"Clip map {clip_map} does not exist."
+
+    clip_map.write_text(json.dumps({"hallway": "hallway.mp4", "default": "hallway.mp4"}))
+    monkeypatch.setattr(
+        media_probe, "probe_many",
+        lambda paths, workers=media_probe.PROBE_WORKERS: {
+            p: media_probe.ProbeInfo("h264", [0.0, 2.0], 1280, 720, 8.0, 24.0) for p in paths
+        },
+    )
+    assert agent.probe_clips() == "hallway.mp4: 8.00s, 1280x720 @ 24.000 fps, h264, 2 keyframe(s)"
+    assert not agent._conflicts("probe_clips", "update_cue_sheet")
@@ -0,0 +1,172 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from lmstudio_client import LMStudioClient, LMStudioError
+
+
+class StubServer:
+    """Local OpenAI-compatible stub; `plan` lists what each request gets."""
+
+    def __init__(self, plan):
+        self.plan = list(plan)
+        self.requests = []
+        self.raw = []
+        self.peers = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers["Content-Length"]))
+                stub.raw.append(raw)
+                body = json.loads(raw)
+                stub.requests.append(body)
+                stub.peers.add(self.client_address)
+                action = stub.plan.pop(0) if stub.plan else "ok"
+                if action == "503":
+                    self._send(503, b"busy", "text/plain")
+                elif action == "stall":
+                    time.sleep(1.0)
+                    self._send(200, b"{}", "application/json")
+                elif action == "truncated":
+                    # one good chunk, then the connection drops mid-chunk
+                    first = b'data: {"choices": [{"delta": {"content": "Hel"}}]}\n\n'
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(first), first))
+                    self.wfile.write(b"400\r\ndata: {\"cho")
+                    self.wfile.flush()
+                    self.close_connection = True
+                elif action == "badjson":
+                    payload = b'data: {"choices": [{"delta": {"content": "Hel"}}]}\n\ndata: {oops\n\n'
+                    self._send(200, payload, "text/event-stream")
+                elif body.get("stream"):
+                    events = [
+                        {"choices": [{"delta": {"content": "Hel"}}]},
+                        {"choices": [{"delta": {"content": "lo"}}]},
+                    ]
+                    payload = "".join(f"data: {json.dumps(e)}\n\n" for e in events)
+                    self._send(200, (payload + "data: [DONE]\n\n").encode(), "text/event-stream")
+                else:
+                    reply = {"choices": [{"message": {"role": "assistant", "content": "Hello"}}]}
+                    self._send(200, json.dumps(reply).encode(), "application/json")
+
+            def _send(self, status, data, ctype):
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture()
+def stub():
+    servers = []
+
+    def make(plan=()):
+        servers.append(StubServer(plan))
+        return servers[-1]
+
+    yield make
+    for s in servers:
+        s.close()
+
+
+def test_streamed_turns_reuse_one_connection(stub):
+    server = stub()
+    client = LMStudioClient(server.url, backoff=0)
+
+    for _ in range(3):
+        chunks = list(client.chat_stream(model="m", messages=[{"role": "user", "content": "hi"}]))
+        assert "".join(c["choices"][0]["delta"]["content"] for c in chunks) == "Hello"
+
+    assert all(r["stream"] is True for r in server.requests)
+    assert len(server.peers) == 1          # keep-alive: one TCP connection for all turns
+    assert len(client.stats.records) == 3 and all(r["ok"] for r in client.stats.records)
+    assert "3 requests (0 failed, 0 retries)" in client.stats.summary()
+
+
+def test_retries_server_errors_and_read_timeouts_with_backoff(stub):
+    server = stub(["503", "stall", "ok"])
+    client = LMStudioClient(server.url, read_timeout=0.3, max_retries=2, backoff=0.05)
+
+    t0 = time.perf_counter()
+    reply = client.chat(model="m", messages=[])
+    elapsed = time.perf_counter() - t0
+
+    assert reply["choices"][0]["message"]["content"] == "Hello"
+    assert len(server.requests) == 3
+    assert elapsed >= 0.05 + 0.1 + 0.3     # both backoff delays + the stalled read
+    assert client.stats.records[-1]["attempts"] == 3
+
+
+def test_gives_up_after_max_retries(stub):
+    server = stub(["503"] * 5)
+    client = LMStudioClient(server.url, max_retries=1, backoff=0)
+
+    with pytest.raises(LMStudioError, match="2 attempts"):
+        list(client.chat_stream(model="m", messages=[]))
+    assert len(server.requests) == 2
+    assert "1 failed" in client.stats.summary()
+
+
+@pytest.mark.parametrize("action, reason", [
+    ("truncated", "ChunkedEncodingError"),
+    ("badjson", "malformed chunk"),
+])
+def test_broken_streams_raise_lmstudio_error(stub, action, reason):
+    server = stub([action, "ok"])
+    client = LMStudioClient(server.url, backoff=0)
+
+    chunks = []
+    with pytest.raises(LMStudioError, match=reason):
+        for chunk in client.chat_stream(model="m", messages=[]):
+            chunks.append(chunk)
+    assert chunks == [{"choices": [{"delta": {"content": "Hel"}}]}]
+    assert client.stats.records[-1]["ok"] is False
+
+    # the failed turn can simply be retried
+    retry = list(client.chat_stream(model="m", messages=[]))
+    assert "".join(c["choices"][0]["delta"]["content"] for c in retry) == "Hello"
+
+
+def test_unreachable_server_fails_fast():
+    client = LMStudioClient("http://127.0.0.1:9/v1", connect_timeout=0.2, max_retries=1, backoff=0)
+    with pytest.raises(LMStudioError, match="ConnectionError"):
+        client.chat(model="m", messages=[])
+
+
+def test_request_bodies_are_canonical(stub):
+    server = stub()
+    client = LMStudioClient(server.url)
+    tools = [{"type": "function", "function": {"name": "list_versions", "parameters": {}}}]
+
+    client.chat(model="m", tools=tools, messages=[{"role": "user", "content": "héllo"}])
+    client.chat(messages=[{"content": "héllo", "role": "user"}], tools=tools, model="m")
+
+    assert server.raw[0] == server.raw[1]
+    assert "héllo".encode("utf-8") in server.raw[0]
@@ -1,6 +1,7 @@
 import json
 import sys
 import types
+from fractions import Fraction
 from pathlib import Path
 
 THIS_DIR = Path(__file__).resolve().parent
@@ -16,6 +17,7 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 import insomniax_autocut_v3 as autocut
+import media_probe
 
 
 def test_main_runs_program(tmp_path, monkeypatch):
@@ -51,10 +53,12 @@ def test_main_runs_program(tmp_path, monkeypatch):
     out_video = tmp_path / "output.mp4"
     monkeypatch.setattr(autocut, "OUT_DIR", str(out_dir))
     monkeypatch.setattr(autocut, "OUT_VIDEO", str(out_video))
+    monkeypatch.setattr(autocut, "SEGMENT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(autocut.beat_analysis, "CACHE_DIR", tmp_path / "beats")
 
     librosa = sys.modules["librosa"]
     librosa.beat.beat_track = lambda *args, **kwargs: (120.0, [0, 1, 2, 3, 4, 5])
-    librosa.frames_to_time = lambda beats, sr=None: [float(b) for b in beats]
+    librosa.frames_to_time = lambda beats, sr=None, **kwargs: [float(b) for b in beats]
 
     monkeypatch.setattr(autocut.random, "random", lambda: 1.0)
     monkeypatch.setattr(autocut.random, "choices", lambda population, weights: [population[0]])
@@ -88,3 +92,123 @@ def test_main_runs_program(tmp_path, monkeypatch):
 
     assert run_calls, "Expected subprocess.run to be invoked"
     assert out_video.exists(), "Expected output video placeholder to be created"
+
+
+def test_render_segments_keeps_plan_order_and_reports_failures(monkeypatch):
+    import time
+
+    jobs = [
+        autocut.SegmentJob("clip.mp4", float(i), float(i) + 1.0, f"seg_{i:03d}.mp4")
+        for i in range(12)
+    ]
+
+    def fake_ffmpeg_cut(src, start, end, dest, reverse=False, flash=False):
+        # Later jobs finish first so completion order differs from plan order
+        time.sleep(0.002 * (12 - start))
+        if dest == "seg_005.mp4":
+            return 1
+        if dest == "seg_007.mp4":
+            raise OSError("disk full")
+        return 0
+
+    monkeypatch.setattr(autocut, "ffmpeg_cut", fake_ffmpeg_cut)
+
+    segments, failures = autocut.render_segments(jobs, workers=4)
+
+    expected = [job.dest for job in jobs if job.dest not in ("seg_005.mp4", "seg_007.mp4")]
+    assert segments == expected
+    assert [(job.dest, err) for job, err in failures] == [
+        ("seg_005.mp4", "ffmpeg exited with 1"),
+        ("seg_007.mp4", "disk full"),
+    ]
+
+
+def test_build_filtergraph_applies_segment_fx_in_plan_order():
+    jobs = [
+        autocut.SegmentJob("a.mp4", 0.0, 0.5, "00_000_keep.mp4"),
+        autocut.SegmentJob("b.mp4", 1.25, 1.75, "00_001_reverse.mp4", reverse=True),
+        autocut.SegmentJob("a.mp4", 2.0, 2.5, "01_000_black.mp4", flash=True),
+    ]
+
+    inputs, graph = autocut.build_filtergraph(jobs, (1280, 720, Fraction(24)))
+
+    # one input per source, fanned out instead of re-opened per segment
+    assert inputs == ["-ss", "0.000", "-i", "a.mp4", "-ss", "1.250", "-i", "b.mp4"]
+    normalize = (
+        "scale=1280:720:force_original_aspect_ratio=decrease:force_divisible_by=2,"
+        "pad=1280:720:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=24"
+    )
+    chains = graph.split(";\n")
+    assert chains[0] == "[0:v]split=2[s0][s2]"
+    assert chains[1] == (
+        f"[s0]trim=start=0.000:duration=0.500,setpts=PTS-STARTPTS,{normalize},format=yuv420p[v0]"
+    )
+    assert chains[2] == (
+        f"[1:v]trim=start=0.000:duration=0.500,setpts=PTS-STARTPTS,{normalize},"
+        "reverse,format=yuv420p[v1]"
+    )
+    assert chains[3] == (
+        f"[s2]trim=start=2.000:duration=0.500,setpts=PTS-STARTPTS,{normalize},"
+        f"{autocut.FLASH_FILTER},format=yuv420p[v2]"
+    )
+    assert chains[4] == "[v0][v1][v2]concat=n=3:v=1:a=0[out]"
+
+
+def test_filtergraph_reopens_a_source_only_to_seek_backwards():
+    jobs = [
+        autocut.SegmentJob("a.mp4", 4.0, 4.5, "0.mp4"),
+        autocut.SegmentJob("a.mp4", 5.0, 5.5, "1.mp4"),
+        autocut.SegmentJob("a.mp4", 1.0, 1.5, "2.mp4"),   # e.g. clamped to a short clip
+        autocut.SegmentJob("a.mp4", 2.0, 2.5, "3.mp4"),
+    ]
+    assert autocut.filtergraph_passes(jobs) == [("a.mp4", 4.0, [0, 1]), ("a.mp4", 1.0, [2, 3])]
+
+    probes = {"a.mp4": media_probe.ProbeInfo("h264", [0.0], 1279, 720, 6.0, 30000 / 1001)}
+    assert autocut.output_frame(jobs, probes) == (1278, 720, Fraction(30000, 1001))
+    assert autocut.output_frame(jobs, {}) == (1920, 1080, Fraction(24))
+
+
+def test_main_filtergraph_engine_renders_in_one_ffmpeg_call(tmp_path, monkeypatch):
+    cue_path = tmp_path / "insomniax.json"
+    cue_path.write_text(json.dumps({"keyframes": [{"scene": "First scene"}]}), encoding="utf-8")
+    clip_map_path = tmp_path / "clip_map.json"
+    clip_map_path.write_text(json.dumps({"default": "clip.mp4"}), encoding="utf-8")
+    audio_path = tmp_path / "audio.wav"
+    audio_path.write_text("audio", encoding="utf-8")
+
+    monkeypatch.setattr(autocut, "CUE_SHEET", str(cue_path))
+    monkeypatch.setattr(autocut, "CLIP_MAP", str(clip_map_path))
+    monkeypatch.setattr(autocut, "AUDIO_TRACK", str(audio_path))
+    monkeypatch.setattr(autocut.beat_analysis, "CACHE_DIR", tmp_path / "beats")
+    monkeypatch.setattr(autocut, "OUT_DIR", str(tmp_path / "segments"))
+    monkeypatch.setattr(autocut, "OUT_VIDEO", str(tmp_path / "output.mp4"))
+
+    librosa = sys.modules["librosa"]
+    monkeypatch.setattr(librosa.beat, "beat_track", lambda *args, **kwargs: (120.0, [0, 1, 2]))
+    monkeypatch.setattr(
+        librosa, "frames_to_time", lambda beats, sr=None, **kwargs: [float(b) for b in beats]
+    )
+    monkeypatch.setattr(autocut.random, "random", lambda: 1.0)
+    monkeypatch.setattr(autocut.random, "choices", lambda population, weights: [population[3]])
+
+    def fail_ffmpeg_cut(*args, **kwargs):
+        raise AssertionError("filtergraph engine must not encode per-segment files")
+
+    monkeypatch.setattr(autocut, "ffmpeg_cut", fail_ffmpeg_cut)
+
+    run_calls = []
+
+    def fake_run(cmd, stdout=None, stderr=None):
+        run_calls.append(list(cmd))
+        return types.SimpleNamespace(returncode=0)
+
+    monkeypatch.setattr(autocut.subprocess, "run", fake_run)
+
+    autocut.main(["--engine", "filtergraph"])
+
+    assert len(run_calls) == 1
+    cmd = run_calls[0]
+    assert cmd[cmd.index("-filter_complex_script") + 1].endswith("filtergraph.txt")
+    graph = (tmp_path / "segments" / "filtergraph.txt").read_text(encoding="utf-8")
+    assert graph.count("reverse") == 2
+    assert "concat=n=2:v=1:a=0[out]" in graph
@@ -0,0 +1,298 @@
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+THIS_DIR = Path(__file__).resolve().parent
+if str(THIS_DIR) not in sys.path:
+    sys.path.insert(0, str(THIS_DIR))
+
+from librosa_stub import install as install_librosa_stub
+
+install_librosa_stub()
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import insomniax_autocut_v3 as autocut
+import media_probe
+
+
+def test_probe_is_cached_per_file_on_disk(tmp_path, monkeypatch):
+    clip = tmp_path / "clip.mp4"
+    clip.write_text("video")
+    monkeypatch.setattr(media_probe, "CACHE_PATH", tmp_path / "probe.json")
+    calls = []
+
+    def fake_ffprobe(path):
+        calls.append(path)
+        return media_probe.ProbeInfo("h264", [0.0, 2.0, 4.0])
+
+    monkeypatch.setattr(media_probe, "run_ffprobe", fake_ffprobe)
+
+    assert media_probe.probe(str(clip)) == media_probe.ProbeInfo("h264", [0.0, 2.0, 4.0])
+    assert media_probe.probe(str(clip)).keyframes == [0.0, 2.0, 4.0]
+    assert len(calls) == 1
+    assert (tmp_path / "probe.json").exists()
+
+    clip.write_text("re-exported video")
+    media_probe.probe(str(clip))
+    assert len(calls) == 2
+    assert media_probe.probe(str(tmp_path / "missing.mp4")) is None
+
+
+def test_unreadable_files_are_probed_once(tmp_path, monkeypatch):
+    import json
+
+    clip = tmp_path / "broken.mp4"
+    clip.write_text("not really a video")
+    good = tmp_path / "good.mp4"
+    good.write_text("video")
+    monkeypatch.setattr(media_probe, "CACHE_PATH", tmp_path / "probe.json")
+    calls = []
+
+    def fake_ffprobe(path):
+        calls.append(path)
+        return media_probe.ProbeInfo("h264", [0.0]) if path == str(good) else None
+
+    monkeypatch.setattr(media_probe, "run_ffprobe", fake_ffprobe)
+
+    assert media_probe.probe_many([str(clip), str(good)])[str(clip)] is None
+    for _ in range(3):   # e.g. every segment of every keyframe using the clip
+        assert media_probe.probe(str(clip)) is None
+    assert calls == [str(clip), str(good)]
+    # failures are not persisted, so a later run tries again
+    assert list(json.loads((tmp_path / "probe.json").read_text()).values()) == [
+        media_probe.ProbeInfo("h264", [0.0])._asdict()
+    ]
+
+    clip.write_text("re-exported, hopefully readable now")
+    media_probe.probe(str(clip))
+    assert calls == [str(clip), str(good), str(clip)]
+
+
+def test_snap_to_keyframe_respects_tolerance():
+    keyframes = [0.0, 2.002, 4.004]
+    assert media_probe.snap_to_keyframe(keyframes, 2.0, 0.05) == 2.002
+    assert media_probe.snap_to_keyframe(keyframes, 4.05, 0.05) == 4.004
+    assert media_probe.snap_to_keyframe(keyframes, 3.0, 0.05) is None
+    assert media_probe.snap_to_keyframe([], 1.0, 0.05) is None
+
+
+def _baseline(keyframes, **kwargs):
+    """ProbeInfo of a source whose GOPs can sit next to the encoded segments."""
+    fields = dict(width=1280, height=720, profile="Constrained Baseline",
+                  pix_fmt="yuv420p", time_base="1/30000")
+    fields.update(kwargs)
+    return media_probe.ProbeInfo("h264", keyframes, **fields)
+
+
+def test_keyframe_aligned_keep_segments_take_stream_copy_path(monkeypatch):
+    probes = {
+        "h264.mp4": _baseline([0.0, 1.0, 2.0]),
+        "prores.mov": media_probe.ProbeInfo("prores", [0.0, 1.0, 2.0]),
+    }
+    monkeypatch.setattr(media_probe, "probe", lambda path: probes.get(path))
+    copied, encoded = [], []
+    monkeypatch.setattr(
+        autocut, "ffmpeg_copy",
+        lambda src, start, end, dest: copied.append((dest, start)) or 0,
+    )
+    monkeypatch.setattr(
+        autocut, "ffmpeg_cut",
+        lambda src, start, end, dest, reverse=False, flash=False: encoded.append(dest) or 0,
+    )
+
+    jobs = [
+        autocut.SegmentJob("h264.mp4", 0.98, 1.5, "keep_on_kf.mp4"),
+        autocut.SegmentJob("h264.mp4", 1.4, 1.9, "keep_mid_gop.mp4"),
+        autocut.SegmentJob("h264.mp4", 1.0, 1.5, "reverse.mp4", reverse=True, action="reverse"),
+        autocut.SegmentJob("h264.mp4", 2.0, 2.5, "flash.mp4", flash=True, action="black"),
+        autocut.SegmentJob("prores.mov", 1.0, 1.5, "other_codec.mp4"),
+    ]
+    stats = autocut.RenderStats()
+    segments, failures = autocut.render_segments(jobs, workers=2, stats=stats, stream_copy=True)
+
+    assert failures == []
+    assert segments == [job.dest for job in jobs]
+    assert copied == [("keep_on_kf.mp4", 1.0)]
+    assert sorted(encoded) == ["flash.mp4", "keep_mid_gop.mp4", "other_codec.mp4", "reverse.mp4"]
+    assert stats.summary() == "Stream-copy fast path: 1/5 segment(s) (20.0%)"
+
+
+def test_stream_copy_requires_the_encoded_stream_format(monkeypatch):
+    assert autocut.copy_compatible(_baseline([0.0]))
+    assert autocut.copy_compatible(_baseline([0.0], time_base="1/90000"))
+    assert not autocut.copy_compatible(_baseline([0.0], profile="High"))
+    assert not autocut.copy_compatible(_baseline([0.0], pix_fmt="yuv420p10le"))
+    assert not autocut.copy_compatible(_baseline([0.0], time_base="1/12800"))
+    assert not autocut.copy_compatible(media_probe.ProbeInfo("h264", [0.0], 1280, 720))
+
+    job = autocut.SegmentJob("src.mp4", 1.0, 1.5, "keep.mp4")
+    monkeypatch.setattr(media_probe, "probe", lambda path: _baseline([0.0, 1.0]))
+    assert autocut.stream_copy_start(job) == 1.0
+    monkeypatch.setattr(media_probe, "probe", lambda path: _baseline([0.0, 1.0], profile="High"))
+    assert autocut.stream_copy_start(job) is None
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None,
+                    reason="needs ffmpeg and ffprobe")
+def test_copied_and_encoded_segments_concatenate_into_a_decodable_video(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(media_probe, "CACHE_PATH", tmp_path / "probe.json")
+    monkeypatch.setattr(autocut, "OUT_DIR", str(tmp_path / "segments"))
+    (tmp_path / "segments").mkdir()
+
+    def source(name, *args):
+        subprocess.run(
+            ["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i",
+             "testsrc2=size=320x240:rate=25:duration=4", "-c:v", "libx264", "-g", "25",
+             *args, name],
+            check=True,
+        )
+        return str(tmp_path / name)
+
+    baseline = source("baseline.mp4", "-profile:v", "baseline", "-pix_fmt", "yuv420p",
+                      "-video_track_timescale", "90000")
+    high = source("high.mp4", "-profile:v", "high", "-pix_fmt", "yuv422p")
+    jobs = [
+        autocut.SegmentJob(high, 0.0, 1.0, "segments/00.mp4"),
+        autocut.SegmentJob(baseline, 1.0, 2.0, "segments/01.mp4"),
+        autocut.SegmentJob(baseline, 2.2, 2.8, "segments/02.mp4", flash=True, action="black"),
+        autocut.SegmentJob(high, 3.0, 4.0, "segments/03.mp4"),
+    ]
+    stats = autocut.RenderStats()
+    segments, failures = autocut.render_segments(jobs, workers=2, stats=stats, stream_copy=True)
+    assert failures == []
+    assert stats.copied == 1   # only the keyframe-aligned baseline keep
+
+    autocut.concat_segments(segments, "cut.mp4")
+    decoded = subprocess.run(
+        ["ffmpeg", "-v", "error", "-xerror", "-i", "cut.mp4", "-f", "null", "-"],
+        capture_output=True, text=True,
+    )
+    assert decoded.returncode == 0 and decoded.stderr == ""
+
+
+def test_reverse_chunks_cover_segment_without_gaps():
+    assert autocut.reverse_chunks(1.0, 2.25, 0.5) == [(1.0, 1.5), (1.5, 2.0), (2.0, 2.25)]
+    assert autocut.reverse_chunks(1.0, 1.2, 0.5) == [(1.0, 1.2)]
+
+
+def test_large_reverse_segments_are_chunked_and_joined_back_to_front(tmp_path, monkeypatch):
+    probes = {
+        "uhd.mp4": media_probe.ProbeInfo("h264", [0.0], 3840, 2160),
+        "sd.mp4": media_probe.ProbeInfo("h264", [0.0], 640, 360),
+    }
+    monkeypatch.setattr(media_probe, "probe", lambda path: probes.get(path))
+    cuts = []
+
+    def fake_cut(src, start, end, dest, reverse=False, flash=False):
+        cuts.append((src, round(start, 3), round(end, 3), Path(dest).name, reverse))
+        Path(dest).write_text("part")
+        return 0
+
+    concat_lists = []
+
+    def fake_run(cmd, stdout=None, stderr=None):
+        list_path = Path(cmd[cmd.index("-i") + 1])
+        concat_lists.append(list_path.read_text().split())
+        Path(cmd[-1]).write_text("joined")
+        return type("Proc", (), {"returncode": 0})()
+
+    monkeypatch.setattr(autocut, "ffmpeg_cut", fake_cut)
+    monkeypatch.setattr(autocut.subprocess, "run", fake_run)
+
+    big = autocut.SegmentJob("uhd.mp4", 10.0, 11.5, str(tmp_path / "big.mp4"), reverse=True)
+    small = autocut.SegmentJob("sd.mp4", 10.0, 11.5, str(tmp_path / "small.mp4"), reverse=True)
+    chunk = autocut.REVERSE_MAX_PIXEL_SECONDS / (3840 * 2160)
+    assert autocut.reverse_chunk_seconds(big) == chunk
+    assert autocut.reverse_chunk_seconds(small) is None
+
+    segments, failures = autocut.render_segments([big, small], workers=1)
+
+    assert failures == []
+    assert segments == [big.dest, small.dest]
+    assert cuts[0] == ("uhd.mp4", 10.0, 10.5, "000.mp4", True)
+    assert len([c for c in cuts if c[0] == "uhd.mp4"]) == 3
+    assert cuts[-1] == ("sd.mp4", 10.0, 11.5, "small.mp4", True)
+    assert concat_lists == [["file", "'002.mp4'", "file", "'001.mp4'", "file", "'000.mp4'"]]
+    assert Path(big.dest).read_text() == "joined"
+    assert not Path(f"{big.dest}.parts").exists()
+
+
+def test_probe_many_runs_ffprobe_concurrently_and_writes_cache_once(tmp_path, monkeypatch):
+    import json
+    import threading
+    import time
+
+    clips = []
+    for name in ("a.mp4", "b.mp4", "c.mp4"):
+        clips.append(tmp_path / name)
+        clips[-1].write_text(name)
+    clip_map = tmp_path / "clip_map.json"
+    clip_map.write_text(json.dumps({
+        "hallway": str(clips[0]), "mirror": str(clips[1]), "sink": str(clips[2]),
+        "default": str(clips[0]), "gone": str(tmp_path / "missing.mp4"),
+    }))
+    monkeypatch.setattr(media_probe, "CACHE_PATH", tmp_path / "probe.json")
+    active, peak, saves = [0], [0], []
+    lock = threading.Lock()
+
+    def fake_ffprobe(path):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return media_probe.ProbeInfo("h264", [0.0], 1920, 1080, 4.5, 25.0)
+
+    real_save = media_probe._save_disk_cache
+    monkeypatch.setattr(media_probe, "run_ffprobe", fake_ffprobe)
+    monkeypatch.setattr(media_probe, "_save_disk_cache", lambda: saves.append(1) or real_save())
+
+    results = media_probe.probe_clip_map(clip_map)
+
+    assert list(results) == [str(c) for c in clips] + [str(tmp_path / "missing.mp4")]
+    assert results[str(clips[1])].duration == 4.5 and results[str(clips[1])].fps == 25.0
+    assert results[str(tmp_path / "missing.mp4")] is None
+    assert peak[0] > 1
+    assert saves == [1]
+    assert media_probe.describe(str(clips[0]), results[str(clips[0])]) == (
+        f"{clips[0]}: 4.50s, 1920x1080 @ 25.000 fps, h264, 1 keyframe(s)"
+    )
+
+    monkeypatch.setattr(media_probe, "run_ffprobe", lambda path: None)
+    assert media_probe.probe_many([str(c) for c in clips]) == {
+        str(c): results[str(c)] for c in clips
+    }
+
+
+def test_clamp_range_keeps_cuts_inside_the_clip():
+    assert media_probe.clamp_range(1.0, 2.0, 10.0) == (1.0, 2.0)
+    assert media_probe.clamp_range(12.0, 12.5, 10.0) == (9.5, 10.0)
+    assert media_probe.clamp_range(9.0, 11.0, 10.0) == (8.0, 10.0)
+    assert media_probe.clamp_range(0.0, 3.0, 2.0) == (0.0, 2.0)
+    assert media_probe.clamp_range(12.0, 12.5, 0.0) == (12.0, 12.5)
+
+
+def test_out_of_range_jobs_are_clamped_before_rendering():
+    probes = {
+        "short.mp4": media_probe.ProbeInfo("h264", [0.0], duration=2.0),
+        "unknown.mp4": None,
+    }
+    jobs = [
+        autocut.SegmentJob("short.mp4", 0.5, 1.0, "a.mp4"),
+        autocut.SegmentJob("short.mp4", 6.0, 6.5, "b.mp4", reverse=True, action="reverse"),
+        autocut.SegmentJob("unknown.mp4", 6.0, 6.5, "c.mp4"),
+    ]
+
+    clamped, changed = autocut.clamp_jobs(jobs, probes)
+
+    assert changed == 1
+    assert clamped[0] == jobs[0] and clamped[2] == jobs[2]
+    assert clamped[1] == jobs[1]._replace(start=1.5, end=2.0)
@@ -0,0 +1,115 @@
+import json
+import sys
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import opentimelineio as otio
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import insomniax_to_otio_extended as exporter
+import media_probe
+
+
+def _data(n):
+    patterns = ["jumpcut", "black flash", "", "jumpcut + black"]
+    return {"keyframes": [
+        {"id": f"kf_{i}", "scene": f"scene {i} — déjà vu", "edit_pattern": patterns[i % 4]}
+        for i in range(n)
+    ]}
+
+
+def test_marker_modes_decimate_beats():
+    beats = np.arange(0, 13, 0.5)   # 26 beats, the last two past a 12 s timeline
+    starts, durs, names = exporter.beat_markers(beats, 12.0, "all")
+    assert len(starts) == 25 and set(names) == {"Beat"} and set(durs) == {1.0}
+
+    starts, _, names = exporter.beat_markers(beats, 12.0, "downbeats", beats_per_bar=4)
+    assert starts.tolist() == [0.0, 2.0, 4.0, 6.0, 8.0, 10.0, 12.0] and names[0] == "Downbeat"
+
+    # the 7th downbeat lands exactly on the timeline end: no zero-length bar
+    starts, durs, names = exporter.beat_markers(beats, 12.0, "bar", beats_per_bar=4)
+    assert names == [f"Bar {n}" for n in range(1, 7)]
+    assert starts.tolist() == [0.0, 2.0, 4.0, 6.0, 8.0, 10.0]
+    assert (durs == 2.0 * exporter.FPS).all()
+
+    # beat count an exact multiple of the bar length
+    exact = np.arange(0, 12, 0.5)   # 24 beats = 6 bars
+    starts, durs, names = exporter.beat_markers(exact, 12.0, "bar", beats_per_bar=4)
+    assert len(names) == 6 and (durs > 0).all() and durs[-1] == 2.0 * exporter.FPS
+    starts, durs, names = exporter.beat_markers(np.append(exact, 12.0), 12.0, "bar", beats_per_bar=4)
+    assert len(names) == 6 and (durs > 0).all()
+
+    assert len(exporter.beat_markers(beats, 12.0, "none")[0]) == 0
+
+
+def test_streamed_writer_matches_the_otio_object_graph(tmp_path):
+    plan = exporter.plan_export(_data(9), np.arange(0, 30, 0.47), "bar")
+    streamed, built = tmp_path / "streamed.otio", tmp_path / "built.otio"
+
+    _, size = exporter.export(plan, streamed, writer="stream")
+    exporter.export(plan, built, writer="otio")
+    assert size == streamed.stat().st_size
+
+    reread = otio.adapters.read_from_file(str(streamed))
+    assert otio.adapters.write_to_string(reread) == otio.adapters.write_to_string(
+        otio.adapters.read_from_file(str(built))
+    )
+    assert len(reread.tracks.markers) == len(plan.beat_names)
+    clip = list(reread.find_clips())[3]
+    assert clip.metadata["insomniax_id"] == "kf_3"
+    assert [m.name for m in clip.markers] == ["Jumpcut zone", "Black flash"]
+    json.loads(streamed.read_text(encoding="utf-8"))   # one valid JSON document
+
+
+def test_bundles_are_written_with_missing_media(tmp_path):
+    plan = exporter.plan_export(_data(3), np.arange(0, 9, 0.5), "downbeats")
+    _, size = exporter.export(plan, tmp_path / "t.otioz")
+    assert size > 0 and zipfile.is_zipfile(tmp_path / "t.otioz")
+
+    _, size = exporter.export(plan, tmp_path / "t.otiod")
+    assert (tmp_path / "t.otiod").is_dir() and size > 0
+    timeline = otio.adapters.read_from_file(str(tmp_path / "t.otiod"))
+    assert len(list(timeline.find_clips())) == 4   # 3 scenes + soundtrack
+
+
+def test_available_ranges_come_from_probed_media(tmp_path):
+    probes = {
+        str(exporter.segment_path(0)): media_probe.ProbeInfo("h264", [0.0], duration=2.5),
+        str(exporter.segment_path(1)): None,
+        str(exporter.AUDIO_PATH): media_probe.ProbeInfo("", [], duration=95.0),
+    }
+    plan = exporter.plan_export(_data(3), np.arange(0, 9, 0.5), "none", probes=probes)
+    assert plan.media_durations.tolist() == [2.5, exporter.CLIP_SECONDS, exporter.CLIP_SECONDS]
+    assert plan.audio_duration == 95.0
+
+    for writer in ("stream", "otio"):
+        path = tmp_path / f"{writer}.otio"
+        exporter.export(plan, path, writer=writer)
+        timeline = otio.adapters.read_from_file(str(path))
+        video, audio = timeline.tracks
+        assert video[0].media_reference.available_range.duration.to_seconds() == 2.5
+        assert video[1].media_reference.available_range.duration.to_seconds() == 3.0
+        assert audio[0].media_reference.available_range.duration.to_seconds() == 95.0
+
+
+def test_new_keyframe_ids_are_written_back_atomically(tmp_path, monkeypatch):
+    import cue_store
+
+    cue = tmp_path / "insomniax.json"
+    cue.write_text(json.dumps({"keyframes": [{"scene": "a"}, {"scene": "b", "id": "kf_1"}]}))
+    replaced = []
+    real_replace = cue_store.os.replace
+    monkeypatch.setattr(cue_store.os, "replace",
+                        lambda src, dst: replaced.append(Path(dst)) or real_replace(src, dst))
+
+    data, added = exporter.load_cue_sheet(cue)
+
+    assert added == 1 and replaced == [cue]
+    assert json.loads(cue.read_text()) == data
+    assert list(tmp_path.glob("*.tmp")) == [] and list(tmp_path.glob(".*.tmp")) == []
+    assert exporter.load_cue_sheet(cue) == (data, 0)
+    assert replaced == [cue]
@@ -0,0 +1,149 @@
+import json
+import sys
+from pathlib import Path
+
+import opentimelineio as otio
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import otio_sync
+
+FPS = 24
+
+
+def _clip(kf_id, start, dur, scene, markers=()):
+    clip = otio.schema.Clip(
+        name=scene,
+        source_range=otio.opentime.TimeRange(
+            otio.opentime.RationalTime(start * FPS, FPS),
+            otio.opentime.RationalTime(dur * FPS, FPS),
+        ),
+    )
+    clip.metadata["scene_text"] = scene
+    if kf_id is not None:
+        clip.metadata[otio_sync.CLIP_ID_KEY] = kf_id
+    for name, t in markers:
+        clip.markers.append(otio.schema.Marker(
+            name=name,
+            color="RED",
+            marked_range=otio.opentime.TimeRange(
+                otio.opentime.RationalTime(t * FPS, FPS), otio.opentime.RationalTime(1, FPS)
+            ),
+        ))
+    return clip
+
+
+def _write_timeline(path, clips):
+    timeline = otio.schema.Timeline("t")
+    track = otio.schema.Track()
+    for c in clips:
+        track.append(c)
+    timeline.tracks.append(track)
+    otio.adapters.write_to_file(timeline, str(path))
+
+
+def test_only_changed_keyframes_are_synced(tmp_path):
+    data = {"keyframes": [{"scene": f"scene {i}"} for i in range(4)]}
+    assert otio_sync.ensure_keyframe_ids(data) == 4
+    assert otio_sync.ensure_keyframe_ids(data) == 0
+    kfs = data["keyframes"]
+    ids = [kf["id"] for kf in kfs]
+    path = tmp_path / "t.otio"
+
+    clips = [_clip(ids[i], i * 3, 3, f"scene {i}", [("Jumpcut zone", i * 3)]) for i in range(4)]
+    _write_timeline(path, clips)
+    first = otio_sync.plan_sync(kfs, otio_sync.read_clip_states(path))
+    assert (first.added, first.modified, first.removed, first.unchanged) == (4, 0, 0, 0)
+    otio_sync.apply_sync(kfs, first)
+    assert kfs[2]["otio_start"] == 6.0 and kfs[2]["otio_markers"][0]["name"] == "Jumpcut zone"
+
+    again = otio_sync.plan_sync(kfs, otio_sync.read_clip_states(path))
+    assert again.updates == {} and again.removals == {} and again.unchanged == 4
+
+    # reorder in the NLE, retime one clip, drop another's markers, delete one
+    clips = [
+        _clip(ids[3], 9, 3, "scene 3", [("Jumpcut zone", 9)]),
+        _clip(ids[0], 0, 5, "scene 0 (longer)", [("Jumpcut zone", 0)]),
+        _clip(ids[1], 3, 3, "scene 1"),
+        _clip(None, 9, 1, "untracked insert"),
+    ]
+    _write_timeline(path, clips)
+    diff = otio_sync.plan_sync(kfs, otio_sync.read_clip_states(path))
+    assert (diff.added, diff.modified, diff.removed, diff.unchanged, diff.unmatched) == (0, 2, 1, 1, 1)
+    assert set(diff.updates) == {0, 1}
+    otio_sync.apply_sync(kfs, diff)
+    assert kfs[0]["scene"] == "scene 0 (longer)" and kfs[0]["otio_duration"] == 5.0
+    assert "otio_markers" not in kfs[1]
+    assert not any(k.startswith("otio_") for k in kfs[2])   # its clip was deleted
+    assert kfs[3]["otio_start"] == 9.0                       # untouched: fingerprint matched
+
+
+def test_timelines_without_ids_sync_by_position(tmp_path):
+    kfs = [{"scene": "a"}, {"scene": "b"}]
+    path = tmp_path / "legacy.otio"
+    _write_timeline(path, [_clip(None, 0, 2, "A"), _clip(None, 2, 2, "B"), _clip(None, 4, 2, "C")])
+    result = otio_sync.plan_sync(kfs, otio_sync.read_clip_states(path))
+    assert (result.added, result.unmatched) == (2, 1)
+    otio_sync.apply_sync(kfs, result)
+    assert [kf["scene"] for kf in kfs] == ["A", "B"]
+
+
+def test_agent_sync_skips_writes_when_nothing_changed(tmp_path, monkeypatch):
+    import insomniax_agent_v4 as agent
+
+    data = {"keyframes": [{"id": "kf_a", "scene": "hallway"}, {"id": "kf_b", "scene": "sink"}]}
+    cue_path = tmp_path / "insomniax.json"
+    cue_path.write_text(json.dumps(data))
+    monkeypatch.setattr(agent, "CUE_PATH", cue_path)
+    monkeypatch.setattr(agent, "VERSIONS_DIR", tmp_path / "versions")
+    path = tmp_path / "t.otio"
+    _write_timeline(path, [_clip("kf_b", 0, 2, "sink"), _clip("kf_a", 2, 2, "hallway")])
+
+    assert "2 added, 0 modified" in agent.sync_from_otio(str(path))
+    synced = json.loads(cue_path.read_text())
+    assert synced["keyframes"][1]["otio_start"] == 0.0
+    mtime = cue_path.stat().st_mtime_ns
+    versions = agent.list_versions()
+
+    assert "already in sync" in agent.sync_from_otio(str(path))
+    assert cue_path.stat().st_mtime_ns == mtime
+    assert agent.list_versions() == versions
+
+
+def test_json_reader_matches_the_otio_adapter(tmp_path):
+    timeline = otio.schema.Timeline("t")
+    video = otio.schema.Track()
+    video.append(_clip("kf_a", 1, 2, "a", [("Beat", 1.5)]))
+    video.append(otio.schema.Gap(source_range=otio.opentime.TimeRange(
+        duration=otio.opentime.RationalTime(12, FPS))))
+    nested = otio.schema.Stack()
+    inner = otio.schema.Track()
+    inner.append(_clip(None, 0, 1, "nested"))
+    nested.append(inner)
+    video.append(nested)
+    untrimmed = otio.schema.Clip(
+        name="untrimmed",
+        media_reference=otio.schema.ExternalReference(
+            target_url="file:///x.mp4",
+            available_range=otio.opentime.TimeRange(
+                otio.opentime.RationalTime(0, 25), otio.opentime.RationalTime(50, 25)
+            ),
+        ),
+    )
+    video.append(untrimmed)
+    audio = otio.schema.Track(kind=otio.schema.TrackKind.Audio)
+    audio.append(_clip(None, 0, 7, "mix"))
+    timeline.tracks.append(video)
+    timeline.tracks.append(audio)
+    path = tmp_path / "t.otio"
+    otio.adapters.write_to_file(timeline, str(path))
+
+    fast = otio_sync.read_clip_states_json(path)
+    assert fast == otio_sync.read_clip_states_otio(path)
+    assert [s.scene_text for s in fast] == ["a", "nested", None, "mix"]
+    assert fast[2].duration == 2.0
+
+    (tmp_path / "not_a_timeline.otio").write_text('{"OTIO_SCHEMA": "SerializableCollection.1"}')
+    assert otio_sync.read_clip_states_json(tmp_path / "not_a_timeline.otio") is None
@@ -0,0 +1,171 @@
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+THIS_DIR = Path(__file__).resolve().parent
+if str(THIS_DIR) not in sys.path:
+    sys.path.insert(0, str(THIS_DIR))
+
+from librosa_stub import install as install_librosa_stub
+
+install_librosa_stub()
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import insomniax_autocut_v3 as autocut
+
+
+def reference_rows(cue, clip_map, beat_times, seed):
+    """The original per-keyframe list-comprehension planner."""
+    rows = []
+    for i, kf in enumerate(cue["keyframes"]):
+        seg_start, seg_end = i * 3.0, i * 3.0 + 3.0
+        seg_beats = [b for b in beat_times if seg_start <= b < seg_end]
+        if not seg_beats:
+            seg_beats = [seg_start, seg_end]
+        rng = autocut.keyframe_rng(seed, i)
+        src = autocut.choose_clip(kf["scene"], clip_map, rng)
+        for j, bt in enumerate(seg_beats[:-1]):
+            act = rng.choices(autocut.ACTIONS, weights=autocut.ACTION_WEIGHTS)[0]
+            start, end = bt, seg_beats[j + 1]
+            if end <= start:
+                continue
+            rows.append((i, j, start, end, act, src))
+    return rows
+
+
+def test_build_plan_matches_reference_planner():
+    rnd = random.Random(3)
+    # sparse, dense, duplicated and missing beats across 40 keyframes
+    beats = sorted(
+        [round(rnd.uniform(0, 60), 3) for _ in range(90)] + [7.5, 7.5, 66.0, 118.9]
+    )
+    cue = {"keyframes": [{"scene": rnd.choice(["hall", "sink", "tv", "??"])} for _ in range(40)]}
+    clip_map = {"hall": "hall.mp4", "sink": "sink.mp4", "tv": "tv.mp4", "default": "fb.mp4"}
+
+    plan = autocut.build_plan(cue, clip_map, beats, seed=11)
+
+    got = [
+        (kf, j, start, end, autocut.ACTIONS[act], plan.sources[kf])
+        for kf, j, start, end, act in plan.rows.tolist()
+    ]
+    assert got == reference_rows(cue, clip_map, beats, seed=11)
+
+
+def test_plan_rows_are_inspectable_without_ffmpeg():
+    cue = {"keyframes": [{"scene": "a"}, {"scene": "b"}, {"scene": "c"}]}
+    beats = [0.5, 1.0, 2.0, 6.25, 6.75]
+
+    plan = autocut.build_plan(cue, {"default": "x.mp4"}, beats, seed=0)
+
+    assert plan.rows.dtype == autocut.PLAN_DTYPE
+    assert plan.rows["keyframe"].tolist() == [0, 0, 1, 2]
+    assert plan.rows["beat"].tolist() == [0, 1, 0, 0]
+    np.testing.assert_allclose(plan.rows["start"], [0.5, 1.0, 3.0, 6.25])
+    np.testing.assert_allclose(plan.rows["end"], [1.0, 2.0, 6.0, 6.75])
+    np.testing.assert_array_equal(autocut.bucket_beats(beats, 3), [0, 3, 3, 5])
+
+    jobs = autocut.plan_jobs(plan)
+    assert [Path(job.dest).name[:6] for job in jobs] == ["00_000", "00_001", "01_000", "02_000"]
+
+
+def _jobs():
+    return [
+        autocut.SegmentJob("a.mp4", 0.5, 1.0, "seg/00_000_keep.mp4", action="keep"),
+        autocut.SegmentJob("b.mp4", 1.15, 1.85, "seg/00_001_jumpcut.mp4", action="jumpcut"),
+        autocut.SegmentJob("a.mp4", 3.0, 4.0, "seg/01_000_reverse.mp4", reverse=True, action="reverse"),
+        autocut.SegmentJob("b.mp4", 4.0, 4.5, "seg/01_001_black.mp4", flash=True, action="black"),
+    ]
+
+
+def test_edl_round_trips_as_json_and_binary(tmp_path):
+    jobs = _jobs()
+    for name in ("plan.json", "plan.npz"):
+        cost = autocut.write_edl(jobs, tmp_path / name, seed=5)
+        assert cost == round(sum(autocut.estimate_cost(job) for job in jobs), 3)
+        assert autocut.read_edl(tmp_path / name) == jobs
+
+    edl = __import__("json").loads((tmp_path / "plan.json").read_text())
+    assert edl["seed"] == 5
+    assert edl["segments"][2] == {
+        "src": "a.mp4",
+        "in": 3.0,
+        "out": 4.0,
+        "action": "reverse",
+        "dest": "seg/01_000_reverse.mp4",
+        "estimated_cost": round(autocut.ENCODE_SPAWN_COST + 1.8, 3),
+    }
+
+
+
+def test_edl_versions_are_checked_for_json_and_binary(tmp_path):
+    import json
+
+    jobs = _jobs()
+    autocut.write_edl(jobs, tmp_path / "plan.json")
+    data = json.loads((tmp_path / "plan.json").read_text())
+    data["version"] = autocut.EDL_VERSION + 1
+    (tmp_path / "plan.json").write_text(json.dumps(data))
+
+    autocut.write_edl(jobs, tmp_path / "plan.npz")
+    with np.load(tmp_path / "plan.npz") as z:
+        arrays = dict(z)
+    np.savez_compressed(tmp_path / "newer.npz",
+                        **{**arrays, "version": np.array(autocut.EDL_VERSION + 1)})
+    # older binary EDLs carried their version in meta only
+    legacy = {k: v for k, v in arrays.items() if k != "version"}
+    np.savez_compressed(tmp_path / "legacy.npz", **legacy)
+    meta = json.loads(str(arrays["meta"]))
+    np.savez_compressed(tmp_path / "legacy_v0.npz",
+                        **{**legacy, "meta": np.array(json.dumps({**meta, "version": 0}))})
+
+    for name in ("plan.json", "newer.npz", "legacy_v0.npz"):
+        with pytest.raises(ValueError, match="Unsupported EDL version"):
+            autocut.read_edl(tmp_path / name)
+    assert autocut.read_edl(tmp_path / "legacy.npz") == jobs
+
+def test_plan_only_then_render_from_plan(tmp_path, monkeypatch):
+    import json
+
+    cue_path = tmp_path / "insomniax.json"
+    cue_path.write_text(json.dumps({"keyframes": [{"scene": "hall"}, {"scene": "sink"}]}))
+    clip_map_path = tmp_path / "clip_map.json"
+    clip_map_path.write_text(json.dumps({"default": "clip.mp4"}))
+    monkeypatch.setattr(autocut, "CUE_SHEET", str(cue_path))
+    monkeypatch.setattr(autocut, "CLIP_MAP", str(clip_map_path))
+    monkeypatch.setattr(autocut, "OUT_DIR", str(tmp_path / "segments"))
+    monkeypatch.setattr(autocut, "OUT_VIDEO", str(tmp_path / "out.mp4"))
+    monkeypatch.setattr(autocut, "SEGMENT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(
+        autocut.beat_analysis,
+        "analyze",
+        lambda path: autocut.beat_analysis.BeatAnalysis(
+            120.0, np.array([0.0, 0.5, 1.0, 3.5, 4.0]), np.zeros(0, np.float32), 22050, 512
+        ),
+    )
+
+    calls = []
+
+    def record_cut(src, start, end, dest, reverse=False, flash=False):
+        calls.append((src, start, end, dest, reverse, flash))
+        Path(dest).write_text("segment")
+        return 0
+
+    monkeypatch.setattr(autocut, "ffmpeg_cut", record_cut)
+    monkeypatch.setattr(autocut.subprocess, "run", lambda cmd, stdout=None, stderr=None: None)
+
+    edl = tmp_path / "plan.json"
+    autocut.main(["--plan-only", str(edl), "--seed", "3"])
+    assert calls == []
+    planned = autocut.read_edl(edl)
+    assert len(planned) == 3
+
+    autocut.main(["--from-plan", str(edl), "--workers", "1"])
+    assert calls == [
+        (job.src, job.start, job.end, job.dest, job.reverse, job.flash) for job in planned
+    ]
@@ -0,0 +1,178 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+THIS_DIR = Path(__file__).resolve().parent
+if str(THIS_DIR) not in sys.path:
+    sys.path.insert(0, str(THIS_DIR))
+
+from librosa_stub import install as install_librosa_stub
+
+install_librosa_stub()
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import insomniax_autocut_v3 as autocut
+import render_queue
+from render_report import RenderReport
+
+
+def _jobs(tmp_path, n, crash=()):
+    return [
+        autocut.SegmentJob("clip.mp4", float(i), i + 0.5,
+                           str(tmp_path / "segs" / f"{i:03d}{'_crash' if i in crash else ''}.mp4"))
+        for i in range(n)
+    ]
+
+
+def test_expired_lease_is_reclaimed_and_the_stale_worker_is_fenced_off(tmp_path):
+    queue = render_queue.RenderQueue(tmp_path / "q.db", lease_seconds=0.05)
+    batch = queue.publish([{"n": 0}, {"n": 1}])
+
+    first = queue.claim("a", batch)
+    assert (first.seq, first.attempt) == (0, 1)
+    time.sleep(0.1)
+    assert not queue.renew(render_queue.Lease(first.id, batch, 0, {}, "bogus", 1))
+
+    second = queue.claim("b", batch)
+    assert (second.id, second.attempt) == (first.id, 2)
+    assert not queue.complete(first)          # lost its lease
+    assert queue.complete(second, result={"mode": "encode"})
+    assert queue.counts(batch) == {"pending": 1, "leased": 0, "done": 1, "failed": 0}
+    assert queue.outcomes(batch)[first.id].result == {"mode": "encode"}
+
+
+def test_errors_are_retried_then_marked_failed(tmp_path):
+    queue = render_queue.RenderQueue(tmp_path / "q.db", max_attempts=2, lease_seconds=0.05)
+    batch = queue.publish([{"n": 0}, {"n": 1}])
+
+    lease = queue.claim("a", batch)
+    assert queue.complete(lease, "ffmpeg exited with 1")
+    lease = queue.claim("a", batch)
+    assert lease.seq == 0 and lease.attempt == 2
+    assert queue.complete(lease, "ffmpeg exited with 1")
+
+    abandoned = queue.claim("a", batch)
+    assert abandoned.seq == 1
+    time.sleep(0.1)
+    retry = queue.claim("b", batch)           # second and last attempt
+    assert retry.seq == 1 and retry.attempt == 2
+    time.sleep(0.1)
+    assert queue.claim("c", batch) is None    # attempts exhausted → failed
+    outcomes = {o.seq: o for o in queue.outcomes(batch).values()}
+    assert outcomes[0].error == "ffmpeg exited with 1"
+    assert outcomes[1].error == "lease expired after 2 attempt(s)"
+    assert queue.open_count(batch) == 0
+
+
+def test_worker_processes_share_a_batch_and_survive_a_crash(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join([str(THIS_DIR), str(ROOT)]))
+    db = tmp_path / "q.db"
+    queue = render_queue.RenderQueue(db)
+    jobs = _jobs(tmp_path, 12, crash={5})
+    batch = queue.publish(job._asdict() for job in jobs)
+
+    cmd = [sys.executable, str(ROOT / "render_queue.py"), "worker", str(db), "--batch", batch,
+           "--exit-when-idle", "--lease", "0.6", "--handler", "queue_handlers:crash_once",
+           "--project", str(tmp_path)]
+    procs = [subprocess.Popen(cmd, stdout=subprocess.DEVNULL) for _ in range(3)]
+    codes = sorted(proc.wait(timeout=60) for proc in procs)
+
+    assert codes == [0, 0, 1]                 # one worker died mid-segment
+    outcomes = {o.seq: o for o in queue.outcomes(batch).values()}
+    assert [outcomes[n].state for n in range(12)] == ["done"] * 12
+    assert outcomes[5].attempts == 2
+    assert len({o.result["worker"] for o in outcomes.values()}) >= 2
+    # every segment was written exactly once
+    assert all(len(Path(job.dest).read_text().split()) == 1 for job in jobs)
+
+
+def test_coordinator_collects_results_in_plan_order(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join([str(THIS_DIR), str(ROOT)]))
+    monkeypatch.chdir(tmp_path)
+    jobs = _jobs(tmp_path, 8, crash={2})
+    report = RenderReport(tmp_path / "report.jsonl")
+
+    segments, failures = autocut.render_via_queue(
+        jobs, str(tmp_path / "q.db"), local_workers=2, report=report,
+        handler="queue_handlers:crash_once", lease_seconds=0.6,
+    )
+    report.close()
+
+    assert failures == []
+    assert segments == [job.dest for job in jobs]
+    assert sorted(r["dest"] for r in report.segments) == sorted(segments)
+    assert render_queue.RenderQueue(tmp_path / "q.db").counts() == {
+        "pending": 0, "leased": 0, "done": 0, "failed": 0,
+    }
+
+
+def test_coordinator_collects_a_segment_that_finishes_while_it_polls(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    jobs = _jobs(tmp_path, 3)
+    real_open_count = render_queue.RenderQueue.open_count
+
+    def open_count_racing_a_worker(self, batch=None):
+        # a worker finishes the rest of the batch right as the coordinator polls
+        while (lease := self.claim("racer", batch)) is not None:
+            self.complete(lease, result={"mode": "encode"})
+        return real_open_count(self, batch)
+
+    monkeypatch.setattr(render_queue.RenderQueue, "open_count", open_count_racing_a_worker)
+    segments, failures = autocut.render_via_queue(jobs, str(tmp_path / "q.db"), local_workers=0)
+
+    assert failures == []
+    assert segments == [job.dest for job in jobs]
+
+
+def test_queue_renders_report_the_stream_copy_fraction(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join([str(THIS_DIR), str(ROOT)]))
+    monkeypatch.chdir(tmp_path)
+    jobs = [job._replace(dest=job.dest.replace(".mp4", "_copy.mp4")) if n % 2 else job
+            for n, job in enumerate(_jobs(tmp_path, 4))]
+    stats = autocut.RenderStats()
+
+    autocut.render_via_queue(jobs, str(tmp_path / "q.db"), local_workers=2, stats=stats,
+                             handler="queue_handlers:touch_output")
+
+    assert stats.summary() == "Stream-copy fast path: 2/4 segment(s) (50.0%)"
+
+
+def test_queued_segments_report_copies_separately_from_their_mode(tmp_path, monkeypatch):
+    import media_probe
+
+    info = media_probe.ProbeInfo("h264", [0.0, 1.0], 640, 360, profile="Constrained Baseline",
+                                 pix_fmt="yuv420p", time_base="1/90000")
+    monkeypatch.setattr(media_probe, "probe", lambda path: info)
+    monkeypatch.setattr(autocut, "ffmpeg_copy", lambda src, start, end, dest: 0)
+    job = autocut.SegmentJob("clip.mp4", 1.0, 1.5, str(tmp_path / "keep.mp4"))
+
+    error, result = autocut.render_queued_segment(job._asdict(), cache=False)
+
+    assert error is None
+    assert result["mode"] == "copy" and result["copied"] is True
+
+
+def test_coordinator_gives_up_when_workers_die_before_claiming(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join([str(THIS_DIR), str(ROOT)]))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(render_queue, "POLL_SECONDS", 0.05)
+    spawned = []
+    real_popen = subprocess.Popen
+    monkeypatch.setattr(autocut.subprocess, "Popen",
+                        lambda cmd: spawned.append(cmd) or real_popen(cmd, stderr=subprocess.DEVNULL))
+    jobs = _jobs(tmp_path, 3)
+
+    # the handler cannot be imported, so every worker exits at startup
+    segments, failures = autocut.render_via_queue(
+        jobs, str(tmp_path / "q.db"), local_workers=2, handler="no_such_module:render",
+    )
+
+    assert segments == []
+    assert [job for job, _ in failures] == jobs
+    assert all("without claiming a segment" in err for _, err in failures)
+    assert len(spawned) == 2 * autocut.QUEUE_WORKER_ROUNDS
@@ -0,0 +1,37 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from render_report import RenderReport, read_summary
+
+
+def test_report_streams_json_lines_and_summarizes(tmp_path):
+    seg = tmp_path / "00_000_keep.mp4"
+    seg.write_bytes(b"x" * 2048)
+    report = RenderReport(tmp_path / "report.jsonl")
+
+    with report.stage("plan"):
+        report.event("plan", segments=4)
+    report.segment(str(seg), "footage/hallway.mp4", "encode", 0.2, 0)
+    report.segment("00_001_reverse.mp4", "footage/hallway.mp4", "encode", 1.5, 1, "ffmpeg exited with 1")
+    report.segment("00_002_keep.mp4", "footage/sink.mp4", "copy", 0.05, 0)
+    report.segment("01_000_keep.mp4", "footage/sink.mp4", "cache", 0.01, 0)
+
+    # records are on disk before the report is closed
+    lines = (tmp_path / "report.jsonl").read_text().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [r["type"] for r in records] == ["plan", "stage", "segment", "segment", "segment", "segment"]
+    assert records[2]["bytes"] == 2048
+    assert records[3]["exit_code"] == 1 and records[3]["error"] == "ffmpeg exited with 1"
+
+    text = report.close()
+    assert "segments: 4 (1 cache, 1 copy, 2 encode; 1 failed)" in text
+    assert "p50" in text and "p99" in text
+    slowest = text.split("slowest:")[1].splitlines()
+    assert slowest[1].strip().startswith("00_001_reverse.mp4 1.500s [encode] ← hallway.mp4")
+    assert read_summary(tmp_path / "report.jsonl") == text
+    assert read_summary(tmp_path / "missing.jsonl") is None
@@ -0,0 +1,149 @@
+import os
+import sys
+import threading
+from pathlib import Path
+
+THIS_DIR = Path(__file__).resolve().parent
+if str(THIS_DIR) not in sys.path:
+    sys.path.insert(0, str(THIS_DIR))
+
+from librosa_stub import install as install_librosa_stub
+
+install_librosa_stub()
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import insomniax_autocut_v3 as autocut
+from segment_cache import SegmentCache
+
+
+def _jobs(src: Path, out_dir: Path) -> list:
+    return [
+        autocut.SegmentJob(str(src), 0.0, 0.5, str(out_dir / "00_000_keep.mp4")),
+        autocut.SegmentJob(str(src), 0.5, 1.0, str(out_dir / "00_001_reverse.mp4"), reverse=True),
+    ]
+
+
+def test_unchanged_segments_are_reused_across_runs(tmp_path, monkeypatch):
+    src = tmp_path / "clip.mp4"
+    src.write_text("source", encoding="utf-8")
+    out_dir = tmp_path / "segments"
+    out_dir.mkdir()
+
+    encoded = []
+
+    def fake_ffmpeg_cut(src, start, end, dest, reverse=False, flash=False):
+        encoded.append(os.path.basename(dest))
+        Path(dest).write_text(f"{start}-{end}-{reverse}", encoding="utf-8")
+        return 0
+
+    monkeypatch.setattr(autocut, "ffmpeg_cut", fake_ffmpeg_cut)
+
+    first = SegmentCache(tmp_path / "cache")
+    autocut.render_segments(_jobs(src, out_dir), workers=2, cache=first)
+    assert (first.hits, first.misses) == (0, 2)
+
+    second = SegmentCache(tmp_path / "cache")
+    segments, failures = autocut.render_segments(_jobs(src, out_dir), workers=2, cache=second)
+    assert (second.hits, second.misses) == (2, 0)
+    assert failures == []
+    assert len(encoded) == 2
+    assert Path(segments[1]).read_text(encoding="utf-8") == "0.5-1.0-True"
+
+    # touching the source invalidates its segments
+    src.write_text("source v2", encoding="utf-8")
+    third = SegmentCache(tmp_path / "cache")
+    autocut.render_segments(_jobs(src, out_dir), workers=1, cache=third)
+    assert (third.hits, third.misses) == (0, 2)
+
+
+def test_key_covers_fx_flags_and_salt(tmp_path):
+    src = tmp_path / "clip.mp4"
+    src.write_text("source", encoding="utf-8")
+    cache = SegmentCache(tmp_path / "cache")
+
+    plain = cache.key(str(src), 0.0, 1.0, reverse=False, flash=False)
+    assert plain == cache.key(str(src), 0.0, 1.0, reverse=False, flash=False)
+    assert plain != cache.key(str(src), 0.0, 1.0, reverse=True, flash=False)
+    assert plain != SegmentCache(tmp_path / "cache", salt="crf18").key(
+        str(src), 0.0, 1.0, reverse=False, flash=False
+    )
+    assert cache.key(str(tmp_path / "missing.mp4"), 0.0, 1.0) is None
+
+
+def test_evict_drops_least_recently_used_first(tmp_path):
+    cache = SegmentCache(tmp_path / "cache", max_bytes=250)
+    for n, key in enumerate(["aa01", "bb02", "cc03"]):
+        rendered = tmp_path / f"{key}.mp4"
+        rendered.write_bytes(b"x" * 100)
+        cache.store(key, str(rendered))
+        os.utime(cache.path_for(key), (1000 + n, 1000 + n))
+
+    assert cache.fetch("aa01", str(tmp_path / "reused.mp4"))  # refreshes aa01
+
+    assert cache.evict() == 1
+    assert not cache.path_for("bb02").exists()
+    assert cache.path_for("aa01").exists()
+    assert cache.path_for("cc03").exists()
+
+
+def test_concurrent_stores_from_other_processes_never_touch_rendered_files(tmp_path):
+    cache = SegmentCache(tmp_path / "cache")
+    cached = cache.path_for("dd04")
+    cached.parent.mkdir(parents=True)
+    # another worker process (same main-thread ident) is half-way through store()
+    theirs = tmp_path / "theirs.mp4"
+    theirs.write_text("worker a", encoding="utf-8")
+    their_tmp = cached.with_suffix(f".{os.getpid() + 1}.{threading.get_ident()}.tmp")
+    os.link(theirs, their_tmp)
+
+    ours = tmp_path / "ours.mp4"
+    ours.write_text("worker b", encoding="utf-8")
+    cache.store("dd04", str(ours))
+    os.replace(their_tmp, cached)   # and finishes afterwards
+
+    assert theirs.read_text(encoding="utf-8") == "worker a"
+    assert ours.read_text(encoding="utf-8") == "worker b"
+    assert cached.read_text(encoding="utf-8") == "worker a"
+    assert list(cached.parent.glob("*.tmp")) == []
+
+
+def test_cache_store_errors_do_not_fail_rendered_segments(tmp_path, monkeypatch):
+    src = tmp_path / "clip.mp4"
+    src.write_text("source", encoding="utf-8")
+    out_dir = tmp_path / "segments"
+    out_dir.mkdir()
+    monkeypatch.setattr(
+        autocut, "ffmpeg_cut",
+        lambda src, start, end, dest, reverse=False, flash=False: Path(dest).write_text("v") and 0,
+    )
+    cache = SegmentCache(tmp_path / "cache")
+
+    def broken_store(key, rendered):
+        raise FileNotFoundError("lost the race for the temp file")
+
+    monkeypatch.setattr(cache, "store", broken_store)
+    jobs = _jobs(src, out_dir)
+    segments, failures = autocut.render_segments(jobs, workers=1, cache=cache)
+
+    assert failures == []
+    assert segments == [job.dest for job in jobs]
+
+
+def test_seeded_plans_are_reproducible_per_keyframe():
+    clip_map = {"hall": "hall.mp4", "sink": "sink.mp4", "default": "fallback.mp4"}
+    beats = [0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0, 5.5]
+    cue = {"keyframes": [{"scene": "hall"}, {"scene": "sink"}]}
+    edited = {"keyframes": [{"scene": "hall"}, {"scene": "sink at night"}]}
+
+    plan_a = autocut.plan_segments(cue, clip_map, beats, seed=7)
+    plan_b = autocut.plan_segments(cue, clip_map, beats, seed=7)
+    plan_c = autocut.plan_segments(edited, clip_map, beats, seed=7)
+
+    assert plan_a == plan_b
+    # the untouched first keyframe keeps identical segments after an edit
+    first_a = [job for job in plan_a if os.path.basename(job.dest).startswith("00_")]
+    first_c = [job for job in plan_c if os.path.basename(job.dest).startswith("00_")]
+    assert first_a == first_c
@@ -0,0 +1,94 @@
+import json
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from version_store import VersionStore
+
+
+def _sheet(n):
+    return {"title": "Insomniax", "keyframes": [{"scene": f"scene {i}", "note": ""} for i in range(n)]}
+
+
+def _edit_history(n_versions, n_keyframes=500, seed=0):
+    rng = random.Random(seed)
+    data = _sheet(n_keyframes)
+    history = []
+    for v in range(n_versions):
+        data = json.loads(json.dumps(data))
+        if v % 17 == 5:
+            data["keyframes"].append({"scene": f"new scene {v}"})
+        elif v % 23 == 7:
+            data["keyframes"].pop(rng.randrange(len(data["keyframes"])))
+        elif v % 29 == 3:
+            data["title"] = f"Insomniax cut {v}"
+        else:
+            data["keyframes"][rng.randrange(len(data["keyframes"]))]["note"] = f"take {v}"
+        history.append((f"2025-01-{1 + v // 10:02d}_00-00-{v % 60:02d}", data))
+    return history
+
+
+def test_every_version_restores_exactly_and_deltas_stay_small(tmp_path):
+    store = VersionStore(tmp_path, checkpoint_every=10)
+    history = _edit_history(60)
+    for vid, data in history:
+        assert store.commit(data, vid) == vid
+
+    for vid, data in history:
+        assert store.restore(vid) == data
+
+    # checkpoints at least every 10 versions (and after deletions shift every keyframe)
+    kinds = "".join(e["kind"][0] for e in store.entries)
+    assert kinds[0] == "f" and max(len(run) for run in kinds.split("f")) <= 9
+    assert kinds.count("f") < 12
+    full_bytes = max(e["bytes"] for e in store.entries if e["kind"] == "full")
+    assert all(e["bytes"] < full_bytes / 10 for e in store.entries if e["kind"] == "delta")
+
+    # a fresh process lists from the index and restores the same data
+    reopened = VersionStore(tmp_path, checkpoint_every=10)
+    assert reopened.ids() == [vid for vid, _ in history]
+    assert reopened.restore(history[33][0]) == history[33][1]
+
+
+def test_same_second_ids_are_unique_and_unchanged_sheets_share_objects(tmp_path):
+    store = VersionStore(tmp_path)
+    data = _sheet(50)
+    ids = [store.commit(data, "2025-01-02_03-04-05") for _ in range(3)]
+    assert ids == ["2025-01-02_03-04-05", "2025-01-02_03-04-05_2", "2025-01-02_03-04-05_3"]
+    assert len(list((tmp_path / "objects").iterdir())) == 2   # one snapshot + one empty delta
+    assert store.restore(ids[-1]) == data
+
+
+def test_retention_bounds_versions_and_keeps_one_per_day(tmp_path):
+    store = VersionStore(tmp_path, checkpoint_every=8, keep_last=10, keep_days=3)
+    history = _edit_history(60)
+    for vid, data in history:
+        store.commit(data, vid)
+    assert len(store.entries) <= 2 * 10 + 3
+
+    store.compact()
+    ids = store.ids()
+    newest = [vid for vid, _ in history[-10:]]
+    assert ids[-10:] == newest
+    assert ids[:-10] == ["2025-01-03_00-00-29", "2025-01-04_00-00-39", "2025-01-05_00-00-49"]
+    expected = dict(history)
+    for vid in ids:
+        assert store.restore(vid) == expected[vid]
+    live = {e["object"] for e in store.entries}
+    assert {p.name.split(".")[0] for p in (tmp_path / "objects").iterdir()} == live
+
+
+def test_legacy_full_copy_backups_are_imported(tmp_path):
+    old = _sheet(3)
+    new = _sheet(4)
+    (tmp_path / "insomniax_2025-01-01_10-00-00.json").write_text(json.dumps(old))
+    (tmp_path / "insomniax_2025-01-01_11-00-00.json").write_text(json.dumps(new))
+
+    store = VersionStore(tmp_path)
+    assert store.ids() == ["2025-01-01_10-00-00", "2025-01-01_11-00-00"]
+    assert store.restore("2025-01-01_10-00-00") == old
+    assert VersionStore(tmp_path).ids() == store.ids()   # imported once, then read from the index
@@ -0,0 +1,246 @@
+"""
+version_store.py
+Compact, delta-based cue sheet history for the Insomniax agent.
+
+- Every backup is a version: either a full checkpoint or a delta holding only
+  the keyframes (and top-level fields) that changed since the previous one
+- Checkpoints every CHECKPOINT_EVERY versions keep restores to a short replay
+- Objects are gzip'd JSON named by the hash of their content, so identical
+  snapshots and deltas are stored once
+- versions/index.jsonl lists every version; listing never touches objects
+- Retention keeps the newest versions plus one per day, then drops
+  unreferenced objects
+- Legacy full-copy backups (versions/insomniax_*.json) are imported once
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+CHECKPOINT_EVERY = 25   # at most this many deltas between full snapshots
+KEEP_LAST = 200         # newest versions always kept
+KEEP_DAYS = 30          # older versions: last one of each of this many days
+LEGACY_GLOB = "insomniax_*.json"
+
+
+def _canonical(obj) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def make_delta(old: dict, new: dict) -> dict:
+    """Changes turning `old` into `new`: keyframe slots, length and top-level fields."""
+    old_kf, new_kf = old.get("keyframes", []), new.get("keyframes", [])
+    changed = {
+        str(i): kf for i, kf in enumerate(new_kf)
+        if i >= len(old_kf) or kf != old_kf[i]
+    }
+    delta: dict = {"keyframes": changed, "length": len(new_kf)}
+    old_meta = {k: v for k, v in old.items() if k != "keyframes"}
+    new_meta = {k: v for k, v in new.items() if k != "keyframes"}
+    if old_meta != new_meta:
+        delta["meta"] = new_meta
+    return delta
+
+
+def apply_delta(base: dict, delta: dict) -> dict:
+    keyframes = list(base.get("keyframes", []))[: delta["length"]]
+    for i, kf in sorted(delta["keyframes"].items(), key=lambda kv: int(kv[0])):
+        i = int(i)
+        if i < len(keyframes):
+            keyframes[i] = kf
+        else:
+            keyframes.append(kf)
+    meta = delta.get("meta", {k: v for k, v in base.items() if k != "keyframes"})
+    return {**meta, "keyframes": keyframes}
+
+
+class VersionStore:
+    """Versions of one cue sheet, stored under `root`."""
+
+    def __init__(self, root: str | Path, checkpoint_every: int = CHECKPOINT_EVERY,
+                 keep_last: int = KEEP_LAST, keep_days: int = KEEP_DAYS) -> None:
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.jsonl"
+        self.checkpoint_every = checkpoint_every
+        self.keep_last = keep_last
+        self.keep_days = keep_days
+        self.entries: list[dict] = []
+        self._by_id: dict[str, int] = {}
+        self.generation = 0   # bumped whenever the version list changes
+        self._head: dict | None = None   # materialized newest version
+        self._lock = threading.RLock()
+        self._load()
+
+    # ── objects ──────────────────────────────────────────
+
+    def _put(self, obj) -> tuple[str, int]:
+        raw = _canonical(obj)
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self.objects / f"{digest}.json.gz"
+        if not path.exists():
+            self.objects.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{digest}.{os.getpid()}.tmp")
+            tmp.write_bytes(gzip.compress(raw, mtime=0))
+            os.replace(tmp, path)
+        return digest, path.stat().st_size
+
+    def _get(self, digest: str):
+        return json.loads(gzip.decompress((self.objects / f"{digest}.json.gz").read_bytes()))
+
+    # ── index ────────────────────────────────────────────
+
+    def _load(self) -> None:
+        try:
+            lines = self.index_path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            if line.strip():
+                self._add_entry(json.loads(line))
+        if not self.entries:
+            self._import_legacy()
+
+    def _add_entry(self, entry: dict) -> None:
+        self._by_id[entry["id"]] = len(self.entries)
+        self.entries.append(entry)
+        self.generation += 1
+
+    def _write_index(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_name(f".index.{os.getpid()}.tmp")
+        tmp.write_text("".join(json.dumps(e) + "\n" for e in self.entries), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def _import_legacy(self) -> None:
+        """Turn full-copy backups from older agent versions into versions."""
+        for path in sorted(self.root.glob(LEGACY_GLOB)):
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            self.commit(data, path.stem[len("insomniax_"):])
+
+    # ── versions ─────────────────────────────────────────
+
+    def ids(self) -> list[str]:
+        with self._lock:
+            return [e["id"] for e in self.entries]
+
+    def head(self) -> dict | None:
+        with self._lock:
+            if self._head is None and self.entries:
+                self._head = self.restore(self.entries[-1]["id"])
+            return self._head
+
+    def _encode(self, vid: str, prev: dict | None, data: dict, entries: list[dict]) -> dict:
+        """Index entry for `data` following `entries`; a delta on `prev` when that pays off."""
+        since_full = 0
+        for e in reversed(entries):
+            if e["kind"] == "full":
+                break
+            since_full += 1
+        entry = {"id": vid, "keyframes": len(data.get("keyframes", []))}
+        if prev is not None and since_full + 1 < self.checkpoint_every:
+            delta = make_delta(prev, data)
+            if len(_canonical(delta)) * 2 < len(_canonical(data)):
+                digest, size = self._put(delta)
+                return {**entry, "kind": "delta", "object": digest, "bytes": size}
+        digest, size = self._put(data)
+        return {**entry, "kind": "full", "object": digest, "bytes": size}
+
+    def commit(self, data: dict, version_id: str) -> str:
+        """
+        Record `data` as a new version named `version_id`; returns the id used.
+
+        An id already in use gets a numeric suffix. Unchanged data costs one
+        index line: its empty delta is a single shared object.
+        """
+        with self._lock:
+            head = self.head()
+            vid, n = version_id, 2
+            while vid in self._by_id:
+                vid, n = f"{version_id}_{n}", n + 1
+
+            entry = self._encode(vid, head, data, self.entries)
+            self._add_entry(entry)
+            self._head = json.loads(_canonical(data))
+            self.root.mkdir(parents=True, exist_ok=True)
+            with self.index_path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            # compact in steps rather than on every commit past the limit
+            if len(self.entries) > 2 * self.keep_last + self.keep_days:
+                self.compact()
+            return vid
+
+    def restore(self, version_id: str) -> dict:
+        """Rebuild the cue sheet of a version: nearest checkpoint + following deltas."""
+        with self._lock:
+            if version_id not in self._by_id:
+                raise KeyError(version_id)
+            i = self._by_id[version_id]
+            start = i
+            while self.entries[start]["kind"] != "full":
+                start -= 1
+            data = self._get(self.entries[start]["object"])
+            for e in self.entries[start + 1: i + 1]:
+                data = apply_delta(data, self._get(e["object"]))
+            return data
+
+    def compact(self) -> int:
+        """
+        Apply the retention policy; returns the number of versions dropped.
+
+        Kept: the newest `keep_last` versions and, before them, the last
+        version of each of the `keep_days` most recent days. Kept versions
+        are re-encoded against their new predecessor, and objects no
+        version references are deleted.
+        """
+        with self._lock:
+            n = len(self.entries)
+            keep = set(range(max(0, n - self.keep_last), n))
+            days: set[str] = set()
+            for i in range(n - self.keep_last - 1, -1, -1):
+                day = self.entries[i]["id"][:10]
+                if day in days:
+                    continue
+                if len(days) >= self.keep_days:
+                    break
+                days.add(day)
+                keep.add(i)
+            if len(keep) == n:
+                return 0
+
+            new: list[dict] = []
+            prev = None
+            for i in sorted(keep):
+                vid = self.entries[i]["id"]
+                data = self.restore(vid)
+                new.append(self._encode(vid, prev, data, new))
+                prev = data
+            self.entries, self._by_id = [], {}
+            for entry in new:
+                self._add_entry(entry)
+            self._write_index()
+
+            live = {e["object"] for e in self.entries}
+            for path in self.objects.glob("*.json.gz"):
+                if path.name[: -len(".json.gz")] not in live:
+                    path.unlink()
+            return n - len(new)
+
+
+_stores: dict[Path, VersionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_version_store(root: str | Path) -> VersionStore:
+    """The process-wide version store for `root`."""
+    key = Path(root).resolve()
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = VersionStore(root)
+        return _stores[key]